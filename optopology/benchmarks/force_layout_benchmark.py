@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.topology_utilities import TopologyUtilities
+from utils.force_layout import ForceDirectedLayout
+
+BLOCK_NAMES = ['core-block', 'internet-block', 'dmz-block', 'wan-block', 'datacenter-block',
+               'oob-block', 'extranet-block', 'replication-block', 'visibility-block', 'external-block']
+
+
+def build_topology(node_count, seed=7):
+    rng = random.Random(seed)
+    device_blocks = {}
+    edges = []
+    blocks = {name: [] for name in BLOCK_NAMES}
+
+    for i in range(node_count):
+        device_id = f'10.{i // 65536}.{(i // 256) % 256}.{i % 256}'
+        block = BLOCK_NAMES[i % len(BLOCK_NAMES)] if i % 20 else ''
+        device_blocks[device_id] = block
+        if block:
+            members = blocks[block]
+            # Meshed cores: the first few devices of each block are fully meshed,
+            # the rest hang off them as dual-homed access devices.
+            if len(members) < 4:
+                edges.extend((device_id, other) for other in members)
+            else:
+                edges.append((device_id, members[rng.randrange(4)]))
+                edges.append((device_id, members[rng.randrange(len(members))]))
+            members.append(device_id)
+
+    cores = [members[0] for members in blocks.values() if members]
+    for i, core in enumerate(cores):
+        edges.append((core, cores[(i + 1) % len(cores)]))
+    for device_id, block in device_blocks.items():
+        if not block:
+            edges.append((device_id, rng.choice(cores)))
+    return device_blocks, edges
+
+
+def main(sizes):
+    engine = ForceDirectedLayout(TopologyUtilities())
+    print(f"iterations={engine.iterations}")
+    print(f"{'nodes':>8} {'edges':>8} {'seconds':>9}")
+    for size in sizes:
+        device_blocks, edges = build_topology(size)
+        started = time.perf_counter()
+        result = engine.compute(device_blocks, edges)
+        elapsed = time.perf_counter() - started
+        assert len(result['device_positions']) == len(device_blocks)
+        print(f"{size:>8} {len(edges):>8} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -6,6 +6,7 @@ import logging
 from logging.handlers import RotatingFileHandler
 from flask_cors import CORS
 from topology_app import TopologyApp
+from utils.position_write_buffer import position_write_buffer
 import sys
 from datetime import datetime
 
@@ -34,7 +35,7 @@ if not 'uploads' in os.listdir():
 
 @app.route('/' + api_service_name + '/health-check', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'position_write_buffer': position_write_buffer.status()})
 
 
 @app.route('/' + api_service_name + '/import-excel-connections', methods=['POST'])
@@ -65,10 +66,18 @@ def import_excel_headered():
             logging.warning("Import Excel headered failed - invalid or missing JSON body")
             return jsonify({'success': False, 'message': 'Invalid or missing JSON body'}), 400
 
+        layout_mode = 'grid'
+        mode = 'append'
+        dry_run = False
+        force = False
         if isinstance(payload, list):
             rows = payload
         elif isinstance(payload, dict) and isinstance(payload.get('rows'), list):
             rows = payload['rows']
+            layout_mode = payload.get('layout_mode') or 'grid'
+            mode = payload.get('mode') or 'append'
+            dry_run = bool(payload.get('dry_run', False))
+            force = bool(payload.get('force', False))
         else:
             return jsonify({'success': False, 'message': 'Payload must be an array of row objects or { "rows": [...] }'}), 400
 
@@ -76,7 +85,10 @@ def import_excel_headered():
             return jsonify({'success': False, 'message': 'No rows provided'}), 400
 
         service = TopologyApp()
-        response = service.import_excel_headered(rows)
+        response = service.import_excel_headered(rows, layout_mode, mode, dry_run, force)
+        if not response.get('success', True):
+            logging.warning(f"Import Excel headered rejected: {response['message']}")
+            return jsonify(response), 400
 
         logging.info(f"Import Excel headered completed: {response['inserted_count']} inserted, {response['skipped_count']} skipped, {response.get('errors', []).__len__()} errors")
         return jsonify(response), 200
@@ -157,7 +169,7 @@ def get_network_topology_dashboard():
     logging.info(f"Get network topology dashboard endpoint called at {datetime.now()}")
     try:
         service = TopologyApp()
-        response = service.get_network_topology_dashboard()
+        response = service.get_network_topology_dashboard(request.args.get('cidr') or None)
 
         if response['success']:
             logging.info(f"Dashboard topology retrieved successfully: {response['count']['blocks']} blocks, {response['count']['nodes']} nodes, {response['count']['edges']} edges")
@@ -165,13 +177,34 @@ def get_network_topology_dashboard():
             return jsonify(response), 200
         else:
             logging.warning(f"Dashboard topology retrieval failed: {response['message']}, {datetime.now()}")
-            return jsonify(response), 500
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
 
     except Exception as e:
         logging.error(f"Get network topology dashboard error: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to retrieve dashboard topology data: {str(e)}'}), 500
 
 
+@app.route('/' + api_service_name + '/layout/recompute', methods=['POST'])
+def recompute_layout():
+    logging.info(f"Recompute layout endpoint called at {datetime.now()}")
+    try:
+        data = request.get_json(silent=True) or {}
+
+        service = TopologyApp()
+        response = service.recompute_layout(data)
+
+        if response['success']:
+            logging.info(f"Layout recomputed successfully: {response['count']['nodes']} nodes, {response['count']['blocks']} blocks in {response['elapsed_ms']} ms")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Layout recompute failed: {response['message']}")
+            return jsonify(response), 400
+
+    except Exception as e:
+        logging.error(f"Recompute layout error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to recompute layout: {str(e)}'}), 500
+
+
 @app.route('/' + api_service_name + '/network-topology-add', methods=['POST'])
 def add_network_topology_record():
     logging.info("Add network topology record endpoint called")
@@ -244,6 +277,54 @@ def update_network_topology_record():
         return jsonify({'success': False, 'message': f'Failed to update record: {str(e)}'}), 500
 
 
+@app.route('/' + api_service_name + '/network-topology-update-bulk', methods=['PUT'])
+def update_network_topology_records_bulk():
+    logging.info("Update network topology records bulk endpoint called")
+    try:
+        data = request.get_json()
+        if not data:
+            logging.warning("Update network topology records bulk failed - no data provided")
+            return jsonify({'success': False, 'message': 'No data provided'}), 400
+
+        service = TopologyApp()
+        response = service.update_network_topology_records_bulk(data)
+
+        if response['success']:
+            logging.info(f"Bulk network topology records updated: {response['updated_count']} updated, {response['failed_count']} failed")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Bulk network topology records update failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith('Payload') else 500
+
+    except Exception as e:
+        logging.error(f"Update network topology records bulk error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to update records: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/batch', methods=['POST'])
+def execute_batch():
+    logging.info("Batch endpoint called")
+    try:
+        data = request.get_json()
+        if not data:
+            logging.warning("Batch failed - no data provided")
+            return jsonify({'success': False, 'message': 'No data provided'}), 400
+
+        service = TopologyApp()
+        response = service.execute_batch(data)
+
+        if response['success']:
+            logging.info(f"Batch executed: {response['operation_count']} operations, {response['failed_count']} failed")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Batch failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith('Payload') else 500
+
+    except Exception as e:
+        logging.error(f"Batch error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to execute batch: {str(e)}'}), 500
+
+
 @app.route('/' + api_service_name + '/network-topology-delete', methods=['DELETE'])
 def delete_network_topology_record():
     logging.info("Delete network topology record endpoint called")
@@ -273,22 +354,162 @@ def get_network_topology_records():
     logging.info("Get network topology records endpoint called")
     try:
         search = request.args.get('search', '')
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
 
         service = TopologyApp()
-        response = service.get_network_topology_records(search)
+        response = service.get_network_topology_records(
+            search,
+            limit=request.args.get('limit'),
+            cursor=request.args.get('cursor') or None,
+            sort_by=request.args.get('sort_by', 'created_date'),
+            sort_dir=request.args.get('sort_dir', 'desc'),
+            fields=fields or None,
+            cidr=request.args.get('cidr') or None
+        )
 
         if response['success']:
             logging.info(f"Network topology records retrieved successfully: {len(response['data'])} records returned, {response['total_records']} total in database")
             return jsonify(response), 200
         else:
             logging.warning(f"Network topology records retrieval failed: {response['message']}")
-            return jsonify(response), 500
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
 
     except Exception as e:
         logging.error(f"Get network topology records error: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to retrieve records: {str(e)}'}), 500
 
 
+@app.route('/' + api_service_name + '/topology/stats', methods=['GET'])
+def get_topology_stats():
+    logging.info("Topology stats endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.get_topology_stats(request.args.get('top'))
+
+        if response['success']:
+            logging.info(f"Topology stats retrieved at version {response['version']}")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Topology stats retrieval failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
+
+    except Exception as e:
+        logging.error(f"Topology stats error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to retrieve topology stats: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/devices', methods=['GET'])
+def get_devices():
+    logging.info("Get devices endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.get_devices(
+            search=request.args.get('search', ''),
+            device_type=request.args.get('type', ''),
+            vendor=request.args.get('vendor', ''),
+            block=request.args.get('block'),
+            cidr=request.args.get('cidr') or None,
+            sort_by=request.args.get('sort_by', 'hostname'),
+            sort_dir=request.args.get('sort_dir', 'asc'),
+            limit=request.args.get('limit'),
+            cursor=request.args.get('cursor') or None
+        )
+
+        if response['success']:
+            logging.info(f"Devices retrieved successfully: {len(response['data'])} returned, {response['total_records']} matching")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Devices retrieval failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
+
+    except Exception as e:
+        logging.error(f"Get devices error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to retrieve devices: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/device/<path:device_id>', methods=['GET'])
+def get_device_detail(device_id):
+    logging.info(f"Get device detail endpoint called for {device_id}")
+    try:
+        service = TopologyApp()
+        response = service.get_device_detail(device_id)
+
+        if response['success']:
+            logging.info(f"Device detail retrieved: {response['data']['interface_count']} interfaces")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Device detail retrieval failed: {response['message']}")
+            if response['message'].startswith('No device found'):
+                return jsonify(response), 404
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
+
+    except Exception as e:
+        logging.error(f"Get device detail error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to retrieve device detail: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/devices/shared-interfaces', methods=['GET'])
+def get_shared_interfaces():
+    logging.info("Shared interfaces endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.get_shared_interfaces()
+
+        if response['success']:
+            logging.info(f"Shared interfaces found: {response['count']}")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Shared interface check failed: {response['message']}")
+            return jsonify(response), 500
+
+    except Exception as e:
+        logging.error(f"Shared interfaces error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to check shared interfaces: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/devices/suggest', methods=['GET'])
+def suggest_devices():
+    logging.info("Device suggest endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.suggest_devices(request.args.get('q', ''), request.args.get('limit'))
+
+        if response['success']:
+            logging.info(f"Device suggestions returned: {len(response['data'])}")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Device suggestion lookup failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith('Invalid') else 500
+
+    except Exception as e:
+        logging.error(f"Device suggest error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to suggest devices: {str(e)}'}), 500
+
+
+@app.route('/' + api_service_name + '/update-device-attributes-bulk', methods=['PUT'])
+def update_device_attributes_bulk():
+    logging.info("Update device attributes bulk endpoint called")
+    try:
+        data = request.get_json()
+        if not data:
+            logging.warning("Update device attributes bulk failed - no data provided")
+            return jsonify({'success': False, 'message': 'No data provided'}), 400
+
+        service = TopologyApp()
+        response = service.update_device_attributes_bulk(data)
+
+        if response['success']:
+            logging.info(f"Device attributes updated: {response['devices_updated']} devices, {response['rows_updated']} rows")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Update device attributes bulk failed: {response['message']}")
+            return jsonify(response), 400 if response['message'].startswith(('Payload', 'Change')) else 500
+
+    except Exception as e:
+        logging.error(f"Update device attributes bulk error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Device attribute update failed: {str(e)}'}), 500
+
+
 @app.route('/' + api_service_name + '/update-device-type', methods=['PUT'])
 def update_device_type():
     logging.info("Update device type endpoint called")
@@ -324,7 +545,7 @@ def save_device_positions():
             return jsonify({'success': False, 'message': 'Invalid payload: positions object is required'}), 400
 
         service = TopologyApp()
-        response = service.save_device_positions(positions)
+        response = service.save_device_positions(positions, payload.get('coordinates', 'absolute'))
 
         if response['success']:
             logging.info(f"Device positions saved successfully: {response['summary']['device_rows_updated']} device updates, {response['summary']['block_rows_updated']} block updates at {datetime.now()}")
@@ -437,6 +658,142 @@ def delete_network_topology_blocks():
         logging.error(f"Delete network topology block error: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to delete block: {str(e)}'}), 500
 
+@app.route('/' + api_service_name + '/network-topology-block-rules-get', methods=['GET'])
+def get_block_rules():
+    logging.info("Get block rules endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.get_block_rules()
+        if response['success']:
+            logging.info(f"Block rules retrieved successfully: {len(response['data'])} rules from {response['source']}")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Block rules retrieval failed: {response['message']}")
+            return jsonify(response), 500
+    except Exception as e:
+        logging.error(f"Get block rules error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to retrieve block rules: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-block-rules-update', methods=['PUT'])
+def update_block_rules():
+    logging.info("Update block rules endpoint called")
+    try:
+        data = request.get_json()
+        if not data:
+            logging.warning("Update block rules failed - no data provided")
+            return jsonify({'success': False, 'message': 'No data provided'}), 400
+
+        service = TopologyApp()
+        response = service.update_block_rules(data)
+        if response['success']:
+            logging.info(f"Block rules updated successfully: version {response['version']}")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Block rules update failed: {response['message']}")
+            return jsonify(response), 400
+    except Exception as e:
+        logging.error(f"Update block rules error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to update block rules: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-block-reclassify', methods=['POST'])
+def start_block_reclassification():
+    logging.info("Start block reclassification endpoint called")
+    try:
+        data = request.get_json(silent=True) or {}
+
+        service = TopologyApp()
+        response = service.start_block_reclassification(data)
+        if response['success']:
+            logging.info(f"Block reclassification job started: {response['job_id']}")
+            return jsonify(response), 202
+        else:
+            logging.warning(f"Block reclassification start failed: {response['message']}")
+            return jsonify(response), 409
+    except Exception as e:
+        logging.error(f"Start block reclassification error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to start block reclassification: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-block-reclassify-status', methods=['GET'])
+def get_block_reclassification_status():
+    logging.info("Get block reclassification status endpoint called")
+    try:
+        job_id = request.args.get('job_id', '')
+
+        service = TopologyApp()
+        response = service.get_block_reclassification_status(job_id)
+        if response['success']:
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Block reclassification status failed: {response['message']}")
+            return jsonify(response), 404
+    except Exception as e:
+        logging.error(f"Get block reclassification status error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to retrieve reclassification status: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-devices-migrate', methods=['POST'])
+def migrate_devices():
+    logging.info("Migrate devices endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.migrate_devices()
+        if response['success']:
+            logging.info(f"Device migration completed: {response['devices_found']} devices")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Device migration failed: {response['message']}")
+            return jsonify(response), 500
+    except Exception as e:
+        logging.error(f"Migrate devices error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to migrate devices: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-block-positions-migrate', methods=['POST'])
+def migrate_block_positions():
+    logging.info("Migrate block positions endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.migrate_block_positions()
+        if response['success']:
+            logging.info(f"Block position migration completed: {response['blocks_found']} blocks")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Block position migration failed: {response['message']}")
+            return jsonify(response), 500
+    except Exception as e:
+        logging.error(f"Migrate block positions error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to migrate block positions: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-relative-positions-migrate', methods=['POST'])
+def migrate_relative_positions():
+    logging.info("Migrate relative positions endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.migrate_relative_positions()
+        if response['success']:
+            logging.info(f"Relative position migration completed: {response['devices_converted']} devices")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Relative position migration failed: {response['message']}")
+            return jsonify(response), 500
+    except Exception as e:
+        logging.error(f"Migrate relative positions error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to migrate relative positions: {str(e)}'}), 500
+
+@app.route('/' + api_service_name + '/network-topology-blocks-reconcile', methods=['POST'])
+def reconcile_block_counters():
+    logging.info("Reconcile block counters endpoint called")
+    try:
+        service = TopologyApp()
+        response = service.reconcile_block_counters()
+        if response['success']:
+            logging.info(f"Block counter reconciliation completed: {response['blocks_corrected']} blocks corrected")
+            return jsonify(response), 200
+        else:
+            logging.warning(f"Block counter reconciliation failed: {response['message']}")
+            return jsonify(response), 500
+    except Exception as e:
+        logging.error(f"Reconcile block counters error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Failed to reconcile block counters: {str(e)}'}), 500
+
 @app.route('/' + api_service_name + '/network-topology-delete-all-records', methods=['DELETE'])
 def delete_all_topology_table_records():
     logging.info("Delete all topology table records endpoint called")
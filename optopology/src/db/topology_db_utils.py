@@ -1,28 +1,92 @@
+import base64
+import re
 import traceback
 from flask import logging
-from pymongo import MongoClient
-from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import ObjectId, json_util
 from datetime import datetime
 from props import mongo_host, mongo_port, mongo_user, mongo_password, mongo_db
-from props import topology_dashboard_collection, topology_block_collection
+from props import topology_dashboard_collection, topology_block_collection, topology_block_rules_collection, topology_meta_collection
+from props import topology_devices_collection, device_migration_batch_size
+from props import connections_page_size, connections_max_page_size, search_index_enabled
+from props import search_index_max_matches, search_index_fetch_batch_size
+from utils.topology_utilities import TopologyUtilities
+from utils.position_cache import position_cache
+from utils.position_write_buffer import position_write_buffer
+from utils.search_index import connection_search_index
+from utils.adjacency_index import adjacency_index
 import logging
 import sys
+import threading
+
+# One pooled client per process; indexes are ensured by the first instance only.
+_client_lock = threading.Lock()
+_shared_client = None
+_indexes_ready = False
+
+
+CONNECTION_RECORD_FIELDS = (
+    'device_a_ip', 'device_a_hostname', 'device_a_interface', 'device_a_type', 'device_a_vendor', 'device_a_block',
+    'device_b_ip', 'device_b_hostname', 'device_b_interface', 'device_b_type', 'device_b_vendor', 'device_b_block',
+    'comments', 'updated_by', 'created_date', 'updated_date'
+)
+
+CONNECTION_SORT_FIELDS = (
+    'created_date', 'updated_date',
+    'device_a_hostname', 'device_a_ip', 'device_a_type', 'device_a_block',
+    'device_b_hostname', 'device_b_ip', 'device_b_type', 'device_b_block'
+)
+
+
+SESSION_COLLECTIONS = ('dashboard_collection', 'block_collection', 'block_rules_collection', 'devices_collection', 'meta_collection')
+
+
+class _SessionCollection:
+    # Passes one session to every call on the wrapped collection unless the caller gives its own.
+    def __init__(self, collection, session):
+        self._collection = collection
+        self._session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name == 'estimated_document_count':
+            return attr
+
+        def bound(*args, **kwargs):
+            kwargs.setdefault('session', self._session)
+            return attr(*args, **kwargs)
+        return bound
 
 
 class TopologyDBUtils:
     def __init__(self):
-        print(f"Connecting to MongoDB at {mongo_host}:{mongo_port}", file=sys.stderr)
+        global _shared_client, _indexes_ready
         try:
-            connection_string = f"mongodb://{mongo_user}:{mongo_password}@{mongo_host}:{mongo_port}/?authSource=admin"
-            self.client = MongoClient(connection_string)
+            with _client_lock:
+                if _shared_client is None:
+                    print(f"Connecting to MongoDB at {mongo_host}:{mongo_port}", file=sys.stderr)
+                    connection_string = f"mongodb://{mongo_user}:{mongo_password}@{mongo_host}:{mongo_port}/?authSource=admin"
+                    client = MongoClient(connection_string)
+                    client.admin.command('ping')
+                    _shared_client = client
+                    print(f"Successfully connected to MongoDB database: {mongo_db}", file=sys.stderr)
+            self.client = _shared_client
             self.db = self.client[mongo_db]
             self.dashboard_collection = self.db[topology_dashboard_collection]
             self.block_collection = self.db[topology_block_collection]
-
-            self._create_indexes()
-
-            self.client.admin.command('ping')
-            print(f"Successfully connected to MongoDB database: {mongo_db}", file=sys.stderr)
+            self.block_rules_collection = self.db[topology_block_rules_collection]
+            self.devices_collection = self.db[topology_devices_collection]
+            self.meta_collection = self.db[topology_meta_collection]
+            self.topology_utils = TopologyUtilities()
+            self._session = None
+            self._commit_hooks = None
+
+            with _client_lock:
+                if not _indexes_ready:
+                    self._create_indexes()
+                    self._backfill_search_keys()
+                    _indexes_ready = True
         except Exception as e:
             print(f"Error connecting to MongoDB at {mongo_host}:{mongo_port}: {str(e)}", file=sys.stderr)
             raise e
@@ -36,12 +100,47 @@ class TopologyDBUtils:
             self.dashboard_collection.create_index([("device_a_block", 1)])
             self.dashboard_collection.create_index([("device_b_block", 1)])
             self.dashboard_collection.create_index([("created_date", -1)])
+            self.dashboard_collection.create_index([("device_a_block_auto", 1)])
+            self.dashboard_collection.create_index([("device_b_block_auto", 1)])
+            self.dashboard_collection.create_index([("device_a_id", 1)])
+            self.dashboard_collection.create_index([("device_b_id", 1)])
+            self.dashboard_collection.create_index([("search_keys", 1)])
+            self.dashboard_collection.create_index([("device_a_ip_key", 1)])
+            self.dashboard_collection.create_index([("device_b_ip_key", 1)])
+            for field in CONNECTION_SORT_FIELDS:
+                self.dashboard_collection.create_index([(field, 1), ("_id", 1)])
+
+            self.devices_collection.create_index([("hostname", 1)])
+            self.devices_collection.create_index([("ip", 1)])
+            self.devices_collection.create_index([("ip_key", 1)])
+            self.devices_collection.create_index([("block", 1)])
 
             self.block_collection.create_index([("block_name", 1)], unique=True)
             self.block_collection.create_index([("created_date", -1)])
         except Exception as e:
             print(f"Warning: Could not create indexes: {str(e)}", file=sys.stderr)
 
+    def _backfill_search_keys(self):
+        # Rows written before search_keys and ip keys existed cannot be found by prefix or CIDR until filled in.
+        try:
+            projection = {f"device_{side}_{field}": 1 for side in ('a', 'b') for field in ('ip', 'hostname')}
+            query = {"$or": [{"search_keys": {"$exists": False}}, {"device_a_ip_key": {"$exists": False}}]}
+            operations = []
+            updated = 0
+            for doc in self.dashboard_collection.find(query, projection, batch_size=device_migration_batch_size):
+                fields = {"search_keys": self._search_keys(doc)}
+                fields.update(self._ip_key_fields(doc))
+                operations.append(UpdateOne({"_id": doc['_id']}, {"$set": fields}))
+                if len(operations) >= device_migration_batch_size:
+                    updated += self.dashboard_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+            if operations:
+                updated += self.dashboard_collection.bulk_write(operations, ordered=False).modified_count
+            if updated:
+                print(f"Backfilled search keys on {updated} connection rows", file=sys.stderr)
+        except Exception as e:
+            print(f"Warning: Could not backfill search keys: {str(e)}", file=sys.stderr)
+
     def _str_to_objectid(self, id_str):
         try:
             return ObjectId(id_str)
@@ -54,6 +153,458 @@ class TopologyDBUtils:
         except KeyError:
             return ''
 
+    def _run_in_transaction(self, callback):
+        # Standalone servers reject transactions (IllegalOperation) before anything is written,
+        # in which case the callback runs once more without a session.
+        if self._session is not None:
+            # Already inside run_in_session: join that transaction instead of starting another.
+            return callback(self._session)
+        try:
+            with self.client.start_session() as session:
+                return session.with_transaction(callback)
+        except OperationFailure as e:
+            if e.code != 20:
+                raise
+        return callback(None)
+
+    def run_in_session(self, callback):
+        # Every collection call made by callback, through any method, joins one transaction.
+        def apply(session):
+            originals = {name: getattr(self, name) for name in SESSION_COLLECTIONS}
+            if session is not None:
+                for name, collection in originals.items():
+                    setattr(self, name, _SessionCollection(collection, session))
+            self._session = session
+            # A retried transaction starts over, so hooks from an earlier attempt are dropped.
+            self._commit_hooks = []
+            try:
+                return callback(session)
+            finally:
+                self._session = None
+                for name, collection in originals.items():
+                    setattr(self, name, collection)
+
+        try:
+            result = self._run_in_transaction(apply)
+            hooks = self._commit_hooks or []
+        finally:
+            self._commit_hooks = None
+        for hook in hooks:
+            hook()
+        return result
+
+    def _after_commit(self, hook):
+        # In-process state that must follow the database only changes once the write is durable.
+        if self._commit_hooks is None:
+            hook()
+        else:
+            self._commit_hooks.append(hook)
+
+    def discard_uncommitted_state(self):
+        # In-process indexes and caches may have applied writes from an aborted transaction.
+        for index in (connection_search_index, adjacency_index):
+            index.mark_stale()
+        position_cache.invalidate()
+
+    def _side_cascade_stage(self, field, matches, new_value):
+        # One pipeline stage that rewrites whichever of the A/B sides matches.
+        stage = {}
+        for side in ('a', 'b'):
+            condition = {"$and": [{"$eq": [f"$device_{side}_{name}", {"$literal": value}]} for name, value in matches.items()]}
+            stage[f"device_{side}_{field}"] = {"$cond": [condition, {"$literal": new_value}, f"$device_{side}_{field}"]}
+        return stage
+
+    def _side_match_query(self, matches):
+        return {"$or": [{f"device_{side}_{name}": value for name, value in matches.items()} for side in ('a', 'b')]}
+
+    def get_topology_version(self):
+        doc = self.meta_collection.find_one({"_id": "topology"}, {"version": 1})
+        return doc.get('version', 0) if doc else 0
+
+    def get_position_stamp(self):
+        # Moves with every connection write and every position write, from any process.
+        doc = self.meta_collection.find_one({"_id": "topology"}, {"version": 1, "positions_version": 1})
+        return (doc.get('version', 0), doc.get('positions_version', 0)) if doc else (0, 0)
+
+    def _positions_changed(self):
+        self.meta_collection.update_one(
+            {"_id": "topology"},
+            {"$inc": {"positions_version": 1}, "$set": {"updated_date": datetime.now()}},
+            upsert=True
+        )
+
+    def _topology_changed(self, upserts=(), deletes=(), clear=False):
+        # Every connection write moves the shared version, so other processes can tell their copies are stale.
+        doc = self.meta_collection.find_one_and_update(
+            {"_id": "topology"},
+            {"$inc": {"version": 1}, "$set": {"updated_date": datetime.now()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        for index in (connection_search_index, adjacency_index):
+            index.apply(doc['version'], upserts, deletes, clear)
+        return doc['version']
+
+    def iter_connection_index_rows(self):
+        projection = {"comments": 1}
+        for side in ('a', 'b'):
+            for field in ('ip', 'hostname', 'interface'):
+                projection[f"device_{side}_{field}"] = 1
+        return self.dashboard_collection.find({}, projection, batch_size=device_migration_batch_size)
+
+    def _ensure_index(self, index):
+        index.ensure_current(self.get_topology_version, self.iter_connection_index_rows)
+
+    def suggest_devices(self, text, limit):
+        try:
+            self._ensure_index(connection_search_index)
+            return {'status': 'Success', 'suggestions': connection_search_index.suggest(text, limit)}
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_device_detail(self, device_id):
+        try:
+            self._ensure_index(adjacency_index)
+            interfaces = adjacency_index.device(device_id)
+            if interfaces is None:
+                return {'status': 'Failed', 'message': f'No device found with id: {device_id}'}
+
+            device = self.devices_collection.find_one({"_id": device_id}) or {}
+            return {
+                'status': 'Success',
+                'device': {
+                    'id': device_id,
+                    'ip': device.get('ip', ''),
+                    'hostname': device.get('hostname', ''),
+                    'type': device.get('type', ''),
+                    'vendor': device.get('vendor', ''),
+                    'block': device.get('block', '')
+                },
+                'interfaces': interfaces
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_shared_interfaces(self):
+        try:
+            self._ensure_index(adjacency_index)
+            return {'status': 'Success', 'shared_interfaces': adjacency_index.conflicts()}
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def _search_keys(self, doc):
+        # Lower-cased IPs and hostnames of both sides, so prefix search is an anchored index range.
+        keys = []
+        for side in ('a', 'b'):
+            for field in ('ip', 'hostname'):
+                value = str(doc.get(f'device_{side}_{field}', '') or '').strip().lower()
+                if value and value not in keys:
+                    keys.append(value)
+        return keys
+
+    def _ip_key_fields(self, doc):
+        return {f"device_{side}_ip_key": self.topology_utils.ip_key(doc.get(f'device_{side}_ip', '')) for side in ('a', 'b')}
+
+    def _cidr_query(self, cidr):
+        low, high = self.topology_utils.cidr_range(cidr)
+        return {"$or": [
+            {"device_a_ip_key": {"$gte": low, "$lte": high}},
+            {"device_b_ip_key": {"$gte": low, "$lte": high}}
+        ]}
+
+    def _encode_cursor(self, value, last_id):
+        return base64.urlsafe_b64encode(json_util.dumps({'v': value, 'id': last_id}).encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        try:
+            decoded = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            return decoded['v'], decoded['id']
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    def _keyset_query(self, field, direction, value, last_id):
+        # Missing values sort lowest, so they need their own clause on either side of the cursor.
+        after = "$gt" if direction == 1 else "$lt"
+        same = {field: value, "_id": {after: last_id}}
+        if value is None:
+            return {"$or": [same, {field: {"$ne": None}}]} if direction == 1 else same
+        clauses = [{field: {after: value}}, same]
+        if direction == -1:
+            clauses.append({field: None})
+        return {"$or": clauses}
+
+    def _connection_record(self, doc, fields):
+        record = {'id': str(doc['_id'])}
+        for field in fields:
+            value = doc.get(field, '')
+            if field in ('created_date', 'updated_date'):
+                value = value.isoformat() if value else None
+            record[field] = value
+        return record
+
+    def _device_id(self, ip, hostname):
+        return self.topology_utils.compute_device_id(ip, hostname)
+
+    def _device_upsert_operations(self, record, updated_by, current_time):
+        # Latest write wins for attributes; a saved position is only filled in, never replaced.
+        operations = []
+        for side in ('a', 'b'):
+            device_id = self._device_id(record.get(f'device_{side}_ip', ''), record.get(f'device_{side}_hostname', ''))
+            if not device_id:
+                continue
+
+            fields = {
+                "ip": self.topology_utils.clean_field_value(record.get(f'device_{side}_ip', '')),
+                "ip_key": self.topology_utils.ip_key(record.get(f'device_{side}_ip', '')),
+                "hostname": self.topology_utils.clean_field_value(record.get(f'device_{side}_hostname', '')),
+                "block": record.get(f'device_{side}_block', '') or '',
+                "updated_by": updated_by,
+                "updated_date": current_time
+            }
+            stage = {field: {"$literal": value} for field, value in fields.items()}
+            for field in ('type', 'vendor'):
+                # A row that does not know the type or vendor keeps whatever the device already has.
+                value = str(record.get(f'device_{side}_{field}', 'unknown') or 'unknown').strip().lower()
+                if value == 'unknown':
+                    stage[field] = {"$ifNull": [f"${field}", "unknown"]}
+                else:
+                    stage[field] = {"$literal": value}
+            stage["created_by"] = {"$ifNull": ["$created_by", {"$literal": updated_by}]}
+            stage["created_date"] = {"$ifNull": ["$created_date", {"$literal": current_time}]}
+
+            pos_x = record.get(f'device_{side}_position_x')
+            pos_y = record.get(f'device_{side}_position_y')
+            if pos_x is not None and pos_y is not None:
+                stage["position_x"] = {"$ifNull": ["$position_x", {"$literal": float(pos_x)}]}
+                stage["position_y"] = {"$ifNull": ["$position_y", {"$literal": float(pos_y)}]}
+
+            operations.append(UpdateOne({"_id": device_id}, [{"$set": stage}], upsert=True))
+        return operations
+
+    def _upsert_devices(self, records, updated_by, deltas=None):
+        current_time = datetime.now()
+        operations = []
+        blocks = {}
+        for record in records:
+            operations.extend(self._device_upsert_operations(record, updated_by, current_time))
+            for side in ('a', 'b'):
+                device_id = self._device_id(record.get(f'device_{side}_ip', ''), record.get(f'device_{side}_hostname', ''))
+                if device_id:
+                    blocks[device_id] = record.get(f'device_{side}_block', '') or ''
+        if not operations:
+            return deltas
+
+        if deltas is not None:
+            previous = {
+                doc['_id']: doc.get('block', '')
+                for doc in self.devices_collection.find({"_id": {"$in": list(blocks)}}, {"block": 1})
+            }
+            for device_id, block in blocks.items():
+                if device_id not in previous:
+                    self._add_device_delta(deltas, block, 1)
+                elif previous[device_id] != block:
+                    self._add_device_delta(deltas, previous[device_id], -1)
+                    self._add_device_delta(deltas, block, 1)
+        self.devices_collection.bulk_write(operations, ordered=False)
+        return deltas
+
+    def _load_devices(self, device_ids=None):
+        projection = {"type": 1, "vendor": 1, "block": 1, "position_x": 1, "position_y": 1, "relative_x": 1, "relative_y": 1}
+        query = {"_id": {"$in": list(device_ids)}} if device_ids is not None else {}
+        return {doc['_id']: doc for doc in self.devices_collection.find(query, projection)}
+
+    def get_relative_positions(self, devices):
+        return {
+            device_id: {'x': float(doc['relative_x']), 'y': float(doc['relative_y'])}
+            for device_id, doc in devices.items()
+            if doc.get('block') and doc.get('relative_x') is not None and doc.get('relative_y') is not None
+        }
+
+    def get_block_positions(self, block_names=None):
+        query = {"position_x": {"$ne": None}, "position_y": {"$ne": None}}
+        if block_names is not None:
+            query["block_name"] = {"$in": list(block_names)}
+        return {
+            doc['block_name']: {'x': float(doc['position_x']), 'y': float(doc['position_y'])}
+            for doc in self.block_collection.find(query, {"block_name": 1, "position_x": 1, "position_y": 1})
+        }
+
+    def save_block_positions(self, block_positions, updated_by, fill_only=False):
+        # Blocks referenced by connections may not have a document yet, so moves upsert by name.
+        current_time = datetime.now()
+        operations = []
+        block_names = []
+        for block_name, position in block_positions.items():
+            if not block_name:
+                continue
+            block_names.append(block_name)
+            x = float(position['x'])
+            y = float(position['y'])
+            stage = {
+                "block_name": {"$literal": block_name},
+                "position_x": {"$ifNull": ["$position_x", {"$literal": x}]} if fill_only else {"$literal": x},
+                "position_y": {"$ifNull": ["$position_y", {"$literal": y}]} if fill_only else {"$literal": y},
+                "created_by": {"$ifNull": ["$created_by", {"$literal": updated_by}]},
+                "created_date": {"$ifNull": ["$created_date", {"$literal": current_time}]},
+                "updated_by": {"$literal": updated_by},
+                "updated_date": {"$literal": current_time}
+            }
+            operations.append(UpdateOne({"block_name": block_name}, [{"$set": stage}], upsert=True))
+        if not operations:
+            return 0
+        result = self.block_collection.bulk_write(operations, ordered=False)
+        if result.upserted_ids:
+            self.refresh_block_counters([block_names[index] for index in result.upserted_ids])
+        if result.upserted_count or result.modified_count:
+            self._positions_changed()
+        return result.upserted_count + result.modified_count
+
+    def _add_link_deltas(self, deltas, rows, sign):
+        # A link counts once per block it touches; it is inter-block when its two sides differ.
+        for row in rows:
+            block_a = row.get('device_a_block') or ''
+            block_b = row.get('device_b_block') or ''
+            for block in {block_a, block_b} - {''}:
+                counters = deltas.setdefault(block, {})
+                counters['link_count'] = counters.get('link_count', 0) + sign
+                if block_a != block_b:
+                    counters['inter_block_link_count'] = counters.get('inter_block_link_count', 0) + sign
+        return deltas
+
+    def _add_device_delta(self, deltas, block, sign):
+        if block:
+            counters = deltas.setdefault(block, {})
+            counters['device_count'] = counters.get('device_count', 0) + sign
+        return deltas
+
+    def _apply_block_counters(self, deltas):
+        increments = {
+            block: {field: value for field, value in counters.items() if value}
+            for block, counters in deltas.items()
+        }
+        increments = {block: values for block, values in increments.items() if values}
+        if not increments:
+            return
+        existing = {
+            doc['block_name'] for doc in self.block_collection.find({"block_name": {"$in": list(increments)}}, {"block_name": 1})
+        }
+        operations = [UpdateOne({"block_name": block}, {"$inc": values}) for block, values in increments.items() if block in existing]
+        missing = [block for block in increments if block not in existing]
+        if missing:
+            # A block with no document yet gets one, with counters recomputed from the stored rows
+            # (which already include this change) rather than just the delta.
+            current_time = datetime.now()
+            for block, values in self._compute_block_counters(missing).items():
+                operations.append(UpdateOne(
+                    {"block_name": block},
+                    {"$set": values, "$setOnInsert": {"created_date": current_time, "updated_date": current_time}},
+                    upsert=True
+                ))
+        if operations:
+            self.block_collection.bulk_write(operations, ordered=False)
+
+    def _compute_block_counters(self, block_names=None):
+        row_pipeline = []
+        device_query = {}
+        if block_names is not None:
+            block_names = list(block_names)
+            row_pipeline.append({"$match": {"$or": [
+                {"device_a_block": {"$in": block_names}},
+                {"device_b_block": {"$in": block_names}}
+            ]}})
+            device_query = {"block": {"$in": block_names}}
+        row_pipeline += [
+            {"$project": {
+                "blocks": {"$setUnion": [[{"$ifNull": ["$device_a_block", ""]}], [{"$ifNull": ["$device_b_block", ""]}]]},
+                "inter": {"$ne": [{"$ifNull": ["$device_a_block", ""]}, {"$ifNull": ["$device_b_block", ""]}]}
+            }},
+            {"$unwind": "$blocks"},
+            {"$match": {"blocks": {"$ne": ""}} if block_names is None else {"blocks": {"$in": block_names}}},
+            {"$group": {
+                "_id": "$blocks",
+                "link_count": {"$sum": 1},
+                "inter_block_link_count": {"$sum": {"$cond": ["$inter", 1, 0]}}
+            }}
+        ]
+
+        counters = {block: {'device_count': 0, 'link_count': 0, 'inter_block_link_count': 0} for block in block_names or ()}
+        for group in self.dashboard_collection.aggregate(row_pipeline, allowDiskUse=True):
+            entry = counters.setdefault(group['_id'], {'device_count': 0, 'link_count': 0, 'inter_block_link_count': 0})
+            entry['link_count'] = group['link_count']
+            entry['inter_block_link_count'] = group['inter_block_link_count']
+        device_pipeline = [{"$match": device_query}, {"$group": {"_id": "$block", "device_count": {"$sum": 1}}}]
+        for group in self.devices_collection.aggregate(device_pipeline):
+            if group['_id']:
+                counters.setdefault(group['_id'], {'device_count': 0, 'link_count': 0, 'inter_block_link_count': 0})['device_count'] = group['device_count']
+        return counters
+
+    def refresh_block_counters(self, block_names):
+        counters = self._compute_block_counters(block_names)
+        operations = [UpdateOne({"block_name": block}, {"$set": values}) for block, values in counters.items()]
+        if operations:
+            self.block_collection.bulk_write(operations, ordered=False)
+        return counters
+
+    def _prune_devices(self, device_ids, deltas):
+        # Device documents go once no remaining connection references them.
+        device_ids = list({device_id for device_id in device_ids if device_id})
+        if not device_ids:
+            return 0
+        referenced = set(self.dashboard_collection.distinct("device_a_id", {"device_a_id": {"$in": device_ids}}))
+        referenced.update(self.dashboard_collection.distinct("device_b_id", {"device_b_id": {"$in": device_ids}}))
+        orphaned = [device_id for device_id in device_ids if device_id not in referenced]
+        if not orphaned:
+            return 0
+        for doc in self.devices_collection.find({"_id": {"$in": orphaned}}, {"block": 1}):
+            self._add_device_delta(deltas, doc.get('block', ''), -1)
+        # A device that comes back is placed afresh, so its old cached position no longer describes what is stored.
+        position_cache.invalidate(orphaned)
+        return self.devices_collection.delete_many({"_id": {"$in": orphaned}}).deleted_count
+
+    def _delete_rows(self, query):
+        projection = {"device_a_block": 1, "device_b_block": 1, "device_a_id": 1, "device_b_id": 1}
+        rows = list(self.dashboard_collection.find(query, projection))
+        if not rows:
+            return []
+        self.dashboard_collection.delete_many({"_id": {"$in": [row['_id'] for row in rows]}})
+        position_cache.invalidate({row.get(f'device_{side}_id') for row in rows for side in ('a', 'b')} - {None, ''})
+        deltas = self._add_link_deltas({}, rows, -1)
+        self._prune_devices([row.get(f'device_{side}_id') for row in rows for side in ('a', 'b')], deltas)
+        self._apply_block_counters(deltas)
+        self._topology_changed(deletes=[row['_id'] for row in rows])
+        return [row['_id'] for row in rows]
+
+    def _merge_device_fields(self, doc, devices):
+        # Dual read: device documents win field by field, rows fill anything not yet migrated.
+        for side in ('a', 'b'):
+            device_id = doc.get(f'device_{side}_id') or self._device_id(
+                doc.get(f'device_{side}_ip', ''), doc.get(f'device_{side}_hostname', '')
+            )
+            device = devices.get(device_id)
+            if not device:
+                continue
+            for field in ('type', 'vendor', 'block', 'position_x', 'position_y'):
+                if device.get(field) is not None:
+                    doc[f'device_{side}_{field}'] = device[field]
+        return doc
+
+    def _merge_block_positions(self, doc, block_positions, relative_positions=None):
+        for side in ('a', 'b'):
+            position = block_positions.get(doc.get(f'device_{side}_block') or '')
+            if position:
+                doc[f'device_{side}_block_position_x'] = position['x']
+                doc[f'device_{side}_block_position_y'] = position['y']
+                relative = (relative_positions or {}).get(doc.get(f'device_{side}_id') or self._device_id(
+                    doc.get(f'device_{side}_ip', ''), doc.get(f'device_{side}_hostname', '')
+                ))
+                if relative:
+                    doc[f'device_{side}_position_x'] = position['x'] + relative['x']
+                    doc[f'device_{side}_position_y'] = position['y'] + relative['y']
+        return doc
+
     def check_duplicate_connection(self, record):
         try:
             da_host = str(record['device_a_hostname']).strip()
@@ -114,6 +665,46 @@ class TopologyDBUtils:
             traceback.print_exc()
             return {'is_duplicate': False, 'error': str(e)}
 
+    def _connection_document(self, record, current_time):
+        da_ip = str(record.get('device_a_ip', '')).strip()
+        da_host = str(record.get('device_a_hostname', '')).strip()
+        db_ip = str(record.get('device_b_ip', '')).strip()
+        db_host = str(record.get('device_b_hostname', '')).strip()
+        document = {
+            "device_a_id": self._device_id(da_ip, da_host),
+            "device_a_ip": da_ip,
+            "device_a_hostname": da_host,
+            "device_a_interface": str(record.get('device_a_interface', '')).strip(),
+            "device_a_type": str(record.get('device_a_type', 'unknown')).strip().lower(),
+            "device_a_vendor": str(record.get('device_a_vendor', 'unknown')).strip().lower(),
+            "device_a_block": record.get('device_a_block', ''),
+            "device_a_block_auto": bool(record.get('device_a_block_auto', False)),
+            "device_a_position_x": record.get('device_a_position_x'),
+            "device_a_position_y": record.get('device_a_position_y'),
+            "device_a_block_position_x": record.get('device_a_block_position_x'),
+            "device_a_block_position_y": record.get('device_a_block_position_y'),
+            "device_b_ip": db_ip,
+            "device_b_hostname": db_host,
+            "device_b_interface": str(record.get('device_b_interface', '')).strip(),
+            "device_b_type": str(record.get('device_b_type', 'unknown')).strip().lower(),
+            "device_b_vendor": str(record.get('device_b_vendor', 'unknown')).strip().lower(),
+            "device_b_block": record.get('device_b_block', ''),
+            "device_b_block_auto": bool(record.get('device_b_block_auto', False)),
+            "device_b_position_x": record.get('device_b_position_x'),
+            "device_b_position_y": record.get('device_b_position_y'),
+            "device_b_block_position_x": record.get('device_b_block_position_x'),
+            "device_b_block_position_y": record.get('device_b_block_position_y'),
+            "device_b_id": self._device_id(db_ip, db_host),
+            "comments": str(record.get('comments', '')).strip(),
+            "updated_by": record['updated_by'],
+            "created_by": record['created_by'],
+            "created_date": current_time,
+            "updated_date": current_time
+        }
+        document["search_keys"] = self._search_keys(document)
+        document.update(self._ip_key_fields(document))
+        return document
+
     def insert_dashboard_connection(self, record):
         try:
             da_ip = str(record.get('device_a_ip', '')).strip()
@@ -177,44 +768,11 @@ class TopologyDBUtils:
             print("DEBUG: No duplicate found -> Inserting new record")
             current_time = datetime.now()
 
-            device_a_pos_x = record.get('device_a_position_x')
-            device_a_pos_y = record.get('device_a_position_y')
-            device_b_pos_x = record.get('device_b_position_x')
-            device_b_pos_y = record.get('device_b_position_y')
-            device_a_block_pos_x = record.get('device_a_block_position_x')
-            device_a_block_pos_y = record.get('device_a_block_position_y')
-            device_b_block_pos_x = record.get('device_b_block_position_x')
-            device_b_block_pos_y = record.get('device_b_block_position_y')
-
-            document = {
-                "device_a_ip": da_ip,
-                "device_a_hostname": da_host,
-                "device_a_interface": da_intf,
-                "device_a_type": da_type,
-                "device_a_vendor": da_vendor,
-                "device_a_block": record.get('device_a_block', ''),
-                "device_a_position_x": device_a_pos_x,
-                "device_a_position_y": device_a_pos_y,
-                "device_a_block_position_x": device_a_block_pos_x,
-                "device_a_block_position_y": device_a_block_pos_y,
-                "device_b_ip": db_ip,
-                "device_b_hostname": db_host,
-                "device_b_interface": db_intf,
-                "device_b_type": db_type,
-                "device_b_vendor": db_vendor,
-                "device_b_block": record.get('device_b_block', ''),
-                "device_b_position_x": device_b_pos_x,
-                "device_b_position_y": device_b_pos_y,
-                "device_b_block_position_x": device_b_block_pos_x,
-                "device_b_block_position_y": device_b_block_pos_y,
-                "comments": comments,
-                "updated_by": record['updated_by'],
-                "created_by": record['created_by'],
-                "created_date": current_time,
-                "updated_date": current_time
-            }
-
+            document = self._connection_document(record, current_time)
             result = self.dashboard_collection.insert_one(document)
+            deltas = self._add_link_deltas({}, [document], 1)
+            self._apply_block_counters(self._upsert_devices([document], record['updated_by'], deltas))
+            self._topology_changed(upserts=[document])
             return {
                 'status': 'Success',
                 'record_id': str(result.inserted_id),
@@ -229,43 +787,147 @@ class TopologyDBUtils:
                 'inserted_count': 0
             }
 
+    def _connection_update_fields(self, record):
+        return {
+            "device_a_ip": record['device_a_ip'],
+            "device_a_hostname": record['device_a_hostname'],
+            "device_a_interface": record['device_a_interface'],
+            "device_a_type": record.get('device_a_type', 'unknown') or 'unknown',
+            "device_a_vendor": record.get('device_a_vendor', 'unknown') or 'unknown',
+            "device_a_block": record.get('device_a_block', '') or '',
+            "device_b_ip": record.get('device_b_ip', '') or '',
+            "device_b_hostname": record['device_b_hostname'],
+            "device_b_interface": record.get('device_b_interface', '') or '',
+            "device_b_type": record.get('device_b_type', 'unknown') or 'unknown',
+            "device_b_vendor": record.get('device_b_vendor', 'unknown') or 'unknown',
+            "device_b_block": record.get('device_b_block', '') or '',
+            "comments": record.get('comments', '') or ''
+        }
+
+    def _connection_derived_fields(self, fields):
+        derived = {
+            f"device_{side}_id": self._device_id(fields[f"device_{side}_ip"], fields[f"device_{side}_hostname"])
+            for side in ('a', 'b')
+        }
+        derived["search_keys"] = self._search_keys(fields)
+        derived.update(self._ip_key_fields(fields))
+        return derived
+
     def update_dashboard_connection(self, record):
         try:
             record_id = self._str_to_objectid(record['record_id'])
             if not record_id:
                 return {'status': 'Failed', 'message': f'Invalid record ID: {record["record_id"]}'}
 
-            update_doc = {
-                "$set": {
-                    "device_a_ip": record['device_a_ip'],
-                    "device_a_hostname": record['device_a_hostname'],
-                    "device_a_interface": record['device_a_interface'],
-                    "device_a_type": record.get('device_a_type', 'unknown') or 'unknown',
-                    "device_a_vendor": record.get('device_a_vendor', 'unknown') or 'unknown',
-                    "device_a_block": record.get('device_a_block', '') or '',
-                    "device_b_ip": record.get('device_b_ip', '') or '',
-                    "device_b_hostname": record['device_b_hostname'],
-                    "device_b_interface": record.get('device_b_interface', '') or '',
-                    "device_b_type": record.get('device_b_type', 'unknown') or 'unknown',
-                    "device_b_vendor": record.get('device_b_vendor', 'unknown') or 'unknown',
-                    "device_b_block": record.get('device_b_block', '') or '',
-                    "comments": record.get('comments', '') or '',
-                    "updated_by": record['updated_by'],
-                    "updated_date": datetime.now()
+            fields = self._connection_update_fields(record)
+            fields["updated_by"] = record['updated_by']
+            fields["updated_date"] = datetime.now()
+
+            # A block stays auto-assigned only while the edit leaves it untouched.
+            update_stage = {field: {"$literal": value} for field, value in fields.items()}
+            for side in ('a', 'b'):
+                update_stage[f"device_{side}_block_auto"] = {
+                    "$and": [
+                        {"$ifNull": [f"$device_{side}_block_auto", False]},
+                        {"$eq": [f"$device_{side}_block", fields[f"device_{side}_block"]]}
+                    ]
                 }
-            }
+            for field, value in self._connection_derived_fields(fields).items():
+                update_stage[field] = {"$literal": value}
 
-            result = self.dashboard_collection.update_one({"_id": record_id}, update_doc)
+            previous = self.dashboard_collection.find_one_and_update(
+                {"_id": record_id}, [{"$set": update_stage}],
+                projection={"device_a_block": 1, "device_b_block": 1, "device_a_id": 1, "device_b_id": 1},
+                return_document=ReturnDocument.BEFORE
+            )
 
-            if result.matched_count == 0:
+            if previous is None:
                 return {
                     'status': 'Failed',
                     'message': f'No record found with ID: {record["record_id"]}'
                 }
 
+            deltas = self._add_link_deltas({}, [previous], -1)
+            self._add_link_deltas(deltas, [fields], 1)
+            self._upsert_devices([fields], record['updated_by'], deltas)
+            self._prune_devices([previous.get('device_a_id'), previous.get('device_b_id')], deltas)
+            self._apply_block_counters(deltas)
+            self._topology_changed(upserts=[dict(fields, _id=record_id)])
+
+            return {
+                'status': 'Success',
+                'rows_updated': 1
+            }
+
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def update_dashboard_connections_bulk(self, records, updated_by):
+        try:
+            current_time = datetime.now()
+            # One result per record, in request order.
+            results = [{'record_id': record['record_id'], 'status': 'Failed'} for record in records]
+            requested = {}
+            for index, record in enumerate(records):
+                record_id = self._str_to_objectid(record['record_id'])
+                if not record_id:
+                    results[index]['message'] = f'Invalid record ID: {record["record_id"]}'
+                elif record_id in requested:
+                    results[index]['message'] = 'Record ID repeated in request'
+                else:
+                    requested[record_id] = (index, record)
+
+            current_rows = {doc['_id']: doc for doc in self.dashboard_collection.find({"_id": {"$in": list(requested)}})}
+
+            operations = []
+            updated = []
+            for record_id, (index, record) in requested.items():
+                current = current_rows.get(record_id)
+                if current is None:
+                    results[index]['message'] = f'No record found with ID: {record["record_id"]}'
+                    continue
+
+                fields = self._connection_update_fields(record)
+                changes = {field: value for field, value in fields.items() if current.get(field) != value}
+                if not changes:
+                    results[index]['status'] = 'Unchanged'
+                    continue
+
+                for field, value in self._connection_derived_fields(fields).items():
+                    if current.get(field) != value:
+                        changes[field] = value
+                # A block stays auto-assigned only while the edit leaves it untouched.
+                for side in ('a', 'b'):
+                    if f"device_{side}_block" in changes:
+                        changes[f"device_{side}_block_auto"] = False
+                changes["updated_by"] = updated_by
+                changes["updated_date"] = current_time
+
+                operations.append(UpdateOne({"_id": record_id}, {"$set": changes}))
+                updated.append((record_id, index, current, fields))
+
+            if operations:
+                self.dashboard_collection.bulk_write(operations, ordered=False)
+
+                deltas = self._add_link_deltas({}, [current for _, _, current, _ in updated], -1)
+                self._add_link_deltas(deltas, [fields for _, _, _, fields in updated], 1)
+                self._upsert_devices([fields for _, _, _, fields in updated], updated_by, deltas)
+                self._prune_devices(
+                    [current.get(f'device_{side}_id') for _, _, current, _ in updated for side in ('a', 'b')], deltas
+                )
+                self._apply_block_counters(deltas)
+                self._topology_changed(upserts=[dict(fields, _id=record_id) for record_id, _, _, fields in updated])
+
+            for _, index, _, _ in updated:
+                results[index]['status'] = 'Success'
+
             return {
                 'status': 'Success',
-                'rows_updated': result.modified_count
+                'rows_updated': len(updated),
+                'rows_unchanged': len([result for result in results if result['status'] == 'Unchanged']),
+                'rows_failed': len([result for result in results if result['status'] == 'Failed']),
+                'results': results
             }
 
         except Exception as e:
@@ -278,9 +940,9 @@ class TopologyDBUtils:
             if not obj_id:
                 return {'status': 'Failed', 'message': f'Invalid record ID: {record_id}'}
 
-            result = self.dashboard_collection.delete_one({"_id": obj_id})
+            deleted_count = len(self._delete_rows({"_id": obj_id}))
 
-            if result.deleted_count == 0:
+            if deleted_count == 0:
                 return {
                     'status': 'Failed',
                     'message': f'No record found with ID: {record_id}'
@@ -288,7 +950,7 @@ class TopologyDBUtils:
 
             return {
                 'status': 'Success',
-                'rows_deleted': result.deleted_count,
+                'rows_deleted': deleted_count,
                 'delete_type': 'hard'
             }
 
@@ -296,51 +958,103 @@ class TopologyDBUtils:
             traceback.print_exc()
             return {'status': 'Failed', 'error': str(e)}
 
-    def get_dashboard_connections(self, search=''):
+    def get_dashboard_connections(self, search='', limit=None, cursor=None, sort_by='created_date', sort_dir='desc', fields=None, cidr=None):
         try:
-            query = {}
+            # Callers that pass neither limit nor cursor still get every matching row, as before paging existed.
+            paged = bool(limit or cursor)
+            limit = max(1, min(int(limit or connections_page_size), connections_max_page_size)) if paged else None
+            direction = 1 if sort_dir == 'asc' else -1
+            fields = list(fields) if fields else list(CONNECTION_RECORD_FIELDS)
 
+            query = {}
+            matched_ids = None
             if search and search.strip():
-                search_term = search.strip()
-                query = {
-                    "$or": [
-                        {"device_a_ip": {"$regex": search_term, "$options": "i"}},
-                        {"device_a_hostname": {"$regex": search_term, "$options": "i"}},
-                        {"device_b_ip": {"$regex": search_term, "$options": "i"}},
-                        {"device_b_hostname": {"$regex": search_term, "$options": "i"}}
-                    ]
-                }
-
-            cursor = self.dashboard_collection.find(query).sort("created_date", -1)
-            records = []
-
-            for doc in cursor:
-                records.append({
-                    'id': str(doc['_id']),
-                    'device_a_ip': doc.get('device_a_ip', ''),
-                    'device_a_hostname': doc.get('device_a_hostname', ''),
-                    'device_a_interface': doc.get('device_a_interface', ''),
-                    'device_a_type': doc.get('device_a_type', ''),
-                    'device_a_vendor': doc.get('device_a_vendor', ''),
-                    'device_a_block': doc.get('device_a_block', ''),
-                    'device_b_ip': doc.get('device_b_ip', ''),
-                    'device_b_hostname': doc.get('device_b_hostname', ''),
-                    'device_b_interface': doc.get('device_b_interface', ''),
-                    'device_b_type': doc.get('device_b_type', ''),
-                    'device_b_vendor': doc.get('device_b_vendor', ''),
-                    'device_b_block': doc.get('device_b_block', ''),
-                    'comments': doc.get('comments', ''),
-                    'updated_by': doc.get('updated_by', ''),
-                    'created_date': doc['created_date'].isoformat() if doc.get('created_date') else None,
-                    'updated_date': doc['updated_date'].isoformat() if doc.get('updated_date') else None
-                })
-
-            total_count = self.dashboard_collection.count_documents(query)
+                if search_index_enabled:
+                    self._ensure_index(connection_search_index)
+                    matched_ids = connection_search_index.search(search)
+                    if len(matched_ids) > search_index_max_matches:
+                        # Too many ids to page in memory; the indexed prefix query bounds the work instead.
+                        matched_ids = None
+                if matched_ids is None:
+                    query = {"search_keys": {"$regex": "^" + re.escape(search.strip().lower())}}
+            if cidr:
+                query = {"$and": [query, self._cidr_query(cidr)]} if query else self._cidr_query(cidr)
+
+            keyset = None
+            if cursor:
+                value, last_id = self._decode_cursor(cursor)
+                keyset = self._keyset_query(sort_by, direction, value, last_id)
+
+            def sort_key(entry):
+                # Missing values sort lowest, as they do in MongoDB.
+                return (0,) if entry[0] is None else (1, entry[0]), entry[1]
+
+            def find_by_ids(ids, fields_projection, extra=None):
+                # $in lists stay bounded so a large match never builds an oversized query document.
+                for start in range(0, len(ids), search_index_fetch_batch_size):
+                    batch_query = {"_id": {"$in": ids[start:start + search_index_fetch_batch_size]}}
+                    yield from self.dashboard_collection.find({"$and": [batch_query, extra]} if extra else batch_query, fields_projection)
+
+            projection = {field: 1 for field in fields}
+            projection[sort_by] = 1
+            for side in ('a', 'b'):
+                for field in ('id', 'ip', 'hostname'):
+                    projection[f"device_{side}_{field}"] = 1
+            sort = [(sort_by, direction), ("_id", direction)]
+
+            if matched_ids is not None:
+                # Only the sort values of the matches are read; the page is cut in memory and just its ids are fetched.
+                keys = sorted(
+                    ((doc.get(sort_by), doc['_id']) for doc in find_by_ids(matched_ids, {sort_by: 1}, self._cidr_query(cidr) if cidr else None)),
+                    key=sort_key, reverse=direction == -1
+                )
+                total_count = len(keys)
+                total_estimated = False
+                if cursor:
+                    after = sort_key((value, last_id))
+                    keys = [key for key in keys if (sort_key(key) > after if direction == 1 else sort_key(key) < after)]
+                page_ids = [key[1] for key in (keys[:limit + 1] if paged else keys)]
+                found = {doc['_id']: doc for doc in find_by_ids(page_ids, projection)}
+                docs = [found[_id] for _id in page_ids if _id in found]
+            elif query:
+                # One round-trip: the indexed match feeds both the page and the total.
+                pipeline = [
+                    {"$match": query},
+                    {"$sort": dict(sort)},
+                    {"$project": projection},
+                    {"$facet": {
+                        "records": ([{"$match": keyset}] if keyset else []) + ([{"$limit": limit + 1}] if paged else []),
+                        "total": [{"$count": "count"}]
+                    }}
+                ]
+                result = next(self.dashboard_collection.aggregate(pipeline, allowDiskUse=True), {})
+                docs = result.get('records', [])
+                total_count = result['total'][0]['count'] if result.get('total') else 0
+                total_estimated = False
+            else:
+                docs = self.dashboard_collection.find(keyset or {}, projection).sort(sort)
+                docs = list(docs.limit(limit + 1) if paged else docs)
+                total_count = self.dashboard_collection.estimated_document_count() if paged else len(docs)
+                total_estimated = paged
+
+            next_cursor = None
+            if paged and len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = self._encode_cursor(docs[-1].get(sort_by), docs[-1]['_id'])
+
+            # Same overlay as the dashboard, so device attributes read the same in both views.
+            devices = self._load_devices({
+                doc.get(f'device_{side}_id') or self._device_id(doc.get(f'device_{side}_ip', ''), doc.get(f'device_{side}_hostname', ''))
+                for doc in docs for side in ('a', 'b')
+            } - {'', None} if paged else None)
+            docs = [self._merge_device_fields(doc, devices) for doc in docs]
 
             return {
                 'status': 'Success',
-                'records': records,
-                'total_count': total_count
+                'records': [self._connection_record(doc, fields) for doc in docs],
+                'total_count': total_count,
+                'total_estimated': total_estimated,
+                'next_cursor': next_cursor
             }
 
         except Exception as e:
@@ -350,20 +1064,26 @@ class TopologyDBUtils:
     def update_device_type(self, device_ip, device_hostname, new_device_type, updated_by):
         try:
             current_time = datetime.now()
+            matches = {"ip": device_ip, "hostname": device_hostname}
 
-            result_a = self.dashboard_collection.update_many(
-                {"device_a_ip": device_ip, "device_a_hostname": device_hostname},
-                {"$set": {"device_a_type": new_device_type, "updated_by": updated_by, "updated_date": current_time}}
-            )
-
-            result_b = self.dashboard_collection.update_many(
-                {"device_b_ip": device_ip, "device_b_hostname": device_hostname},
-                {"$set": {"device_b_type": new_device_type, "updated_by": updated_by, "updated_date": current_time}}
+            # The device document is authoritative; connection rows are only rewritten for a device
+            # that has not been migrated yet.
+            device = self.devices_collection.update_one(
+                {"_id": self._device_id(device_ip, device_hostname)},
+                {"$set": {"type": new_device_type, "updated_by": updated_by, "updated_date": current_time}}
             )
-
-            total_rows_updated = result_a.modified_count + result_b.modified_count
-
-            if total_rows_updated == 0:
+            devices_matched = device.matched_count
+            if devices_matched:
+                total_rows_updated = self.dashboard_collection.count_documents(self._side_match_query(matches))
+            else:
+                stage = self._side_cascade_stage("type", matches, new_device_type)
+                stage["updated_by"] = {"$literal": updated_by}
+                stage["updated_date"] = {"$literal": current_time}
+                total_rows_updated = self.dashboard_collection.update_many(self._side_match_query(matches), [{"$set": stage}]).modified_count
+            if devices_matched or total_rows_updated:
+                self._topology_changed()
+
+            if not devices_matched and total_rows_updated == 0:
                 return {
                     'status': 'Failed',
                     'message': f'No device found with IP: {device_ip} and hostname: {device_hostname}'
@@ -372,6 +1092,7 @@ class TopologyDBUtils:
             return {
                 'status': 'Success',
                 'rows_updated': total_rows_updated,
+                'device_updated': devices_matched > 0,
                 'updated_at': current_time.isoformat()
             }
 
@@ -379,7 +1100,108 @@ class TopologyDBUtils:
             traceback.print_exc()
             return {'status': 'Failed', 'error': str(e)}
 
-    def save_device_positions_bulk(self, positions, changed_by):
+    def update_device_attributes_bulk(self, changes, updated_by):
+        # changes: device id -> {type, vendor, block}; devices sharing the same change form one $switch branch.
+        try:
+            current_time = datetime.now()
+            device_ids = list(changes)
+            previous = {
+                doc['_id']: doc.get('block', '')
+                for doc in self.devices_collection.find({"_id": {"$in": device_ids}}, {"block": 1})
+            }
+            not_found = [device_id for device_id in device_ids if device_id not in previous]
+            device_ids = [device_id for device_id in device_ids if device_id in previous]
+            if not device_ids:
+                return {'status': 'Success', 'devices_updated': 0, 'rows_updated': 0, 'not_found': not_found}
+
+            groups = {}
+            for device_id in device_ids:
+                key = tuple(sorted(changes[device_id].items()))
+                groups.setdefault(key, []).append(device_id)
+
+            stage = {}
+            for side in ('a', 'b'):
+                for field in ('type', 'vendor', 'block'):
+                    branches = [
+                        {"case": {"$in": [f"$device_{side}_id", ids]}, "then": {"$literal": dict(key)[field]}}
+                        for key, ids in groups.items() if field in dict(key)
+                    ]
+                    if branches:
+                        stage[f"device_{side}_{field}"] = {"$switch": {"branches": branches, "default": f"$device_{side}_{field}"}}
+                block_ids = [device_id for key, ids in groups.items() if 'block' in dict(key) for device_id in ids]
+                if block_ids:
+                    # A block set by hand is no longer auto-assigned.
+                    stage[f"device_{side}_block_auto"] = {"$cond": [
+                        {"$in": [f"$device_{side}_id", block_ids]}, False, f"$device_{side}_block_auto"
+                    ]}
+            stage["updated_by"] = {"$literal": updated_by}
+            stage["updated_date"] = {"$literal": current_time}
+
+            device_operations = [
+                UpdateMany({"_id": {"$in": ids}}, {"$set": {**dict(key), "updated_by": updated_by, "updated_date": current_time}})
+                for key, ids in groups.items()
+            ]
+
+            def apply(session):
+                rows = self.dashboard_collection.update_many(
+                    {"$or": [{"device_a_id": {"$in": device_ids}}, {"device_b_id": {"$in": device_ids}}]},
+                    [{"$set": stage}],
+                    session=session
+                )
+                self.devices_collection.bulk_write(device_operations, ordered=False, session=session)
+                return rows.modified_count
+
+            rows_updated = self._run_in_transaction(apply)
+
+            touched_blocks = {previous[device_id] for device_id in device_ids if 'block' in changes[device_id]}
+            touched_blocks.update(changes[device_id]['block'] for device_id in device_ids if 'block' in changes[device_id])
+            if touched_blocks - {''}:
+                self.refresh_block_counters(touched_blocks - {''})
+                position_cache.invalidate()
+            self._topology_changed()
+
+            return {
+                'status': 'Success',
+                'devices_updated': len(device_ids),
+                'rows_updated': rows_updated,
+                'not_found': not_found,
+                'updated_at': current_time.isoformat()
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def _count_position_matches(self, ip_keys, hostname_keys, block_keys):
+        def group_by(field, match):
+            return [{"$match": match}, {"$group": {"_id": f"${field}", "rows": {"$sum": 1}}}]
+
+        facets = {
+            "ip_a": group_by("device_a_ip", {"device_a_ip": {"$in": ip_keys}}),
+            "ip_b": group_by("device_b_ip", {"device_b_ip": {"$in": ip_keys}}),
+            "hostname_a": group_by("device_a_hostname", {"device_a_hostname": {"$in": hostname_keys}, "device_a_ip": {"$in": [None, ""]}}),
+            "hostname_b": group_by("device_b_hostname", {"device_b_hostname": {"$in": hostname_keys}, "device_b_ip": {"$in": [None, ""]}}),
+            "block_a": group_by("device_a_block", {"device_a_block": {"$in": block_keys}}),
+            "block_b": group_by("device_b_block", {"device_b_block": {"$in": block_keys}})
+        }
+        pipeline = [
+            {"$match": {"$or": [
+                {"device_a_ip": {"$in": ip_keys}}, {"device_b_ip": {"$in": ip_keys}},
+                {"device_a_hostname": {"$in": hostname_keys}}, {"device_b_hostname": {"$in": hostname_keys}},
+                {"device_a_block": {"$in": block_keys}}, {"device_b_block": {"$in": block_keys}}
+            ]}},
+            {"$facet": facets}
+        ]
+        result = next(self.dashboard_collection.aggregate(pipeline), {})
+
+        counts = {}
+        for facet, groups in result.items():
+            kind, side = facet.rsplit('_', 1)
+            for group in groups:
+                by_side = counts.setdefault((kind, group['_id']), {'a': 0, 'b': 0})
+                by_side[side] += group['rows']
+        return counts
+
+    def save_device_positions_bulk(self, positions, changed_by, coordinates='absolute'):
         try:
             current_time = datetime.now()
 
@@ -387,8 +1209,7 @@ class TopologyDBUtils:
             block_updates = 0
             per_key_rows = {}
 
-            from utils.topology_utilities import TopologyUtilities
-            topology_utils = TopologyUtilities()
+            topology_utils = self.topology_utils
 
             def clean_key(k):
                 if k is None:
@@ -397,6 +1218,9 @@ class TopologyDBUtils:
                 empty_vals = {'-', '', 'none', 'null', 'undefined', 'n/a', 'na'}
                 return '' if cleaned.lower() in empty_vals else cleaned
 
+            # Classify every key once so matching and writing each take a single round-trip.
+            valid_positions = {}
+            ip_keys = set()
             for key, pos in positions.items():
                 key = clean_key(key)
                 if not key:
@@ -413,63 +1237,130 @@ class TopologyDBUtils:
                     logging.warning(f"Skipping invalid position coordinates for key: {key}")
                     continue
 
-                total_rows_for_key = 0
-
-                if topology_utils.is_ipv4(key):
-                    result_a = self.dashboard_collection.update_many(
-                        {"device_a_ip": key},
-                        {"$set": {"device_a_position_x": x, "device_a_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    result_b = self.dashboard_collection.update_many(
-                        {"device_b_ip": key},
-                        {"$set": {"device_b_position_x": x, "device_b_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    total_rows_for_key = result_a.modified_count + result_b.modified_count
-                    device_updates += total_rows_for_key
-
-                if total_rows_for_key == 0 and not topology_utils.is_ipv4(key):
-                    result_a = self.dashboard_collection.update_many(
-                        {"device_a_hostname": key, "$or": [{"device_a_ip": None}, {"device_a_ip": ""}]},
-                        {"$set": {"device_a_position_x": x, "device_a_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    result_b = self.dashboard_collection.update_many(
-                        {"device_b_hostname": key, "$or": [{"device_b_ip": None}, {"device_b_ip": ""}]},
-                        {"$set": {"device_b_position_x": x, "device_b_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    hostname_rows = result_a.modified_count + result_b.modified_count
-                    total_rows_for_key += hostname_rows
-                    device_updates += hostname_rows
-
-                if total_rows_for_key == 0:
-                    result_ba = self.dashboard_collection.update_many(
-                        {"device_a_block": key},
-                        {"$set": {"device_a_block_position_x": x, "device_a_block_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    result_bb = self.dashboard_collection.update_many(
-                        {"device_b_block": key},
-                        {"$set": {"device_b_block_position_x": x, "device_b_block_position_y": y,
-                                  "updated_date": current_time, "updated_by": changed_by}}
-                    )
-
-                    block_rows = result_ba.modified_count + result_bb.modified_count
-                    total_rows_for_key += block_rows
-                    block_updates += block_rows
+                valid_positions[key] = (x, y)
+                if topology_utils.ip_key(key) is not None:
+                    ip_keys.add(key)
+
+            if not valid_positions:
+                return {
+                    'status': 'Success',
+                    'device_rows_updated': 0,
+                    'block_rows_updated': 0,
+                    'per_key_rows': per_key_rows,
+                    'updated_at': current_time.isoformat()
+                }
+
+            audit = {"updated_date": current_time, "updated_by": changed_by}
+
+            # Migrated devices are a single document each; only the rest fall back to connection rows.
+            device_blocks = {
+                doc['_id']: doc.get('block') or ''
+                for doc in self.devices_collection.find({"_id": {"$in": list(valid_positions)}}, {"_id": 1, "block": 1})
+            }
+            if device_blocks:
+                origins = {}
+                if coordinates == 'absolute':
+                    origins = self.get_block_positions(set(device_blocks.values()) - {''})
+                    # A block moved in the same save is the origin its devices are relative to.
+                    origins.update({
+                        block: {'x': valid_positions[block][0], 'y': valid_positions[block][1]}
+                        for block in set(device_blocks.values())
+                        if block in valid_positions and block not in device_blocks
+                    })
+
+                device_operations = []
+                for key, block in device_blocks.items():
+                    x, y = valid_positions[key]
+                    if coordinates == 'relative' and block:
+                        fields = {"relative_x": x, "relative_y": y}
+                    elif block and block in origins:
+                        fields = {"position_x": x, "position_y": y,
+                                  "relative_x": x - origins[block]['x'], "relative_y": y - origins[block]['y']}
+                    else:
+                        fields = {"position_x": x, "position_y": y, "relative_x": None, "relative_y": None}
+                    device_operations.append(UpdateOne({"_id": key}, {"$set": {**fields, **audit}}))
+                    per_key_rows[key] = 1
+                self.devices_collection.bulk_write(device_operations, ordered=False)
+                device_updates += len(device_blocks)
+
+            row_positions = {key: pos for key, pos in valid_positions.items() if key not in per_key_rows}
+            hostname_keys = [key for key in row_positions if key not in ip_keys]
+            counts = self._count_position_matches(sorted(ip_keys & set(row_positions)), hostname_keys, list(row_positions)) if row_positions else {}
+
+            known_blocks = {
+                doc['block_name'] for doc in self.block_collection.find({"block_name": {"$in": list(row_positions)}}, {"block_name": 1})
+            } if row_positions else set()
+
+            operations = []
+            block_moves = {}
+            for key, (x, y) in row_positions.items():
+                # Same precedence as before: IP rows, then hostname-only rows, then the block.
+                if key in ip_keys and counts.get(('ip', key)):
+                    kind = 'ip'
+                elif key not in ip_keys and counts.get(('hostname', key)):
+                    kind = 'hostname'
+                else:
+                    kind = 'block'
+
+                if kind == 'block':
+                    # A block move is one write to its block document.
+                    total_rows_for_key = 1 if key in known_blocks or counts.get(('block', key)) else 0
+                    if total_rows_for_key:
+                        block_moves[key] = {'x': x, 'y': y}
+                    block_updates += total_rows_for_key
+                    per_key_rows[key] = total_rows_for_key
+                    continue
+
+                if coordinates == 'relative':
+                    # Connection rows only hold absolute coordinates.
+                    logging.warning(f"Skipping relative position for unmigrated device: {key}")
+                    per_key_rows[key] = 0
+                    continue
 
+                matched = counts[(kind, key)]
+                for side in ('a', 'b'):
+                    if not matched[side]:
+                        continue
+                    if kind == 'ip':
+                        query = {f"device_{side}_ip": key}
+                    else:
+                        query = {f"device_{side}_hostname": key, f"device_{side}_ip": {"$in": [None, ""]}}
+                    fields = {f"device_{side}_position_x": x, f"device_{side}_position_y": y}
+                    operations.append(UpdateMany(query, {"$set": {**fields, **audit}}))
+
+                total_rows_for_key = matched['a'] + matched['b']
+                device_updates += total_rows_for_key
                 per_key_rows[key] = total_rows_for_key
 
                 if total_rows_for_key > 50:
                     logging.warning(f"Large position update: Key '{key}' affected {total_rows_for_key} rows")
 
+            # Only a block whose stored origin actually changes counts as moved.
+            stored_blocks = self.get_block_positions(block_moves) if block_moves else {}
+            moved_blocks = {
+                block: pos for block, pos in block_moves.items()
+                if block not in stored_blocks
+                or abs(stored_blocks[block]['x'] - pos['x']) > position_cache.epsilon
+                or abs(stored_blocks[block]['y'] - pos['y']) > position_cache.epsilon
+            }
+
+            if operations:
+                self.dashboard_collection.bulk_write(operations, ordered=False)
+            if operations or device_blocks:
+                self._positions_changed()
+            if moved_blocks:
+                self.save_block_positions(moved_blocks, changed_by)
+
+            stale_keys = set()
+            if moved_blocks:
+                # Devices stored relative to a moved block have new absolute positions.
+                stale_keys.update(doc['_id'] for doc in self.devices_collection.find({"block": {"$in": list(moved_blocks)}}, {"_id": 1}))
+            if coordinates == 'relative':
+                # The absolute position of a relative save is only known once resolved against its block.
+                stale_keys.update(key for key, block in device_blocks.items() if block)
+            # Written keys are cached again by the next dashboard read, at the stamp this write moved to.
+            position_cache.invalidate(stale_keys | {key for key in valid_positions if per_key_rows.get(key)})
+
             total_updates = device_updates + block_updates
             if total_updates > 500:
                 logging.warning(f"Very large bulk update: {total_updates} total rows affected")
@@ -491,6 +1382,9 @@ class TopologyDBUtils:
             inserted_count = 0
             errors = []
             inserted_ids = []
+            inserted_documents = []
+            # One result per record, in request order.
+            results = [{'status': 'Failed'} for _ in records]
 
             for idx, record in enumerate(records):
                 try:
@@ -502,10 +1396,12 @@ class TopologyDBUtils:
                     missing_fields = [field for field in required_fields if not record.get(field)]
                     if missing_fields:
                         errors.append(f"Row {idx + 1}: Missing required fields: {missing_fields}")
+                        results[idx]['message'] = f"Missing required fields: {missing_fields}"
                         continue
 
                     current_time = datetime.now()
                     document = {
+                        "device_a_id": self._device_id(record['device_a_ip'], record['device_a_hostname']),
                         "device_a_ip": record['device_a_ip'],
                         "device_a_hostname": record['device_a_hostname'],
                         "device_a_interface": record['device_a_interface'],
@@ -526,6 +1422,7 @@ class TopologyDBUtils:
                         "device_b_position_y": None,
                         "device_b_block_position_x": None,
                         "device_b_block_position_y": None,
+                        "device_b_id": self._device_id(record['device_b_ip'], record['device_b_hostname']),
                         "comments": record.get('comments', '') or '',
                         "updated_by": record['updated_by'],
                         "created_by": record['created_by'],
@@ -533,18 +1430,29 @@ class TopologyDBUtils:
                         "updated_date": current_time
                     }
 
+                    document["search_keys"] = self._search_keys(document)
+                    document.update(self._ip_key_fields(document))
                     result = self.dashboard_collection.insert_one(document)
                     inserted_ids.append(str(result.inserted_id))
+                    inserted_documents.append(document)
                     inserted_count += 1
+                    results[idx] = {'status': 'Success', 'record_id': str(result.inserted_id)}
 
                 except Exception as e:
                     errors.append(f"Row {idx + 1}: {str(e)}")
+                    results[idx]['message'] = str(e)
+
+            if inserted_documents:
+                deltas = self._add_link_deltas({}, inserted_documents, 1)
+                self._apply_block_counters(self._upsert_devices(inserted_documents, records[0]['updated_by'], deltas))
+                self._topology_changed(upserts=inserted_documents)
 
             result = {
                 'status': 'Success',
                 'inserted_count': inserted_count,
                 'total_records': len(records),
-                'inserted_ids': inserted_ids
+                'inserted_ids': inserted_ids,
+                'results': results
             }
 
             if errors:
@@ -557,12 +1465,108 @@ class TopologyDBUtils:
             traceback.print_exc()
             return {'status': 'Failed', 'error': str(e)}
 
-    def get_network_topology_dashboard_data(self):
+    def _reconcile_block_update(self, doc, record):
+        # Blocks are not part of the connection key; an explicit block in the upload still wins over the stored one.
+        fields = self._connection_update_fields(doc)
+        changed = False
+        for side in ('a', 'b'):
+            endpoint = tuple(str(doc.get(f'device_{side}_{field}', '') or '').strip() for field in ('hostname', 'interface', 'ip'))
+            for upload_side in ('a', 'b'):
+                upload_endpoint = tuple(str(record.get(f'device_{upload_side}_{field}', '') or '').strip() for field in ('hostname', 'interface', 'ip'))
+                if upload_endpoint != endpoint:
+                    continue
+                block = (record.get(f'device_{upload_side}_block') or '').strip()
+                if not record.get(f'device_{upload_side}_block_auto') and block != (doc.get(f'device_{side}_block') or ''):
+                    fields[f'device_{side}_block'] = block
+                    changed = True
+                break
+        return dict(fields, record_id=str(doc['_id'])) if changed else None
+
+    def diff_dashboard_connections(self, keyed_records):
+        # keyed_records maps connection key -> upload record; only keys and ids of stored rows are held in memory.
         try:
-            cursor = self.dashboard_collection.find().sort("created_date", -1)
+            projection = {"comments": 1}
+            for side in ('a', 'b'):
+                for field in ('ip', 'hostname', 'interface', 'type', 'vendor', 'block'):
+                    projection[f"device_{side}_{field}"] = 1
+
+            matched = set()
+            updated = []
+            removed = []
+            for doc in self.dashboard_collection.find({}, projection, batch_size=device_migration_batch_size):
+                key = self.topology_utils.connection_key(doc)
+                if key in keyed_records and key not in matched:
+                    matched.add(key)
+                    update = self._reconcile_block_update(doc, keyed_records[key])
+                    if update:
+                        updated.append(update)
+                    continue
+                # Rows missing from the upload, and extra copies of a row already matched, are both removed.
+                removed.append({
+                    'record_id': str(doc['_id']),
+                    'device_a_hostname': doc.get('device_a_hostname', ''),
+                    'device_a_interface': doc.get('device_a_interface', ''),
+                    'device_b_hostname': doc.get('device_b_hostname', ''),
+                    'device_b_interface': doc.get('device_b_interface', '')
+                })
+
+            return {
+                'status': 'Success',
+                'added': [key for key in keyed_records if key not in matched],
+                'updated': updated,
+                'removed': removed,
+                'unchanged_count': len(matched) - len(updated)
+            }
+
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def reconcile_dashboard_connections(self, records, update_records, remove_ids, updated_by):
+        try:
+            current_time = datetime.now()
+            inserted_ids = []
+            if records:
+                documents = [self._connection_document(record, current_time) for record in records]
+                result = self.dashboard_collection.insert_many(documents, ordered=False)
+                inserted_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+                deltas = self._add_link_deltas({}, documents, 1)
+                self._apply_block_counters(self._upsert_devices(documents, updated_by, deltas))
+                self._topology_changed(upserts=documents)
+
+            updated_count = 0
+            if update_records:
+                update_result = self.update_dashboard_connections_bulk(update_records, updated_by)
+                if update_result['status'] != 'Success':
+                    return update_result
+                updated_count = update_result['rows_updated']
+
+            # Deletes run after the inserts so devices that are still linked keep their documents and positions.
+            object_ids = [self._str_to_objectid(rid) for rid in remove_ids]
+            deleted_count = len(self._delete_rows({"_id": {"$in": [oid for oid in object_ids if oid]}})) if remove_ids else 0
+
+            return {
+                'status': 'Success',
+                'inserted_count': len(inserted_ids),
+                'inserted_ids': inserted_ids,
+                'updated_count': updated_count,
+                'deleted_count': deleted_count
+            }
+
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_network_topology_dashboard_data(self, cidr=None):
+        try:
+            # Read before the rows, so a write racing this read leaves the cached values behind the stamp.
+            position_stamp = self.get_position_stamp()
+            cursor = self.dashboard_collection.find(self._cidr_query(cidr) if cidr else {}).sort("created_date", -1)
+            devices = self._load_devices()
 
             connection_rows = []
             for doc in cursor:
+                doc = self._merge_device_fields(doc, devices)
                 connection_rows.append((
                     doc.get('device_a_ip', ''),
                     doc.get('device_a_hostname', ''),
@@ -592,9 +1596,254 @@ class TopologyDBUtils:
             logging.debug(f"Retrieved {len(connection_rows)} connection rows at {datetime.now()}")
             return {
                 'status': 'Success',
-                'connections': connection_rows
+                'connections': connection_rows,
+                'block_positions': self.get_block_positions(),
+                'relative_positions': self.get_relative_positions(devices),
+                'position_stamp': position_stamp
+            }
+
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_layout_position_rows(self):
+        projection = {"_id": 0}
+        for side in ('a', 'b'):
+            for field in ('id', 'ip', 'hostname', 'type', 'block', 'position_x', 'position_y', 'block_position_x', 'block_position_y'):
+                projection[f"device_{side}_{field}"] = 1
+        devices = self._load_devices()
+        block_positions = self.get_block_positions()
+        relative_positions = self.get_relative_positions(devices)
+        cursor = self.dashboard_collection.find({}, projection).sort("created_date", -1)
+        return (
+            self._merge_block_positions(self._merge_device_fields(doc, devices), block_positions, relative_positions)
+            for doc in cursor
+        )
+
+    def get_layout_occupancy(self, block_names, device_ids):
+        # Grid imports only need the devices of the blocks they touch, plus every block's footprint.
+        # Device documents win; connection rows fill in devices that were never migrated.
+        block_names = [block for block in block_names if block]
+        blocks = {
+            doc['block_name']: {
+                'x': doc.get('position_x'),
+                'y': doc.get('position_y'),
+                'device_count': doc.get('device_count', 0) or 0
+            }
+            for doc in self.block_collection.find({}, {"block_name": 1, "position_x": 1, "position_y": 1, "device_count": 1})
+        }
+
+        # Blocks never given an origin still cover the area their devices sit in.
+        unplaced = [block for block, entry in blocks.items() if entry['x'] is None or entry['y'] is None]
+        if unplaced:
+            pipeline = [
+                {"$match": {"block": {"$in": unplaced}, "position_x": {"$ne": None}, "position_y": {"$ne": None}}},
+                {"$group": {"_id": "$block", "x": {"$avg": "$position_x"}, "y": {"$avg": "$position_y"}}}
+            ]
+            for entry in self.devices_collection.aggregate(pipeline):
+                blocks[entry['_id']].update({'x': entry['x'], 'y': entry['y']})
+        blocks = {block: entry for block, entry in blocks.items() if entry['x'] is not None and entry['y'] is not None}
+
+        device_ids = [device_id for device_id in device_ids if device_id]
+        query = {"$or": [
+            {"block": {"$in": block_names + ['', None]}},
+            {"_id": {"$in": device_ids}}
+        ]}
+        projection = {"ip": 1, "hostname": 1, "block": 1, "position_x": 1, "position_y": 1, "relative_x": 1, "relative_y": 1}
+        rows = []
+        covered = set()
+        for doc in self.devices_collection.find(query, projection):
+            covered.add(doc['_id'])
+            block = doc.get('block') or ''
+            origin = blocks.get(block)
+            if origin and doc.get('relative_x') is not None and doc.get('relative_y') is not None:
+                position = (origin['x'] + doc['relative_x'], origin['y'] + doc['relative_y'])
+            else:
+                position = (doc.get('position_x'), doc.get('position_y'))
+            rows.append({
+                "device_a_ip": doc.get('ip', ''),
+                "device_a_hostname": doc.get('hostname', ''),
+                "device_a_block": block,
+                "device_a_position_x": position[0],
+                "device_a_position_y": position[1],
+                "device_a_block_position_x": origin['x'] if origin else None,
+                "device_a_block_position_y": origin['y'] if origin else None
+            })
+
+        # Devices that have no device document yet are only known from their connection rows.
+        side_query = []
+        for side in ('a', 'b'):
+            side_query.append({f"device_{side}_block": {"$in": block_names + ['', None]}})
+            for field in ('id', 'ip', 'hostname'):
+                side_query.append({f"device_{side}_{field}": {"$in": device_ids}})
+        requested_blocks = set(block_names)
+        requested_ids = set(device_ids)
+        side_fields = ('ip', 'hostname', 'block', 'position_x', 'position_y', 'block_position_x', 'block_position_y')
+        projection = {f"device_{side}_{field}": 1 for side in ('a', 'b') for field in side_fields}
+        for row in self.dashboard_collection.find({"$or": side_query}, projection):
+            for side in ('a', 'b'):
+                device_id = self.topology_utils.compute_device_id(row.get(f'device_{side}_ip', ''), row.get(f'device_{side}_hostname', ''))
+                block = row.get(f'device_{side}_block') or ''
+                # Only sides that were asked for, so a block's device count is never built from part of its rows.
+                if not device_id or device_id in covered or (block and block not in requested_blocks and device_id not in requested_ids):
+                    continue
+                covered.add(device_id)
+                origin = blocks.get(block)
+                rows.append({
+                    "device_a_ip": row.get(f'device_{side}_ip', ''),
+                    "device_a_hostname": row.get(f'device_{side}_hostname', ''),
+                    "device_a_block": block,
+                    "device_a_position_x": row.get(f'device_{side}_position_x'),
+                    "device_a_position_y": row.get(f'device_{side}_position_y'),
+                    "device_a_block_position_x": origin['x'] if origin else row.get(f'device_{side}_block_position_x'),
+                    "device_a_block_position_y": origin['y'] if origin else row.get(f'device_{side}_block_position_y')
+                })
+        return {'rows': rows, 'blocks': blocks}
+
+    def _device_sides_stages(self):
+        # One entry per connection side, keyed like compute_device_id for rows written before device ids existed.
+        def side(prefix):
+            ip = {"$trim": {"input": {"$ifNull": [f"${prefix}_ip", ""]}}}
+            hostname = {"$trim": {"input": {"$ifNull": [f"${prefix}_hostname", ""]}}}
+            return {
+                "id": {"$ifNull": [f"${prefix}_id", {"$cond": [{"$gt": [{"$strLenCP": ip}, 0]}, ip, hostname]}]},
+                "ip": f"${prefix}_ip",
+                "hostname": f"${prefix}_hostname",
+                "interface": f"${prefix}_interface",
+                "type": f"${prefix}_type",
+                "vendor": f"${prefix}_vendor",
+                "block": f"${prefix}_block"
+            }
+
+        return [
+            {"$sort": {"created_date": -1}},
+            {"$project": {"_id": 0, "sides": [side("device_a"), side("device_b")]}},
+            {"$unwind": "$sides"},
+            {"$replaceRoot": {"newRoot": "$sides"}},
+            {"$match": {"id": {"$nin": ["", None]}}}
+        ]
+
+    def _device_overlay_stages(self):
+        # Device documents win field by field over the newest row, as in the dashboard and inventory.
+        def overlay(field):
+            return {"$let": {
+                "vars": {"device": {"$arrayElemAt": ["$device", 0]}},
+                "in": {"$ifNull": [f"$$device.{field}", f"${field}"]}
+            }}
+
+        return [
+            {"$lookup": {"from": topology_devices_collection, "localField": "_id", "foreignField": "_id", "as": "device"}},
+            {"$set": {field: overlay(field) for field in ('type', 'vendor', 'block')}},
+            {"$unset": "device"}
+        ]
+
+    def get_topology_stats(self, top_n):
+        try:
+            def count_by(field):
+                return [
+                    {"$group": {"_id": {"$ifNull": [f"${field}", ""]}, "devices": {"$sum": 1}}},
+                    {"$sort": {"devices": -1, "_id": 1}}
+                ]
+
+            pipeline = self._device_sides_stages() + [
+                {"$group": {
+                    "_id": "$id",
+                    "ip": {"$first": "$ip"},
+                    "hostname": {"$first": "$hostname"},
+                    "type": {"$first": "$type"},
+                    "vendor": {"$first": "$vendor"},
+                    "block": {"$first": "$block"},
+                    "degree": {"$sum": 1}
+                }}
+            ] + self._device_overlay_stages() + [
+                {"$facet": {
+                    "devices": [{"$count": "count"}],
+                    "by_vendor": count_by("vendor"),
+                    "by_type": count_by("type"),
+                    "by_block": count_by("block"),
+                    "degree_distribution": [
+                        {"$group": {"_id": "$degree", "devices": {"$sum": 1}}},
+                        {"$sort": {"_id": 1}}
+                    ],
+                    "top_degree": [
+                        {"$sort": {"degree": -1, "_id": 1}},
+                        {"$limit": top_n}
+                    ]
+                }}
+            ]
+            result = next(self.dashboard_collection.aggregate(pipeline, allowDiskUse=True), {})
+
+            def counts(entries):
+                return [{'value': entry['_id'], 'devices': entry['devices']} for entry in entries]
+
+            return {
+                'status': 'Success',
+                'totals': {
+                    'devices': result['devices'][0]['count'] if result.get('devices') else 0,
+                    'links': self.dashboard_collection.estimated_document_count(),
+                    'blocks': len([entry for entry in result.get('by_block', []) if entry['_id']])
+                },
+                'by_vendor': counts(result.get('by_vendor', [])),
+                'by_type': counts(result.get('by_type', [])),
+                'by_block': counts(result.get('by_block', [])),
+                'degree_distribution': [
+                    {'degree': entry['_id'], 'devices': entry['devices']} for entry in result.get('degree_distribution', [])
+                ],
+                'top_degree': [
+                    {
+                        'id': entry['_id'],
+                        'hostname': entry.get('hostname', ''),
+                        'ip': entry.get('ip', ''),
+                        'type': entry.get('type', ''),
+                        'block': entry.get('block', ''),
+                        'degree': entry['degree']
+                    }
+                    for entry in result.get('top_degree', [])
+                ]
             }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_device_inventory(self):
+        try:
+            pipeline = self._device_sides_stages() + [
+                {"$group": {
+                    "_id": "$id",
+                    "ip": {"$first": "$ip"},
+                    "hostname": {"$first": "$hostname"},
+                    "type": {"$first": "$type"},
+                    "vendor": {"$first": "$vendor"},
+                    "block": {"$first": "$block"},
+                    "degree": {"$sum": 1},
+                    "interfaces": {"$addToSet": "$interface"}
+                }},
+                {"$project": {
+                    "ip": 1, "hostname": 1, "type": 1, "vendor": 1, "block": 1, "degree": 1,
+                    "interface_count": {"$size": {"$setDifference": ["$interfaces", ["", None]]}}
+                }}
+            ]
+            devices = self._load_devices()
+
+            inventory = []
+            for entry in self.dashboard_collection.aggregate(pipeline, allowDiskUse=True):
+                device = {
+                    'id': entry['_id'],
+                    'ip': entry.get('ip') or '',
+                    'hostname': entry.get('hostname') or '',
+                    'type': entry.get('type') or '',
+                    'vendor': entry.get('vendor') or '',
+                    'block': entry.get('block') or '',
+                    'degree': entry['degree'],
+                    'interface_count': entry['interface_count']
+                }
+                for field in ('type', 'vendor', 'block'):
+                    if devices.get(device['id'], {}).get(field) is not None:
+                        device[field] = devices[device['id']][field]
+                device['ip_key'] = self.topology_utils.ip_key(device['ip'])
+                inventory.append(device)
 
+            return {'status': 'Success', 'devices': inventory}
         except Exception as e:
             traceback.print_exc()
             return {'status': 'Failed', 'error': str(e)}
@@ -607,7 +1856,10 @@ class TopologyDBUtils:
             for doc in cursor:
                 blocks.append({
                     'ID': str(doc['_id']),
-                    'BLOCK_NAME': doc.get('block_name', '')
+                    'BLOCK_NAME': doc.get('block_name', ''),
+                    'DEVICE_COUNT': doc.get('device_count', 0),
+                    'LINK_COUNT': doc.get('link_count', 0),
+                    'INTER_BLOCK_LINK_COUNT': doc.get('inter_block_link_count', 0)
                 })
 
             return {
@@ -630,6 +1882,7 @@ class TopologyDBUtils:
             }
 
             result = self.block_collection.insert_one(document)
+            self.refresh_block_counters([data['block_name']])
 
             return {
                 'status': 'Success',
@@ -656,26 +1909,44 @@ class TopologyDBUtils:
             old_block_name = old_block.get('block_name', '')
             new_block_name = data['block_name']
 
-            self.block_collection.update_one(
-                {"_id": block_id},
-                {"$set": {"block_name": new_block_name, "updated_date": current_time, "updated_by": data['updated_by']}}
-            )
-
-            self.dashboard_collection.update_many(
-                {"device_a_block": old_block_name},
-                {"$set": {"device_a_block": new_block_name, "updated_date": current_time, "updated_by": data['updated_by']}}
-            )
-
-            self.dashboard_collection.update_many(
-                {"device_b_block": old_block_name},
-                {"$set": {"device_b_block": new_block_name, "updated_date": current_time, "updated_by": data['updated_by']}}
-            )
+            matches = {"block": old_block_name}
+            stage = self._side_cascade_stage("block", matches, new_block_name)
+            stage["updated_date"] = {"$literal": current_time}
+            stage["updated_by"] = {"$literal": data['updated_by']}
+
+            def apply(session):
+                # The block document goes first so a duplicate name aborts before any row changes.
+                self.block_collection.update_one(
+                    {"_id": block_id, "block_name": old_block_name},
+                    {"$set": {"block_name": new_block_name, "updated_date": current_time, "updated_by": data['updated_by']}},
+                    session=session
+                )
+                rows = self.dashboard_collection.update_many(self._side_match_query(matches), [{"$set": stage}], session=session)
+                self.devices_collection.update_many(
+                    {"block": old_block_name},
+                    {"$set": {"block": new_block_name, "updated_date": current_time, "updated_by": data['updated_by']}},
+                    session=session
+                )
+                return rows.modified_count
+
+            rows_updated = self._run_in_transaction(apply)
+            if rows_updated:
+                self._topology_changed()
+
+            # Nothing cached or buffered in this process may still refer to the old name.
+            renamed_devices = {doc['_id'] for doc in self.devices_collection.find({"block": new_block_name}, {"_id": 1})}
+
+            def forget_old_name():
+                position_write_buffer.rename_key(old_block_name, new_block_name)
+                position_cache.invalidate({old_block_name, new_block_name} | renamed_devices)
+            self._after_commit(forget_old_name)
 
             return {
                 'status': 'Success',
                 'block_id': data['block_id'],
                 'old_block_name': old_block_name,
                 'new_block_name': new_block_name,
+                'rows_updated': rows_updated,
                 'data': data
             }
         except Exception as e:
@@ -696,12 +1967,10 @@ class TopologyDBUtils:
 
             block_name = block.get('block_name', '')
 
-            usage_count = self.dashboard_collection.count_documents({
-                "$or": [
-                    {"device_a_block": block_name},
-                    {"device_b_block": block_name}
-                ]
-            })
+            if 'link_count' not in block or 'device_count' not in block:
+                block.update(self.refresh_block_counters([block_name])[block_name])
+
+            usage_count = max(block.get('device_count', 0), block.get('link_count', 0))
 
             if usage_count > 0:
                 return {
@@ -740,11 +2009,12 @@ class TopologyDBUtils:
                     'deleted_count': 0
                 }
 
-            result = self.dashboard_collection.delete_many({"_id": {"$in": object_ids}})
+            deleted_ids = [str(row_id) for row_id in self._delete_rows({"_id": {"$in": object_ids}})]
 
             return {
                 'status': 'Success',
-                'deleted_count': result.deleted_count,
+                'deleted_count': len(deleted_ids),
+                'deleted_ids': deleted_ids,
                 'record_ids': record_ids,
                 'updated_by': updated_by
             }
@@ -758,16 +2028,16 @@ class TopologyDBUtils:
             hostname = hostname.strip() if hostname else ''
             ip = ip.strip() if ip else ''
 
-            result = self.dashboard_collection.delete_many({
+            deleted_count = len(self._delete_rows({
                 "$or": [
                     {"device_a_hostname": hostname, "device_a_ip": ip},
                     {"device_b_hostname": hostname, "device_b_ip": ip}
                 ]
-            })
+            }))
 
             return {
                 'status': 'Success',
-                'rows_deleted': result.deleted_count,
+                'rows_deleted': deleted_count,
                 'hostname': hostname,
                 'ip': ip,
                 'updated_by': updated_by
@@ -780,6 +2050,10 @@ class TopologyDBUtils:
     def delete_all_topology_table_records(self, updated_by):
         try:
             result = self.dashboard_collection.delete_many({})
+            self.devices_collection.delete_many({})
+            self.block_collection.update_many({}, {"$set": {"device_count": 0, "link_count": 0, "inter_block_link_count": 0}})
+            self._topology_changed(clear=True)
+            position_cache.invalidate()
             return {
                 'status': 'Success',
                 'deleted_count': result.deleted_count,
@@ -793,41 +2067,329 @@ class TopologyDBUtils:
         try:
             current_time = datetime.now()
 
-            created_count = 0
-            skipped_count = 0
-            created_block_ids = []
+            block_names = []
             skipped_blocks = []
-
             for record in data:
                 block_name = record['block_name']
-
-                existing_block = self.block_collection.find_one({"block_name": block_name})
-
-                if existing_block:
-                    skipped_count += 1
+                if block_name in block_names:
                     skipped_blocks.append(block_name)
                 else:
-                    document = {
+                    block_names.append(block_name)
+
+            operations = [
+                UpdateOne(
+                    {"block_name": block_name},
+                    {"$setOnInsert": {
                         "block_name": block_name,
                         "created_date": current_time,
                         "updated_date": current_time,
                         "updated_by": created_by,
                         "created_by": created_by
-                    }
+                    }},
+                    upsert=True
+                )
+                for block_name in block_names
+            ]
+
+            upserted = {}
+            if operations:
+                try:
+                    result = self.block_collection.bulk_write(operations, ordered=False)
+                    upserted = result.upserted_ids
+                except BulkWriteError as e:
+                    # A concurrent creator won the unique index race; that name counts as skipped.
+                    if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                        raise
+                    upserted = {entry['index']: entry['_id'] for entry in e.details.get('upserted', [])}
+
+            created_block_names = [block_names[index] for index in sorted(upserted)]
+            created_block_ids = [str(upserted[index]) for index in sorted(upserted)]
+            skipped_blocks = [block_name for index, block_name in enumerate(block_names) if index not in upserted] + skipped_blocks
 
-                    result = self.block_collection.insert_one(document)
-                    created_count += 1
-                    created_block_ids.append(str(result.inserted_id))
+            if created_block_names:
+                self.refresh_block_counters(created_block_names)
 
             return {
                 'status': 'Success',
-                'created_count': created_count,
-                'skipped_count': skipped_count,
+                'created_count': len(created_block_names),
+                'skipped_count': len(skipped_blocks),
                 'total_processed': len(data),
                 'created_block_ids': created_block_ids,
+                'created_blocks': created_block_names,
                 'skipped_blocks': skipped_blocks,
                 'data': data
             }
         except Exception as e:
             traceback.print_exc()
             return {'status': 'Failed', 'error': str(e)}
+
+    def migrate_devices(self, updated_by, batch_size=device_migration_batch_size):
+        try:
+            current_time = datetime.now()
+            projection = {"created_date": 1, "search_keys": 1}
+            for side in ('a', 'b'):
+                for field in ('id', 'ip', 'ip_key', 'hostname', 'type', 'vendor', 'block', 'position_x', 'position_y'):
+                    projection[f"device_{side}_{field}"] = 1
+
+            # Newest rows first, matching the precedence the dashboard read path has always used.
+            devices = {}
+            rows_linked = 0
+            row_operations = []
+            cursor = self.dashboard_collection.find({}, projection, no_cursor_timeout=True, batch_size=batch_size).sort("created_date", -1)
+            try:
+                for doc in cursor:
+                    ids = {}
+                    for side in ('a', 'b'):
+                        device_id = self._device_id(doc.get(f'device_{side}_ip', ''), doc.get(f'device_{side}_hostname', ''))
+                        ids[side] = device_id
+                        if not device_id:
+                            continue
+                        device = devices.setdefault(device_id, {
+                            "ip": self.topology_utils.clean_field_value(doc.get(f'device_{side}_ip', '')),
+                            "ip_key": self.topology_utils.ip_key(doc.get(f'device_{side}_ip', '')),
+                            "hostname": self.topology_utils.clean_field_value(doc.get(f'device_{side}_hostname', '')),
+                            "type": doc.get(f'device_{side}_type') or 'unknown',
+                            "vendor": doc.get(f'device_{side}_vendor') or 'unknown',
+                            "block": doc.get(f'device_{side}_block') or '',
+                            "position_x": None,
+                            "position_y": None
+                        })
+                        pos_x = doc.get(f'device_{side}_position_x')
+                        pos_y = doc.get(f'device_{side}_position_y')
+                        if device['position_x'] is None and pos_x is not None and pos_y is not None:
+                            device['position_x'] = float(pos_x)
+                            device['position_y'] = float(pos_y)
+
+                    row_fields = {"device_a_id": ids['a'], "device_b_id": ids['b'], "search_keys": self._search_keys(doc)}
+                    row_fields.update(self._ip_key_fields(doc))
+                    if any(doc.get(field) != value for field, value in row_fields.items()):
+                        row_operations.append(UpdateOne({"_id": doc['_id']}, {"$set": row_fields}))
+                    if len(row_operations) >= batch_size:
+                        rows_linked += self.dashboard_collection.bulk_write(row_operations, ordered=False).modified_count
+                        row_operations = []
+            finally:
+                cursor.close()
+
+            if row_operations:
+                rows_linked += self.dashboard_collection.bulk_write(row_operations, ordered=False).modified_count
+
+            # Documents written since the cut-over keep their values; only missing fields are filled.
+            devices_created = 0
+            devices_filled = 0
+            device_operations = []
+            for device_id, fields in devices.items():
+                stage = {field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in fields.items()}
+                stage["created_by"] = {"$ifNull": ["$created_by", {"$literal": updated_by}]}
+                stage["created_date"] = {"$ifNull": ["$created_date", {"$literal": current_time}]}
+                stage["updated_by"] = {"$ifNull": ["$updated_by", {"$literal": updated_by}]}
+                stage["updated_date"] = {"$ifNull": ["$updated_date", {"$literal": current_time}]}
+                device_operations.append(UpdateOne({"_id": device_id}, [{"$set": stage}], upsert=True))
+                if len(device_operations) >= batch_size:
+                    result = self.devices_collection.bulk_write(device_operations, ordered=False)
+                    devices_created += result.upserted_count
+                    devices_filled += result.modified_count
+                    device_operations = []
+            if device_operations:
+                result = self.devices_collection.bulk_write(device_operations, ordered=False)
+                devices_created += result.upserted_count
+                devices_filled += result.modified_count
+
+            self.reconcile_block_counters(updated_by)
+            if rows_linked:
+                self._topology_changed()
+
+            return {
+                'status': 'Success',
+                'devices_found': len(devices),
+                'devices_created': devices_created,
+                'devices_filled': devices_filled,
+                'rows_linked': rows_linked
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def migrate_block_positions(self, updated_by):
+        try:
+            latest = {}
+            for side in ('a', 'b'):
+                pipeline = [
+                    {"$match": {
+                        f"device_{side}_block": {"$nin": [None, ""]},
+                        f"device_{side}_block_position_x": {"$ne": None},
+                        f"device_{side}_block_position_y": {"$ne": None}
+                    }},
+                    {"$sort": {"created_date": -1}},
+                    {"$group": {
+                        "_id": f"$device_{side}_block",
+                        "x": {"$first": f"$device_{side}_block_position_x"},
+                        "y": {"$first": f"$device_{side}_block_position_y"},
+                        "created_date": {"$first": "$created_date"}
+                    }}
+                ]
+                for group in self.dashboard_collection.aggregate(pipeline, allowDiskUse=True):
+                    current = latest.get(group['_id'])
+                    if current is None or (group['created_date'] or datetime.min) > (current['created_date'] or datetime.min):
+                        latest[group['_id']] = group
+
+            # Positions already stored on block documents are kept.
+            blocks_written = self.save_block_positions(
+                {name: {'x': group['x'], 'y': group['y']} for name, group in latest.items()},
+                updated_by, fill_only=True
+            )
+            return {
+                'status': 'Success',
+                'blocks_found': len(latest),
+                'blocks_written': blocks_written
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def migrate_relative_positions(self, updated_by):
+        try:
+            current_time = datetime.now()
+            block_positions = self.get_block_positions()
+            query = {
+                "block": {"$in": list(block_positions)},
+                "position_x": {"$ne": None},
+                "position_y": {"$ne": None},
+                "relative_x": None
+            }
+            operations = []
+            for doc in self.devices_collection.find(query, {"block": 1, "position_x": 1, "position_y": 1}):
+                origin = block_positions[doc['block']]
+                operations.append(UpdateOne({"_id": doc['_id'], "relative_x": None}, {"$set": {
+                    "relative_x": float(doc['position_x']) - origin['x'],
+                    "relative_y": float(doc['position_y']) - origin['y'],
+                    "updated_date": current_time,
+                    "updated_by": updated_by
+                }}))
+
+            devices_converted = 0
+            for start in range(0, len(operations), device_migration_batch_size):
+                result = self.devices_collection.bulk_write(operations[start:start + device_migration_batch_size], ordered=False)
+                devices_converted += result.modified_count
+            if devices_converted:
+                self._positions_changed()
+            position_cache.invalidate()
+
+            return {
+                'status': 'Success',
+                'devices_found': len(operations),
+                'devices_converted': devices_converted
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def reconcile_block_counters(self, updated_by):
+        try:
+            current_time = datetime.now()
+            counters = self._compute_block_counters()
+            fields = ('device_count', 'link_count', 'inter_block_link_count')
+            blocks_found = 0
+            operations = []
+            for doc in self.block_collection.find({}, {"block_name": 1, **{field: 1 for field in fields}}):
+                blocks_found += 1
+                expected = counters.get(doc.get('block_name', ''), {field: 0 for field in fields})
+                if any(doc.get(field) != expected[field] for field in fields):
+                    operations.append(UpdateOne(
+                        {"_id": doc['_id']},
+                        {"$set": {**expected, "updated_date": current_time, "updated_by": updated_by}}
+                    ))
+            if operations:
+                self.block_collection.bulk_write(operations, ordered=False)
+            return {'status': 'Success', 'blocks_found': blocks_found, 'blocks_corrected': len(operations)}
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def get_block_rules(self):
+        return self.block_rules_collection.find_one({"_id": "active"})
+
+    def save_block_rules(self, rules, updated_by):
+        try:
+            current_time = datetime.now()
+            result = self.block_rules_collection.find_one_and_update(
+                {"_id": "active"},
+                {
+                    "$set": {"rules": rules, "updated_date": current_time, "updated_by": updated_by},
+                    "$inc": {"version": 1}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return {
+                'status': 'Success',
+                'version': result.get('version'),
+                'rules_count': len(rules),
+                'updated_at': current_time.isoformat()
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
+
+    def _block_reclassification_query(self, include_legacy):
+        clauses = [{"device_a_block_auto": True}, {"device_b_block_auto": True}]
+        if include_legacy:
+            clauses += [{"device_a_block_auto": {"$exists": False}}, {"device_b_block_auto": {"$exists": False}}]
+        return {"$or": clauses}
+
+    def count_block_reclassification_rows(self, include_legacy=False):
+        return self.dashboard_collection.count_documents(self._block_reclassification_query(include_legacy))
+
+    def iter_block_reclassification_rows(self, include_legacy=False, batch_size=1000):
+        projection = {
+            "device_a_ip": 1, "device_a_hostname": 1, "device_a_type": 1, "device_a_block": 1, "device_a_block_auto": 1,
+            "device_b_ip": 1, "device_b_hostname": 1, "device_b_type": 1, "device_b_block": 1, "device_b_block_auto": 1
+        }
+        return self.dashboard_collection.find(
+            self._block_reclassification_query(include_legacy), projection,
+            no_cursor_timeout=True, batch_size=batch_size
+        )
+
+    def apply_block_reassignments(self, changes, updated_by):
+        try:
+            current_time = datetime.now()
+            operations = []
+            for change in changes:
+                side = change['side']
+                operations.append(UpdateOne(
+                    {"_id": change['_id'], f"device_{side}_block": change['old_block']},
+                    {"$set": {
+                        f"device_{side}_block": change['new_block'],
+                        f"device_{side}_block_auto": True,
+                        f"device_{side}_block_position_x": None,
+                        f"device_{side}_block_position_y": None,
+                        "updated_date": current_time,
+                        "updated_by": updated_by
+                    }}
+                ))
+
+            if not operations:
+                return {'status': 'Success', 'matched_count': 0, 'modified_count': 0}
+
+            result = self.dashboard_collection.bulk_write(operations, ordered=False)
+
+            device_operations = [
+                UpdateOne(
+                    {"_id": self._device_id(change['ip'], change['hostname']), "block": change['old_block']},
+                    {"$set": {"block": change['new_block'], "updated_date": current_time, "updated_by": updated_by}}
+                )
+                for change in changes if self._device_id(change['ip'], change['hostname'])
+            ]
+            if device_operations:
+                self.devices_collection.bulk_write(device_operations, ordered=False)
+            touched_blocks = {change['old_block'] for change in changes} | {change['new_block'] for change in changes}
+            self.refresh_block_counters(touched_blocks - {''})
+            if result.modified_count:
+                self._topology_changed()
+            return {
+                'status': 'Success',
+                'matched_count': result.matched_count,
+                'modified_count': result.modified_count
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {'status': 'Failed', 'error': str(e)}
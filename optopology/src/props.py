@@ -11,7 +11,57 @@ mongo_db = os.environ.get('MONGO_DB', 'optopology')
 
 # Collections
 topology_dashboard_collection = 'network_topology_dashboard'
+topology_meta_collection = 'network_topology_meta'
 topology_block_collection = 'network_topology_block'
+topology_block_rules_collection = 'network_topology_block_rules'
+topology_devices_collection = 'network_topology_devices'
+
+# Block classification rules
+block_rules_refresh_seconds = int(os.environ.get('BLOCK_RULES_REFRESH_SECONDS', 60))
+block_rules_cache_size = 4096
+block_reclassify_batch_size = 1000
+block_reclassify_batch_pause_seconds = 0.05
+block_reclassify_max_diff_samples = 500
+
+# Device collection migration
+device_migration_batch_size = 1000
+
+# Position write-behind buffer. The buffer lives in one process, so it is only used when uWSGI runs a single worker.
+position_write_behind_enabled = os.environ.get('POSITION_WRITE_BEHIND', 'true').lower() == 'true'
+position_flush_interval_seconds = float(os.environ.get('POSITION_FLUSH_INTERVAL_SECONDS', 1.0))
+position_flush_max_keys = 2000
+# A batch that keeps failing is retried with doubling delays, then dropped and reported.
+position_flush_max_retries = int(os.environ.get('POSITION_FLUSH_MAX_RETRIES', 5))
+position_flush_max_backoff_seconds = float(os.environ.get('POSITION_FLUSH_MAX_BACKOFF_SECONDS', 30.0))
+
+# Delta-only position saves
+position_epsilon = float(os.environ.get('POSITION_EPSILON', 0.5))
+position_cache_ttl_seconds = int(os.environ.get('POSITION_CACHE_TTL_SECONDS', 300))
+
+# Connection listing
+connections_page_size = int(os.environ.get('CONNECTIONS_PAGE_SIZE', 100))
+connections_max_page_size = 1000
+devices_page_size = int(os.environ.get('DEVICES_PAGE_SIZE', 100))
+devices_max_page_size = 1000
+
+# In-process trigram search index
+search_index_enabled = os.environ.get('SEARCH_INDEX', 'true').lower() == 'true'
+search_index_refresh_seconds = float(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 1.0))
+# Searches matching more rows than this use the indexed prefix query; ids go to MongoDB in batches of search_index_fetch_batch_size.
+search_index_max_matches = int(os.environ.get('SEARCH_INDEX_MAX_MATCHES', 20000))
+search_index_fetch_batch_size = 1000
+device_suggest_limit = 10
+device_suggest_max_limit = 50
+
+# Topology version cached queries
+query_cache_max_entries = 64
+stats_top_degree_limit = 20
+
+# Batch endpoint
+batch_max_operations = 200
+
+# Layout engines
+force_layout_iterations = 50
 
 num_of_threads = 300
 ssh_timeout = 60
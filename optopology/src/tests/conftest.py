@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other from the src root (e.g. "from utils.x import ..."), as they do under uWSGI.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
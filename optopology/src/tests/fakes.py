@@ -0,0 +1,55 @@
+from db.topology_db_utils import TopologyDBUtils
+from utils.topology_utilities import TopologyUtilities
+
+
+def _matches(doc, query):
+    # Just the operators the code under test sends.
+    for field, condition in query.items():
+        if field == '$and':
+            if not all(_matches(doc, part) for part in condition):
+                return False
+        elif field == '$or':
+            if not any(_matches(doc, part) for part in condition):
+                return False
+        elif isinstance(condition, dict) and '$in' in condition:
+            if doc.get(field) not in condition['$in']:
+                return False
+        elif isinstance(condition, dict) and '$ne' in condition:
+            if doc.get(field) == condition['$ne']:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.queries = []
+
+    def find(self, query=None, projection=None, **kwargs):
+        self.queries.append(query or {})
+        return [dict(doc) for doc in self.docs if _matches(doc, query or {})]
+
+    def aggregate(self, pipeline, **kwargs):
+        # Enough for the block-average pipeline in get_layout_occupancy.
+        match = pipeline[0]['$match']
+        groups = {}
+        for doc in self.docs:
+            if _matches(doc, match):
+                groups.setdefault(doc['block'], []).append(doc)
+        return [
+            {'_id': block, 'x': sum(d['position_x'] for d in docs) / len(docs), 'y': sum(d['position_y'] for d in docs) / len(docs)}
+            for block, docs in groups.items()
+        ]
+
+
+def make_db_utils(**collections):
+    # A TopologyDBUtils without a server; only the given collections exist.
+    db_utils = object.__new__(TopologyDBUtils)
+    db_utils.topology_utils = TopologyUtilities()
+    db_utils._session = None
+    db_utils._commit_hooks = None
+    for name, docs in collections.items():
+        setattr(db_utils, name, FakeCollection(docs))
+    return db_utils
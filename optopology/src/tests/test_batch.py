@@ -0,0 +1,146 @@
+import pytest
+
+from topology_app import TopologyApp
+
+
+class FakeDBUtils:
+    def __init__(self, atomic=True):
+        self.atomic = atomic
+        self.discarded = 0
+
+    def run_in_session(self, callback):
+        return callback(object() if self.atomic else None)
+
+    def discard_uncommitted_state(self):
+        self.discarded += 1
+
+
+@pytest.fixture
+def app():
+    service = object.__new__(TopologyApp)
+    service.db_utils = FakeDBUtils()
+    service._enforce_allowed = lambda label: ('tester', None)
+    service.calls = []
+
+    def update_records(records):
+        service.calls.append(('update_records', [record['record_id'] for record in records]))
+        return {'success': True, 'results': [{'status': 'Success', 'record_id': record['record_id']} for record in records]}
+
+    def delete_records(data):
+        service.calls.append(('delete_records', list(data['record_ids'])))
+        return {'success': True, 'deleted_ids': [rid for rid in data['record_ids'] if rid != 'missing']}
+
+    def save_positions(positions, coordinates, write_through=False):
+        service.calls.append(('save_positions', sorted(positions), coordinates, write_through))
+        return {'success': True, 'details': {key: 1 for key in positions}}
+
+    def update_attributes(data):
+        ids = [change['device_id'] for change in data['changes']]
+        service.calls.append(('update_device_attributes', ids))
+        return {'success': True, 'not_found': [device_id for device_id in ids if device_id.startswith('gone')]}
+
+    service.update_network_topology_records_bulk = update_records
+    service.delete_network_topology_bulk_by_ids = delete_records
+    service.save_device_positions = save_positions
+    service.update_device_attributes_bulk = update_attributes
+    return service
+
+
+def test_disjoint_operations_share_one_call(app):
+    result = app.execute_batch({'operations': [
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+        {'op': 'update_records', 'data': {'records': [{'record_id': '2'}, {'record_id': '3'}]}},
+    ]})
+
+    assert result['success']
+    assert app.calls == [('update_records', ['1', '2', '3'])]
+    assert [entry['coalesced'] for entry in result['results']] == [2, 2]
+    assert [r['record_id'] for r in result['results'][1]['response']['results']] == ['2', '3']
+
+
+def test_overlapping_keys_start_a_new_call(app):
+    result = app.execute_batch({'operations': [
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+        {'op': 'update_record', 'data': {'record_id': '2'}},
+    ]})
+
+    assert result['success'] and result['failed_count'] == 0
+    assert app.calls == [('update_records', ['1']), ('update_records', ['1', '2'])]
+
+
+def test_different_coordinates_are_not_merged(app):
+    app.execute_batch({'operations': [
+        {'op': 'save_positions', 'data': {'positions': {'a': {'x': 1, 'y': 2}}}},
+        {'op': 'save_positions', 'data': {'positions': {'b': {'x': 1, 'y': 2}}, 'coordinates': 'relative'}},
+    ]})
+
+    assert app.calls == [('save_positions', ['a'], 'absolute', True), ('save_positions', ['b'], 'relative', True)]
+
+
+def test_responses_are_built_from_each_operations_keys(app):
+    result = app.execute_batch({'operations': [
+        {'op': 'save_positions', 'data': {'positions': {'a': {'x': 1, 'y': 2}}}},
+        {'op': 'save_positions', 'data': {'positions': {'b': {'x': 1, 'y': 2}}}},
+        {'op': 'update_device_attributes', 'data': {'changes': {'d1': {'type': 'router'}}}},
+        {'op': 'update_device_attributes', 'data': {'changes': [{'device_id': 'gone1', 'vendor': 'x'}]}},
+        {'op': 'delete_records', 'data': {'record_ids': ['r1', 'missing']}},
+    ]})
+
+    responses = [entry['response'] for entry in result['results']]
+    assert responses[0]['details'] == {'a': 1}
+    assert responses[1]['details'] == {'b': 1}
+    assert responses[2]['updated'] == ['d1'] and responses[2]['not_found'] == []
+    assert responses[3]['updated'] == [] and responses[3]['not_found'] == ['gone1']
+    assert not result['results'][4]['success']
+    assert responses[4]['not_found_ids'] == ['missing']
+
+
+def test_malformed_operation_fails_alone(app):
+    result = app.execute_batch({'operations': [
+        {'op': 'save_positions', 'data': [1, 2]},
+        {'op': 'save_positions', 'data': {'positions': {'a': {'x': 1, 'y': 2}}}},
+    ]})
+
+    assert result['success']
+    assert [entry['success'] for entry in result['results']] == [False, True]
+    assert app.calls == [('save_positions', ['a'], 'absolute', True)]
+
+
+def test_malformed_operation_rejects_batch_with_stop_on_error(app):
+    result = app.execute_batch({'stop_on_error': True, 'operations': [
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+        {'op': 'update_records', 'data': {'records': 'nope'}},
+    ]})
+
+    assert not result['success']
+    assert result['message'].startswith('Payload operation 1')
+    assert app.calls == []
+
+
+def test_failure_with_stop_on_error_rolls_back(app):
+    result = app.execute_batch({'stop_on_error': True, 'operations': [
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+        {'op': 'delete_record', 'data': {'record_id': 'missing'}},
+        {'op': 'update_record', 'data': {'record_id': '2'}},
+    ]})
+
+    assert not result['success'] and result['rolled_back']
+    assert app.db_utils.discarded == 1
+    assert [entry['success'] for entry in result['results']] == [False, False, False]
+    assert result['results'][0]['response']['message'].startswith('Rolled back')
+    assert result['results'][2]['response']['message'].startswith('Not run')
+
+
+def test_failed_merged_call_aborts_without_transactions(app):
+    app.db_utils = FakeDBUtils(atomic=False)
+    app.update_network_topology_records_bulk = lambda records: {'success': False, 'message': 'boom'}
+    result = app.execute_batch({'operations': [
+        {'op': 'delete_record', 'data': {'record_id': 'r1'}},
+        {'op': 'update_record', 'data': {'record_id': '1'}},
+    ]})
+
+    assert not result['success'] and not result['rolled_back']
+    # Without a transaction the earlier delete stays applied and is reported as such.
+    assert result['results'][0]['success']
+    assert result['results'][1]['response']['message'] == 'boom'
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+
+import db.topology_db_utils as topology_db_utils
+from tests.fakes import make_db_utils
+
+
+@pytest.fixture
+def db_utils(monkeypatch):
+    docs = [
+        {'_id': index, 'created_date': datetime(2024, 1, 1 + index % 5), 'device_a_ip': f'10.0.0.{index}', 'device_a_hostname': f'h{index}'}
+        for index in range(30)
+    ]
+    # A row with no sort value sorts first ascending and last descending, as in MongoDB.
+    docs.append({'_id': 30, 'created_date': None, 'device_a_ip': '10.0.0.30', 'device_a_hostname': 'h30'})
+    utils = make_db_utils(dashboard_collection=docs, devices_collection=[])
+    utils._ensure_index = lambda index: None
+    monkeypatch.setattr(topology_db_utils, 'search_index_enabled', True)
+    monkeypatch.setattr(topology_db_utils, 'search_index_fetch_batch_size', 7)
+    monkeypatch.setattr(topology_db_utils.connection_search_index, 'search', lambda text, fields=None: list(range(31)))
+    return utils
+
+
+def walk(db_utils, sort_dir, limit):
+    ids = []
+    cursor = None
+    while True:
+        result = db_utils.get_dashboard_connections('h', limit=limit, cursor=cursor, sort_dir=sort_dir)
+        assert result['status'] == 'Success'
+        ids.extend(int(record['id']) for record in result['records'])
+        cursor = result['next_cursor']
+        if cursor is None:
+            return ids, result['total_count']
+
+
+@pytest.mark.parametrize('limit', [1, 4, 50])
+def test_trigram_cursor_round_trip(db_utils, limit):
+    ascending, total = walk(db_utils, 'asc', limit)
+    descending, _ = walk(db_utils, 'desc', limit)
+
+    assert total == 31
+    assert len(ascending) == len(set(ascending)) == 31
+    assert ascending[0] == 30
+    assert ascending[1:6] == [0, 5, 10, 15, 20]
+    assert descending == list(reversed(ascending))
+
+
+def test_trigram_queries_stay_bounded(db_utils):
+    walk(db_utils, 'desc', 4)
+
+    id_lists = [query['_id']['$in'] for query in db_utils.dashboard_collection.queries if '_id' in query]
+    assert id_lists and max(len(ids) for ids in id_lists) <= 7
+
+
+def test_too_many_matches_fall_back_to_prefix_query(db_utils, monkeypatch):
+    monkeypatch.setattr(topology_db_utils, 'search_index_max_matches', 10)
+    seen = []
+
+    def aggregate(pipeline, **kwargs):
+        seen.append(pipeline[0]['$match'])
+        return iter([{'records': [], 'total': []}])
+    db_utils.dashboard_collection.aggregate = aggregate
+
+    result = db_utils.get_dashboard_connections('H1', limit=5)
+
+    assert result['status'] == 'Success'
+    assert seen == [{'search_keys': {'$regex': '^h1'}}]
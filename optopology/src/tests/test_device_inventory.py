@@ -0,0 +1,72 @@
+import pytest
+
+from utils.device_inventory import DeviceInventory, decode_device_cursor, encode_device_cursor
+
+
+def make_inventory():
+    devices = []
+    for index in range(23):
+        devices.append({
+            'id': f'dev-{index:02d}',
+            'hostname': f'host-{index % 5}',
+            'ip': f'10.0.0.{index}',
+            'ip_key': f'{index:032x}',
+            'type': 'router' if index % 2 else 'switch',
+            'vendor': 'acme',
+            'block': 'core' if index < 10 else '',
+            'degree': index % 4,
+            'interface_count': 0
+        })
+    # Missing sort values sort together with empty ones.
+    devices.append({'id': 'dev-none', 'hostname': None, 'ip': None, 'degree': None})
+    return DeviceInventory(devices)
+
+
+def walk(inventory, sort_dir, limit, sort_by='hostname', **filters):
+    ids = []
+    cursor = None
+    while True:
+        page = inventory.page(sort_by=sort_by, sort_dir=sort_dir, limit=limit, cursor=cursor, **filters)
+        ids.extend(record['id'] for record in page['records'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids, page['total_count']
+
+
+@pytest.mark.parametrize('sort_by', ['hostname', 'degree', 'ip'])
+@pytest.mark.parametrize('limit', [1, 4, 100])
+def test_cursor_round_trip_ascending_and_descending(sort_by, limit):
+    inventory = make_inventory()
+    ascending, total = walk(inventory, 'asc', limit, sort_by=sort_by)
+    descending, _ = walk(inventory, 'desc', limit, sort_by=sort_by)
+
+    assert total == 24
+    assert len(ascending) == len(set(ascending)) == 24
+    assert descending == list(reversed(ascending))
+
+
+def test_ties_are_broken_by_id():
+    ascending, _ = walk(make_inventory(), 'asc', 3)
+
+    assert ascending[:5] == ['dev-none', 'dev-00', 'dev-05', 'dev-10', 'dev-15']
+
+
+def test_cursor_round_trip_with_filter():
+    inventory = make_inventory()
+    ascending, total = walk(inventory, 'asc', 2, type_filter='router', block_filter='core')
+    descending, _ = walk(inventory, 'desc', 2, type_filter='router', block_filter='core')
+
+    assert total == 5
+    assert sorted(ascending) == ['dev-01', 'dev-03', 'dev-05', 'dev-07', 'dev-09']
+    assert descending == list(reversed(ascending))
+
+
+def test_cursor_encoding_round_trip():
+    assert decode_device_cursor(encode_device_cursor('host-1', 'dev-01')) == ('host-1', 'dev-01')
+    assert decode_device_cursor(encode_device_cursor(3, 'dev-02')) == (3, 'dev-02')
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', encode_device_cursor('only-one', 'x')[:-4], 'W10='])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        make_inventory().page(cursor=cursor)
@@ -0,0 +1,53 @@
+import pytest
+
+from utils.topology_utilities import TopologyUtilities, cidr_key_range, ip_sort_key
+
+
+@pytest.fixture
+def utils():
+    return TopologyUtilities()
+
+
+@pytest.mark.parametrize('value', ['', None, 'core-sw-01', '10.0.0', '10.0.0.256', '::g', '10.0.0.0/24'])
+def test_ip_key_is_none_for_non_addresses(utils, value):
+    assert utils.ip_key(value) is None
+
+
+def test_ip_key_is_fixed_width_and_ignores_whitespace(utils):
+    assert utils.ip_key(' 10.0.0.1 ') == utils.ip_key('10.0.0.1')
+    assert len(utils.ip_key('0.0.0.0')) == len(utils.ip_key('ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff')) == 32
+
+
+def test_ipv4_maps_into_ipv4_mapped_ipv6_space(utils):
+    assert utils.ip_key('192.0.2.1') == utils.ip_key('::ffff:192.0.2.1')
+    assert utils.ip_key('0.0.0.0') == '00000000000000000000ffff00000000'
+
+
+def test_string_order_is_numeric_order():
+    addresses = ['::1', '9.255.255.255', '10.0.0.2', '10.0.0.10', '255.255.255.255', '2001:db8::1', 'fe80::1']
+    assert sorted(addresses, key=ip_sort_key) == addresses
+
+
+@pytest.mark.parametrize('cidr, inside, outside', [
+    ('10.0.0.0/24', ['10.0.0.0', '10.0.0.255'], ['9.255.255.255', '10.0.1.0']),
+    ('10.0.0.7/32', ['10.0.0.7'], ['10.0.0.6', '10.0.0.8']),
+    ('0.0.0.0/0', ['0.0.0.0', '255.255.255.255'], ['::1', '2001:db8::1']),
+    ('2001:db8::/32', ['2001:db8::', '2001:db8:ffff:ffff:ffff:ffff:ffff:ffff'], ['2001:db9::', '10.0.0.1']),
+    ('::/0', ['::', '10.0.0.1', 'fe80::1'], []),
+])
+def test_cidr_range_bounds(utils, cidr, inside, outside):
+    low, high = utils.cidr_range(cidr)
+    for address in inside:
+        assert low <= utils.ip_key(address) <= high
+    for address in outside:
+        assert not low <= utils.ip_key(address) <= high
+
+
+def test_cidr_range_accepts_host_bits():
+    assert cidr_key_range('10.0.0.77/24') == cidr_key_range('10.0.0.0/24')
+
+
+@pytest.mark.parametrize('cidr', ['', 'not-a-cidr', '10.0.0.0/33', '2001:db8::/129'])
+def test_cidr_range_rejects_invalid_input(utils, cidr):
+    with pytest.raises(ValueError):
+        utils.cidr_range(cidr)
@@ -0,0 +1,75 @@
+from tests.fakes import make_db_utils
+from utils.incremental_layout import IncrementalLayoutService
+from utils.topology_utilities import TopologyUtilities
+
+
+def connection(a_ip, a_block, a_pos, b_ip, b_block, b_pos, block_origin=None):
+    row = {
+        'device_a_ip': a_ip, 'device_a_hostname': a_ip, 'device_a_block': a_block,
+        'device_a_position_x': a_pos[0], 'device_a_position_y': a_pos[1],
+        'device_b_ip': b_ip, 'device_b_hostname': b_ip, 'device_b_block': b_block,
+        'device_b_position_x': b_pos[0], 'device_b_position_y': b_pos[1],
+    }
+    if block_origin:
+        row.update({'device_a_block_position_x': block_origin[0], 'device_a_block_position_y': block_origin[1]})
+    return row
+
+
+def occupied(result):
+    return {row['device_a_ip']: (row['device_a_position_x'], row['device_a_position_y']) for row in result['rows']}
+
+
+def test_unmigrated_devices_come_from_connection_rows():
+    db_utils = make_db_utils(
+        block_collection=[{'block_name': 'core', 'position_x': 100.0, 'position_y': 100.0, 'device_count': 2}],
+        devices_collection=[{'_id': '10.0.0.1', 'ip': '10.0.0.1', 'hostname': 'r1', 'block': 'core', 'position_x': 110.0, 'position_y': 120.0}],
+        dashboard_collection=[
+            connection('10.0.0.1', 'core', (999.0, 999.0), '10.0.0.2', 'core', (130.0, 140.0)),
+            connection('10.0.0.3', 'edge', (500.0, 500.0), '10.0.0.4', 'other', (700.0, 700.0), block_origin=(480.0, 480.0)),
+        ]
+    )
+
+    result = db_utils.get_layout_occupancy({'core', 'edge'}, {'10.0.0.1', '10.0.0.2'})
+
+    positions = occupied(result)
+    # The device document wins over the stale row copy.
+    assert positions['10.0.0.1'] == (110.0, 120.0)
+    # Devices with no document are still occupied space.
+    assert positions['10.0.0.2'] == (130.0, 140.0)
+    assert positions['10.0.0.3'] == (500.0, 500.0)
+    # The other side of a matched row is only loaded when its own block or id was asked for.
+    assert '10.0.0.4' not in positions
+    edge_row = next(row for row in result['rows'] if row['device_a_ip'] == '10.0.0.3')
+    assert (edge_row['device_a_block_position_x'], edge_row['device_a_block_position_y']) == (480.0, 480.0)
+    assert result['blocks']['core']['x'] == 100.0
+
+
+def test_each_device_is_reported_once():
+    db_utils = make_db_utils(
+        block_collection=[],
+        devices_collection=[],
+        dashboard_collection=[
+            connection('10.0.0.5', 'core', (1.0, 2.0), '10.0.0.6', 'core', (3.0, 4.0)),
+            connection('10.0.0.6', 'core', (3.0, 4.0), '10.0.0.5', 'core', (1.0, 2.0)),
+        ]
+    )
+
+    result = db_utils.get_layout_occupancy({'core'}, set())
+
+    assert sorted(row['device_a_ip'] for row in result['rows']) == ['10.0.0.5', '10.0.0.6']
+
+
+def test_unmigrated_rows_feed_incremental_placement():
+    db_utils = make_db_utils(
+        block_collection=[],
+        devices_collection=[],
+        dashboard_collection=[connection('10.0.0.7', 'core', (0.0, 0.0), '10.0.0.8', 'core', (200.0, 0.0))]
+    )
+    occupancy = db_utils.get_layout_occupancy({'core'}, set())
+
+    service = IncrementalLayoutService(TopologyUtilities())
+    service.load_occupancy(occupancy['rows'])
+    service.load_blocks(occupancy['blocks'])
+
+    assert service.device_positions['10.0.0.7'] == {'x': 0.0, 'y': 0.0}
+    assert service.block_device_counts['core'] == 2
@@ -1,12 +1,51 @@
 import logging
 import re
 from utils.topology_utilities import TopologyUtilities
-from db.topology_db_utils import TopologyDBUtils
+from utils.incremental_layout import IncrementalLayoutService
+from utils.force_layout import ForceDirectedLayout
+from utils.layered_layout import LayeredLayout
+from utils.block_rules import block_rule_engine, validate_block_rules
+from utils.block_reclassification import start_block_reclassification, get_block_reclassification_job, list_block_reclassification_jobs
+from utils.position_write_buffer import position_write_buffer
+from utils.position_cache import position_cache
+from utils.versioned_cache import topology_query_cache
+from utils.device_inventory import DeviceInventory, DEVICE_SORT_FIELDS
+from db.topology_db_utils import TopologyDBUtils, CONNECTION_RECORD_FIELDS, CONNECTION_SORT_FIELDS
 from flask import request
 from datetime import datetime
+from props import position_write_behind_enabled, device_suggest_limit, device_suggest_max_limit, stats_top_degree_limit
+from props import devices_page_size, devices_max_page_size, batch_max_operations
 
 logger = logging.getLogger(__name__)
 
+LAYOUT_MODES = ('grid', 'force', 'layered')
+IMPORT_MODES = ('append', 'reconcile')
+POSITION_COORDINATES = ('absolute', 'relative')
+
+# Batch operations that consecutive runs of can share one bulk call, by the bulk call they share.
+BATCH_COALESCED_OPERATIONS = {
+    'add_block': 'add_blocks',
+    'add_blocks': 'add_blocks',
+    'add_records': 'add_records',
+    'update_record': 'update_records',
+    'update_records': 'update_records',
+    'delete_record': 'delete_records',
+    'delete_records': 'delete_records',
+    'save_positions': 'save_positions',
+    'update_device_attributes': 'update_device_attributes'
+}
+BATCH_SINGLE_OPERATIONS = ('add_record', 'update_block', 'delete_block', 'update_device_type')
+
+
+class BatchAborted(Exception):
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+        self.results = None
+        self.atomic = False
+
+
 class TopologyApp:
     def __init__(self):
         self.db_utils = TopologyDBUtils()
@@ -34,13 +73,37 @@ class TopologyApp:
         else:
             return {"permission":True}
 
+    def _refresh_block_rules(self, force=False):
+        block_rule_engine.refresh_if_stale(self.db_utils.get_block_rules, force=force)
+
+    def _compute_layout(self, layout_mode, position_rows, records=None, pin_saved=True, iterations=None, blocks=None):
+        if layout_mode == 'grid':
+            layout_service = IncrementalLayoutService(self.topology_utils)
+            layout_service.load_occupancy(position_rows)
+            layout_service.load_blocks(blocks or {})
+            return layout_service.place(records or [])
+
+        graph = self.topology_utils.build_layout_graph(position_rows, records)
+        if layout_mode == 'layered':
+            return LayeredLayout(self.topology_utils).compute(
+                graph['device_blocks'], graph['device_types'], graph['edges'],
+                graph['device_positions'], graph['block_positions'], pin_saved=pin_saved
+            )
+
+        engine = ForceDirectedLayout(self.topology_utils, **({'iterations': iterations} if iterations else {}))
+        return engine.compute(
+            graph['device_blocks'], graph['edges'],
+            graph['device_positions'], graph['block_positions'],
+            pin_saved=pin_saved
+        )
+
     def import_connections(self, data):
         return {
             'success': False,
             'message': 'Deprecated: NETWORK_TOPOLOGY_MAIN endpoints removed. Use Dashboard endpoints.'
         }
 
-    def import_excel_headered(self, data):
+    def import_excel_headered(self, data, layout_mode='grid', mode='append', dry_run=False, force=False):
         inserted_count = 0
         skipped = []
         errors = []
@@ -52,7 +115,24 @@ class TopologyApp:
         if error:
             return error
 
+        layout_mode = layout_mode or 'grid'
+        if layout_mode not in LAYOUT_MODES:
+            return {
+                'success': False,
+                'message': f'Invalid layout_mode: {layout_mode}. Expected one of {list(LAYOUT_MODES)}'
+            }
+        mode = mode or 'append'
+        if mode not in IMPORT_MODES:
+            return {
+                'success': False,
+                'message': f'Invalid mode: {mode}. Expected one of {list(IMPORT_MODES)}'
+            }
+
+        self._refresh_block_rules()
+
         valid_records = []
+        keyed_records = {}
+        duplicate_count = 0
         for idx, raw_row in enumerate(data, start=1):
             try:
                 if not isinstance(raw_row, dict):
@@ -71,20 +151,33 @@ class TopologyApp:
                     logger.warning(f"Skipping row {idx}: {validation_errors[0]}")
                     continue
 
-                dup_result = self.db_utils.check_duplicate_connection(record)
-                if dup_result['is_duplicate']:
-                    reason = dup_result['reason']
-                    skipped.append({'index': idx, 'reason': reason})
-                    logger.info(f"Skipping row {idx}: {reason}")
-                    continue
-
-                if not record.get('device_a_block'):
+                if mode == 'reconcile':
+                    # Duplicates against stored rows are resolved by the diff; only repeats within the upload are skipped here.
+                    key = self.topology_utils.connection_key(record)
+                    if key in keyed_records:
+                        duplicate_count += 1
+                        reason = f"Duplicate of row {keyed_records[key]['_original_index']} in the upload"
+                        skipped.append({'index': idx, 'reason': reason})
+                        logger.info(f"Skipping row {idx}: {reason}")
+                        continue
+                    keyed_records[key] = record
+                else:
+                    dup_result = self.db_utils.check_duplicate_connection(record)
+                    if dup_result['is_duplicate']:
+                        reason = dup_result['reason']
+                        skipped.append({'index': idx, 'reason': reason})
+                        logger.info(f"Skipping row {idx}: {reason}")
+                        continue
+
+                record['device_a_block_auto'] = not record.get('device_a_block')
+                if record['device_a_block_auto']:
                     record['device_a_block'] = self.topology_utils.determine_block(
                         record['device_a_hostname'],
                         record['device_a_ip'],
                         record['device_a_type'],
                     )
-                if not record.get('device_b_block'):
+                record['device_b_block_auto'] = not record.get('device_b_block')
+                if record['device_b_block_auto']:
                     record['device_b_block'] = self.topology_utils.determine_block(
                         record['device_b_hostname'],
                         record['device_b_ip'],
@@ -98,44 +191,12 @@ class TopologyApp:
                 errors.append(msg)
                 logger.error(msg)
 
-        if valid_records:
-            logger.info(f"Calculating auto-layout positions for {len(valid_records)} records")
-            layout_result = self.topology_utils.calculate_auto_layout_positions(valid_records)
-            device_positions = layout_result['device_positions']
-            block_positions = layout_result['block_positions']
-
-            for record in valid_records:
-                device_a_id = self.topology_utils.compute_device_id(
-                    record.get('device_a_ip', ''),
-                    record.get('device_a_hostname', '')
-                )
-                device_b_id = self.topology_utils.compute_device_id(
-                    record.get('device_b_ip', ''),
-                    record.get('device_b_hostname', '')
-                )
-
-                if device_a_id and device_a_id in device_positions:
-                    pos = device_positions[device_a_id]
-                    record['device_a_position_x'] = pos['x']
-                    record['device_a_position_y'] = pos['y']
-
-                if device_b_id and device_b_id in device_positions:
-                    pos = device_positions[device_b_id]
-                    record['device_b_position_x'] = pos['x']
-                    record['device_b_position_y'] = pos['y']
-
-                device_a_block = (record.get('device_a_block') or '').strip()
-                device_b_block = (record.get('device_b_block') or '').strip()
-
-                if device_a_block and device_a_block in block_positions:
-                    block_pos = block_positions[device_a_block]
-                    record['device_a_block_position_x'] = block_pos['x']
-                    record['device_a_block_position_y'] = block_pos['y']
-
-                if device_b_block and device_b_block in block_positions:
-                    block_pos = block_positions[device_b_block]
-                    record['device_b_block_position_x'] = block_pos['x']
-                    record['device_b_block_position_y'] = block_pos['y']
+        if mode == 'reconcile':
+            # Rows that failed validation are absent from keyed_records, so their stored connections would read as removed.
+            rejected_count = len(skipped) - duplicate_count + len(errors)
+            return self._reconcile_headered_records(data, keyed_records, skipped, errors, layout_mode, created_by, dry_run, force, rejected_count)
+
+        self._apply_import_layout(layout_mode, valid_records, created_by)
 
         for record in valid_records:
             idx = record.pop('_original_index', 0)
@@ -157,6 +218,7 @@ class TopologyApp:
         summary = {
             'success': True,
             'message': f'Processed {len(data)} rows: inserted={inserted_count}, skipped={len(skipped)}, errors={len(errors)}',
+            'layout_mode': layout_mode,
             'inserted_count': inserted_count,
             'skipped_count': len(skipped),
             'total_records': len(data),
@@ -169,6 +231,132 @@ class TopologyApp:
         logger.info(f"Excel headered import completed. Inserted: {inserted_count}, Skipped: {len(skipped)}, Errors: {len(errors)}")
         return summary
 
+    def _apply_import_layout(self, layout_mode, valid_records, created_by):
+        if not valid_records:
+            return
+        position_write_buffer.flush()
+        logger.info(f"Calculating {layout_mode} auto-layout positions for {len(valid_records)} records")
+        if layout_mode == 'grid':
+            # Grid placement only reads the blocks this batch touches, so cost follows the batch, not the topology.
+            occupancy = self.db_utils.get_layout_occupancy(
+                {record.get(f'device_{side}_block') for record in valid_records for side in ('a', 'b')},
+                {
+                    self.topology_utils.compute_device_id(record.get(f'device_{side}_ip', ''), record.get(f'device_{side}_hostname', ''))
+                    for record in valid_records for side in ('a', 'b')
+                }
+            )
+            layout_result = self._compute_layout(layout_mode, occupancy['rows'], valid_records, blocks=occupancy['blocks'])
+        else:
+            layout_result = self._compute_layout(layout_mode, self.db_utils.get_layout_position_rows(), valid_records)
+        device_positions = layout_result['device_positions']
+        block_positions = layout_result['block_positions']
+
+        for record in valid_records:
+            device_a_id = self.topology_utils.compute_device_id(
+                record.get('device_a_ip', ''),
+                record.get('device_a_hostname', '')
+            )
+            device_b_id = self.topology_utils.compute_device_id(
+                record.get('device_b_ip', ''),
+                record.get('device_b_hostname', '')
+            )
+
+            if device_a_id and device_a_id in device_positions:
+                pos = device_positions[device_a_id]
+                record['device_a_position_x'] = pos['x']
+                record['device_a_position_y'] = pos['y']
+
+            if device_b_id and device_b_id in device_positions:
+                pos = device_positions[device_b_id]
+                record['device_b_position_x'] = pos['x']
+                record['device_b_position_y'] = pos['y']
+
+            device_a_block = (record.get('device_a_block') or '').strip()
+            device_b_block = (record.get('device_b_block') or '').strip()
+
+            if device_a_block and device_a_block in block_positions:
+                block_pos = block_positions[device_a_block]
+                record['device_a_block_position_x'] = block_pos['x']
+                record['device_a_block_position_y'] = block_pos['y']
+
+            if device_b_block and device_b_block in block_positions:
+                block_pos = block_positions[device_b_block]
+                record['device_b_block_position_x'] = block_pos['x']
+                record['device_b_block_position_y'] = block_pos['y']
+
+        self.db_utils.save_block_positions(block_positions, created_by, fill_only=True)
+
+    def _reconcile_headered_records(self, data, keyed_records, skipped, errors, layout_mode, created_by, dry_run, force, rejected_count):
+        if not keyed_records:
+            # An upload with no usable rows would otherwise remove every stored connection.
+            return {
+                'success': False,
+                'message': 'Invalid upload: no valid rows to reconcile against',
+                'skipped': skipped
+            }
+
+        diff = self.db_utils.diff_dashboard_connections(keyed_records)
+        if diff['status'] != 'Success':
+            logger.warning(f"Reconcile import diff failed: {diff['error']}")
+            return {
+                'success': False,
+                'message': f"Failed to diff upload against topology: {diff['error']}"
+            }
+
+        added_records = [keyed_records[key] for key in diff['added']]
+        added_rows = [record['_original_index'] for record in added_records]
+        blocked = bool(rejected_count) and not force
+        result = {'inserted_count': 0, 'inserted_ids': [], 'updated_count': 0, 'deleted_count': 0}
+        if not dry_run and not blocked and (added_records or diff['updated'] or diff['removed']):
+            self._apply_import_layout(layout_mode, added_records, created_by)
+            for record in added_records:
+                record.pop('_original_index', None)
+            result = self.db_utils.reconcile_dashboard_connections(
+                added_records, diff['updated'], [row['record_id'] for row in diff['removed']], created_by
+            )
+            if result['status'] != 'Success':
+                logger.warning(f"Reconcile import apply failed: {result['error']}")
+                return {
+                    'success': False,
+                    'message': f"Failed to apply reconcile import: {result['error']}"
+                }
+
+        summary = {
+            'success': True,
+            'message': f"Reconciled {len(data)} rows: added={len(added_records)}, updated={len(diff['updated'])}, removed={len(diff['removed'])}, unchanged={diff['unchanged_count']}, skipped={len(skipped)}, errors={len(errors)}",
+            'mode': 'reconcile',
+            'dry_run': bool(dry_run),
+            'applied': not dry_run and not blocked,
+            'layout_mode': layout_mode,
+            'added_count': len(added_records),
+            'updated_count': len(diff['updated']),
+            'removed_count': len(diff['removed']),
+            'unchanged_count': diff['unchanged_count'],
+            'inserted_count': result['inserted_count'],
+            'deleted_count': result['deleted_count'],
+            'skipped_count': len(skipped),
+            'total_records': len(data),
+            'added_rows': added_rows,
+            'inserted_ids': result['inserted_ids'],
+            'updated': [
+                {'record_id': row['record_id'], 'device_a_block': row['device_a_block'], 'device_b_block': row['device_b_block']}
+                for row in diff['updated']
+            ],
+            'removed': diff['removed'],
+            'skipped': skipped,
+        }
+        if errors:
+            summary['errors'] = errors
+        if blocked and not dry_run:
+            summary['success'] = False
+            summary['message'] = (f"Reconcile not applied: {rejected_count} rows failed validation and their stored connections "
+                                  f"would be removed. Fix the rows or pass force=true. {summary['message']}")
+            logger.warning(summary['message'])
+            return summary
+
+        logger.info(f"Reconcile import completed. Added: {len(added_records)}, Updated: {len(diff['updated'])}, Removed: {len(diff['removed'])}, Unchanged: {diff['unchanged_count']}, Skipped: {len(skipped)}, Dry run: {bool(dry_run)}")
+        return summary
+
     def update_device_position(self, data):
         return {
             'success': False,
@@ -187,11 +375,19 @@ class TopologyApp:
             'message': 'Deprecated: NETWORK_TOPOLOGY_MAIN endpoints removed. Use get_network_topology_dashboard.'
         }
 
-    def get_network_topology_dashboard(self):
+    def get_network_topology_dashboard(self, cidr=None):
         logger.debug(f"Starting network topology dashboard retrieval operation at {datetime.now()}")
 
+        error = self._validate_cidr(cidr)
+        if error:
+            return error
+
         try:
-            dashboard_data = self.db_utils.get_network_topology_dashboard_data()
+            # Buffered relative coordinates can only be resolved once they are stored.
+            if position_write_buffer.has_pending('relative'):
+                position_write_buffer.flush()
+
+            dashboard_data = self.db_utils.get_network_topology_dashboard_data(cidr)
 
             if dashboard_data['status'] != 'Success':
                 return {
@@ -202,9 +398,29 @@ class TopologyApp:
             logger.debug(f"Dashboard data count: {len(dashboard_data['connections'])} connections at {datetime.now()}")
 
             processed_data = self.topology_utils.process_dashboard_topology_data(
-                dashboard_data['connections']
+                dashboard_data['connections'],
+                dashboard_data.get('block_positions'),
+                dashboard_data.get('relative_positions')
             )
 
+            # Remember what is stored so later saves can skip unchanged keys.
+            pending_positions = position_write_buffer.pending_positions()
+            stored_positions = dict(self.topology_utils.build_position_index(dashboard_data['connections'])['id'])
+            stored_positions.update(dashboard_data.get('block_positions') or {})
+            # Relative devices are cached at their resolved absolute position.
+            stored_positions.update({
+                key: processed_data['positions'][key]
+                for key in (dashboard_data.get('relative_positions') or {}) if key in processed_data['positions']
+            })
+            position_cache.update(
+                {key: pos for key, pos in stored_positions.items() if key not in pending_positions},
+                dashboard_data['position_stamp']
+            )
+
+            # Positions still waiting in the write-behind buffer are newer than what is stored.
+            positions = processed_data['positions']
+            positions.update({key: pos for key, pos in pending_positions.items() if key in positions})
+
             logger.info(f"Dashboard topology processing: {len(dashboard_data['connections'])} total records, {len(processed_data['networkData']['nodes'])} devices with blocks, {len(processed_data['networkData']['edges'])} connections with blocks at {datetime.now()}")
 
             return {
@@ -238,13 +454,17 @@ class TopologyApp:
 
         logger.debug(f"Inserting single record: A[{data['device_a_hostname']}/{data['device_a_interface']}] -> B[{data['device_b_hostname']}/{data['device_b_interface']}]")
 
-        if not data.get('device_a_block'):
+        self._refresh_block_rules()
+
+        data['device_a_block_auto'] = not data.get('device_a_block')
+        if data['device_a_block_auto']:
             data['device_a_block'] = self.topology_utils.determine_block(
                 data['device_a_hostname'],
                 data['device_a_ip'],
                 data.get('device_a_type', 'unknown')
             )
-        if not data.get('device_b_block'):
+        data['device_b_block_auto'] = not data.get('device_b_block')
+        if data['device_b_block_auto']:
             data['device_b_block'] = self.topology_utils.determine_block(
                 data['device_b_hostname'],
                 data['device_b_ip'],
@@ -309,7 +529,8 @@ class TopologyApp:
                     'message': f'Successfully added {result["inserted_count"]} records',
                     'inserted_count': result['inserted_count'],
                     'total_records': len(enriched),
-                    'inserted_ids': result.get('inserted_ids', [])
+                    'inserted_ids': result.get('inserted_ids', []),
+                    'results': result['results']
                 }
             else:
                 logger.warning(f"Bulk network topology records add failed: {result['error']}")
@@ -359,6 +580,55 @@ class TopologyApp:
                 'message': result['message']
             }
 
+    def update_network_topology_records_bulk(self, data):
+        logger.debug("Starting bulk network topology record update operation")
+        updated_by, error = self._enforce_allowed('update_network_topology_records_bulk')
+        if error:
+            return error
+
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return {
+                'success': False,
+                'message': 'Payload must be a non-empty array of records or { "records": [...] }'
+            }
+
+        results = [None] * len(records)
+        valid = []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                results[index] = {'record_id': None, 'status': 'Failed', 'message': 'Record is not an object'}
+                continue
+            validation_errors = self.topology_utils.validate_topology_update_record(record)
+            if validation_errors:
+                results[index] = {'record_id': record.get('record_id'), 'status': 'Failed', 'message': validation_errors[0]}
+                continue
+            valid.append((index, record))
+
+        if valid:
+            result = self.db_utils.update_dashboard_connections_bulk([record for _, record in valid], updated_by)
+            if result['status'] != 'Success':
+                logger.warning(f"Bulk network topology record update failed: {result['error']}")
+                return {
+                    'success': False,
+                    'message': result['error']
+                }
+            for (index, _), record_result in zip(valid, result['results']):
+                results[index] = record_result
+
+        updated_count = len([entry for entry in results if entry['status'] == 'Success'])
+        unchanged_count = len([entry for entry in results if entry['status'] == 'Unchanged'])
+        failed_count = len([entry for entry in results if entry['status'] == 'Failed'])
+        logger.info(f"Bulk network topology record update completed: {updated_count} updated, {unchanged_count} unchanged, {failed_count} failed")
+        return {
+            'success': True,
+            'message': f'Processed {len(records)} records: updated={updated_count}, unchanged={unchanged_count}, failed={failed_count}',
+            'updated_count': updated_count,
+            'unchanged_count': unchanged_count,
+            'failed_count': failed_count,
+            'results': results
+        }
+
     def delete_network_topology_record(self, data):
         logger.debug("Starting network topology record delete operation")
 
@@ -394,18 +664,44 @@ class TopologyApp:
                 'message': result['message']
             }
 
-    def get_network_topology_records(self, search=''):
+    def _validate_cidr(self, cidr):
+        if not cidr:
+            return None
+        try:
+            self.topology_utils.cidr_range(cidr)
+        except ValueError:
+            return {'success': False, 'message': f"Invalid cidr '{cidr}'"}
+        return None
+
+    def get_network_topology_records(self, search='', limit=None, cursor=None, sort_by='created_date', sort_dir='desc', fields=None, cidr=None):
         logger.debug("Starting network topology records retrieval operation")
 
+        error = self._validate_cidr(cidr)
+        if error:
+            return error
+        if sort_by not in CONNECTION_SORT_FIELDS:
+            return {'success': False, 'message': f"Invalid sort_by '{sort_by}'. Expected one of: {', '.join(CONNECTION_SORT_FIELDS)}"}
+        if sort_dir not in ('asc', 'desc'):
+            return {'success': False, 'message': f"Invalid sort_dir '{sort_dir}'. Expected 'asc' or 'desc'"}
+        unknown_fields = [field for field in fields or [] if field not in CONNECTION_RECORD_FIELDS]
+        if unknown_fields:
+            return {'success': False, 'message': f"Invalid fields: {', '.join(unknown_fields)}"}
         try:
-            result = self.db_utils.get_dashboard_connections(search)
+            limit = int(limit) if limit not in (None, '') else None
+        except (TypeError, ValueError):
+            return {'success': False, 'message': f"Invalid limit '{limit}'"}
+
+        try:
+            result = self.db_utils.get_dashboard_connections(search, limit, cursor, sort_by, sort_dir, fields, cidr)
 
             if result['status'] == 'Success':
                 logger.info(f"Network topology records retrieved successfully: {len(result['records'])} records returned, {result['total_count']} total in database")
                 return {
                     'success': True,
                     'data': result['records'],
-                    'total_records': result['total_count']
+                    'total_records': result['total_count'],
+                    'total_estimated': result['total_estimated'],
+                    'next_cursor': result['next_cursor']
                 }
             else:
                 logger.warning(f"Network topology records retrieval failed: {result['error']}")
@@ -421,6 +717,161 @@ class TopologyApp:
                 'message': f'Failed to retrieve records: {str(e)}'
             }
 
+    def get_topology_stats(self, top_n=None):
+        logger.debug("Starting topology stats retrieval operation")
+        try:
+            top_n = max(1, min(int(top_n or stats_top_degree_limit), 100))
+        except (TypeError, ValueError):
+            return {'success': False, 'message': f"Invalid top '{top_n}'"}
+
+        version = self.db_utils.get_topology_version()
+        cached = topology_query_cache.get(('stats', top_n), version)
+        if cached is not None:
+            logger.info(f"Topology stats served from cache at version {version}")
+            return cached
+
+        result = self.db_utils.get_topology_stats(top_n)
+        if result['status'] != 'Success':
+            logger.warning(f"Topology stats retrieval failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Topology stats computed at version {version}: {result['totals']['devices']} devices, {result['totals']['links']} links")
+        response = {
+            'success': True,
+            'version': version,
+            'data': {key: value for key, value in result.items() if key != 'status'}
+        }
+        return topology_query_cache.put(('stats', top_n), version, response)
+
+    def _device_inventory(self):
+        version = self.db_utils.get_topology_version()
+        inventory = topology_query_cache.get(('device_inventory',), version)
+        if inventory is not None:
+            return inventory, None
+
+        result = self.db_utils.get_device_inventory()
+        if result['status'] != 'Success':
+            return None, result['error']
+        logger.info(f"Device inventory rebuilt at version {version}: {len(result['devices'])} devices")
+        return topology_query_cache.put(('device_inventory',), version, DeviceInventory(result['devices'])), None
+
+    def get_devices(self, search='', device_type='', vendor='', block=None, cidr=None, sort_by='hostname', sort_dir='asc', limit=None, cursor=None):
+        logger.debug("Starting device inventory retrieval operation")
+
+        if sort_by not in DEVICE_SORT_FIELDS:
+            return {'success': False, 'message': f"Invalid sort_by '{sort_by}'. Expected one of: {', '.join(DEVICE_SORT_FIELDS)}"}
+        if sort_dir not in ('asc', 'desc'):
+            return {'success': False, 'message': f"Invalid sort_dir '{sort_dir}'. Expected 'asc' or 'desc'"}
+        try:
+            limit = max(1, min(int(limit or devices_page_size), devices_max_page_size))
+        except (TypeError, ValueError):
+            return {'success': False, 'message': f"Invalid limit '{limit}'"}
+        error = self._validate_cidr(cidr)
+        if error:
+            return error
+
+        try:
+            inventory, error = self._device_inventory()
+            if error:
+                logger.warning(f"Device inventory retrieval failed: {error}")
+                return {
+                    'success': False,
+                    'message': error
+                }
+
+            result = inventory.page(
+                sort_by, sort_dir, limit, cursor,
+                text=search,
+                type_filter=device_type,
+                vendor_filter=vendor,
+                block_filter=block,
+                ip_range=self.topology_utils.cidr_range(cidr) if cidr else None
+            )
+            logger.info(f"Device inventory retrieved: {len(result['records'])} devices returned, {result['total_count']} matching")
+            return {
+                'success': True,
+                'data': result['records'],
+                'total_records': result['total_count'],
+                'next_cursor': result['next_cursor']
+            }
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        except Exception as e:
+            logger.error(f"Get devices error: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Failed to retrieve devices: {str(e)}'
+            }
+
+    def get_device_detail(self, device_id):
+        logger.debug(f"Starting device detail retrieval for '{device_id}'")
+        device_id = (device_id or '').strip()
+        if not device_id:
+            return {'success': False, 'message': 'Invalid device id'}
+
+        result = self.db_utils.get_device_detail(device_id)
+        if result['status'] != 'Success':
+            message = result.get('message') or result.get('error')
+            logger.warning(f"Device detail retrieval failed: {message}")
+            return {
+                'success': False,
+                'message': message
+            }
+
+        interfaces = result['interfaces']
+        logger.info(f"Device detail retrieved for '{device_id}': {len(interfaces)} interfaces")
+        return {
+            'success': True,
+            'data': {
+                **result['device'],
+                'degree': sum(len(entry['links']) for entry in interfaces),
+                'interface_count': len([entry for entry in interfaces if entry['interface']]),
+                'shared_interface_count': len([entry for entry in interfaces if entry['shared']]),
+                'interfaces': interfaces
+            }
+        }
+
+    def get_shared_interfaces(self):
+        logger.debug("Starting shared interface check")
+        result = self.db_utils.get_shared_interfaces()
+        if result['status'] != 'Success':
+            logger.warning(f"Shared interface check failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Shared interface check found {len(result['shared_interfaces'])} interfaces")
+        return {
+            'success': True,
+            'data': result['shared_interfaces'],
+            'count': len(result['shared_interfaces'])
+        }
+
+    def suggest_devices(self, text, limit=None):
+        logger.debug(f"Starting device suggestion lookup for '{text}'")
+        try:
+            limit = max(1, min(int(limit or device_suggest_limit), device_suggest_max_limit))
+        except (TypeError, ValueError):
+            return {'success': False, 'message': f"Invalid limit '{limit}'"}
+
+        result = self.db_utils.suggest_devices(text, limit)
+        if result['status'] != 'Success':
+            logger.warning(f"Device suggestion lookup failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Device suggestions for '{text}': {len(result['suggestions'])} returned")
+        return {
+            'success': True,
+            'data': result['suggestions']
+        }
+
     def update_device_type(self, data):
         logger.debug("Starting device type update operation")
 
@@ -461,7 +912,53 @@ class TopologyApp:
                 'message': result['message']
             }
 
-    def save_device_positions(self, positions):
+    def update_device_attributes_bulk(self, data):
+        logger.debug("Starting bulk device attribute update operation")
+        updated_by, error = self._enforce_allowed('update_device_attributes_bulk')
+        if error:
+            return error
+
+        entries = data.get('changes') if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            entries = [dict(attributes or {}, device_id=device_id) for device_id, attributes in entries.items()]
+        if not isinstance(entries, list) or not entries:
+            return {
+                'success': False,
+                'message': 'Payload must contain "changes": a list of {device_id, type, vendor, block} or a map of device id to attributes'
+            }
+
+        changes = {}
+        for index, entry in enumerate(entries, start=1):
+            if not isinstance(entry, dict) or not str(entry.get('device_id') or '').strip():
+                return {'success': False, 'message': f'Change {index}: device_id is required'}
+            attributes = {}
+            for field in ('type', 'vendor'):
+                if entry.get(field) is not None:
+                    attributes[field] = str(entry[field]).strip().lower() or 'unknown'
+            if entry.get('block') is not None:
+                attributes['block'] = str(entry['block']).strip()
+            if not attributes:
+                return {'success': False, 'message': f'Change {index}: at least one of type, vendor or block is required'}
+            changes[str(entry['device_id']).strip()] = attributes
+
+        result = self.db_utils.update_device_attributes_bulk(changes, updated_by)
+        if result['status'] != 'Success':
+            logger.warning(f"Bulk device attribute update failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Bulk device attribute update completed: {result['devices_updated']} devices, {result['rows_updated']} rows, {len(result['not_found'])} not found")
+        return {
+            'success': True,
+            'message': f"Updated {result['devices_updated']} devices across {result['rows_updated']} connections",
+            'devices_updated': result['devices_updated'],
+            'rows_updated': result['rows_updated'],
+            'not_found': result['not_found']
+        }
+
+    def save_device_positions(self, positions, coordinates='absolute', write_through=False):
         logger.debug(f"Starting bulk device and block position save operation at {datetime.now()}")
 
         if not positions or not isinstance(positions, dict):
@@ -470,6 +967,13 @@ class TopologyApp:
                 'message': f'Invalid payload: positions object is required {datetime.now()}'
             }
 
+        coordinates = coordinates or 'absolute'
+        if coordinates not in POSITION_COORDINATES:
+            return {
+                'success': False,
+                'message': f'Invalid coordinates: {coordinates}. Expected one of {list(POSITION_COORDINATES)}'
+            }
+
         device_updates = 0
         block_updates = 0
         per_key_rows = {}
@@ -483,7 +987,54 @@ class TopologyApp:
 
             logger.debug(f"bulk position Changed by: {changed_by} at {datetime.now()}")
 
-            result = self.db_utils.save_device_positions_bulk(positions, changed_by)
+            # Only keys that moved beyond the configured epsilon are written. The cache holds
+            # absolute coordinates, so relative saves are always written. Write-through saves
+            # (batches) run inside a transaction and always go straight to the database.
+            skipped_keys = []
+            if coordinates == 'absolute' and not write_through:
+                positions, skipped_keys = position_cache.split_changed(positions, self.db_utils.get_position_stamp())
+            if not positions:
+                logger.info(f"Device positions unchanged: {len(skipped_keys)} keys skipped {datetime.now()}")
+                return {
+                    'success': True,
+                    'message': 'No position changes to save',
+                    'summary': {
+                        'device_rows_updated': 0,
+                        'block_rows_updated': 0,
+                        'total_rows_updated': 0,
+                        'keys_written': 0,
+                        'keys_skipped': len(skipped_keys)
+                    },
+                    'details': {},
+                    'updated_at': datetime.now().isoformat()
+                }
+
+            if position_write_behind_enabled and not write_through and position_write_buffer.start(TopologyDBUtils):
+                # Repeated saves while dragging are coalesced per key and written in the background.
+                pending_keys = position_write_buffer.add(positions, changed_by, coordinates)
+                # The cache only learns the new values once the flush has written them.
+                position_cache.invalidate(positions.keys())
+                logger.info(f"Device positions buffered: {len(positions)} keys, {pending_keys} pending {datetime.now()}")
+                return {
+                    'success': True,
+                    'message': 'Positions accepted',
+                    'coordinates': coordinates,
+                    'buffered': True,
+                    # Clients can tell when accepted positions are not reaching the database.
+                    'write_buffer': position_write_buffer.status(),
+                    'summary': {
+                        'device_rows_updated': 0,
+                        'block_rows_updated': 0,
+                        'total_rows_updated': 0,
+                        'keys_buffered': len(positions),
+                        'keys_skipped': len(skipped_keys),
+                        'pending_keys': pending_keys
+                    },
+                    'details': {},
+                    'updated_at': datetime.now().isoformat()
+                }
+
+            result = self.db_utils.save_device_positions_bulk(positions, changed_by, coordinates)
 
             if result['status'] == 'Success':
                 device_updates = result['device_rows_updated']
@@ -494,10 +1045,13 @@ class TopologyApp:
                 return {
                     'success': True,
                     'message': 'Positions saved successfully',
+                    'coordinates': coordinates,
                     'summary': {
                         'device_rows_updated': device_updates,
                         'block_rows_updated': block_updates,
                         'total_rows_updated': device_updates + block_updates,
+                        'keys_written': len(positions),
+                        'keys_skipped': len(skipped_keys)
                     },
                     'details': per_key_rows,
                     'updated_at': result['updated_at']
@@ -649,6 +1203,7 @@ class TopologyApp:
                 'skipped_count': result['skipped_count'],
                 'total_processed': result['total_processed'],
                 'created_block_ids': result['created_block_ids'],
+                'created_blocks': result['created_blocks'],
                 'skipped_blocks': result['skipped_blocks'],
                 'data': result['data']
             }
@@ -694,6 +1249,7 @@ class TopologyApp:
                 'success': True,
                 'message': f'Successfully deleted {result["deleted_count"]} records',
                 'deleted_count': result['deleted_count'],
+                'deleted_ids': result['deleted_ids'],
                 'record_ids': record_ids
             }
         else:
@@ -727,3 +1283,550 @@ class TopologyApp:
                 'success': False,
                 'message': result['error']
             }
+
+    def migrate_devices(self):
+        logger.debug("Starting device collection migration")
+        migrated_by, error = self._enforce_allowed('migrate_devices')
+        if error:
+            return error
+
+        result = self.db_utils.migrate_devices(migrated_by)
+        if result['status'] != 'Success':
+            logger.warning(f"Device migration failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Device migration completed: {result['devices_found']} devices, {result['devices_created']} created, {result['devices_filled']} filled, {result['rows_linked']} rows linked")
+        return {
+            'success': True,
+            'message': f"Migrated {result['devices_found']} devices",
+            'devices_found': result['devices_found'],
+            'devices_created': result['devices_created'],
+            'devices_filled': result['devices_filled'],
+            'rows_linked': result['rows_linked']
+        }
+
+    def migrate_block_positions(self):
+        logger.debug("Starting block position migration")
+        migrated_by, error = self._enforce_allowed('migrate_block_positions')
+        if error:
+            return error
+
+        result = self.db_utils.migrate_block_positions(migrated_by)
+        if result['status'] != 'Success':
+            logger.warning(f"Block position migration failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Block position migration completed: {result['blocks_found']} blocks, {result['blocks_written']} written")
+        return {
+            'success': True,
+            'message': f"Migrated positions for {result['blocks_found']} blocks",
+            'blocks_found': result['blocks_found'],
+            'blocks_written': result['blocks_written']
+        }
+
+    def migrate_relative_positions(self):
+        logger.debug("Starting relative position migration")
+        migrated_by, error = self._enforce_allowed('migrate_relative_positions')
+        if error:
+            return error
+
+        position_write_buffer.flush()
+        result = self.db_utils.migrate_relative_positions(migrated_by)
+        if result['status'] != 'Success':
+            logger.warning(f"Relative position migration failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Relative position migration completed: {result['devices_found']} devices, {result['devices_converted']} converted")
+        return {
+            'success': True,
+            'message': f"Converted {result['devices_converted']} devices to block-relative positions",
+            'devices_found': result['devices_found'],
+            'devices_converted': result['devices_converted']
+        }
+
+    def reconcile_block_counters(self):
+        logger.debug("Starting block counter reconciliation")
+        reconciled_by, error = self._enforce_allowed('reconcile_block_counters')
+        if error:
+            return error
+
+        result = self.db_utils.reconcile_block_counters(reconciled_by)
+        if result['status'] != 'Success':
+            logger.warning(f"Block counter reconciliation failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+        logger.info(f"Block counter reconciliation completed: {result['blocks_found']} blocks, {result['blocks_corrected']} corrected")
+        return {
+            'success': True,
+            'message': f"Reconciled counters for {result['blocks_found']} blocks",
+            'blocks_found': result['blocks_found'],
+            'blocks_corrected': result['blocks_corrected']
+        }
+
+    def _prepare_batch_operation(self, operation):
+        # Checks one operation's data and returns (group key, items for the merged call, keys it touches), or an error.
+        op = operation['op']
+        data = operation['data']
+        group = BATCH_COALESCED_OPERATIONS.get(op)
+
+        if op in BATCH_SINGLE_OPERATIONS:
+            if not isinstance(data, dict):
+                return None, 'data must be an object'
+            return {'group': None, 'items': data, 'keys': set()}, None
+
+        if op in ('add_block', 'update_record', 'delete_record', 'save_positions', 'update_device_attributes', 'add_blocks') \
+                and not isinstance(data, dict):
+            return None, 'data must be an object'
+
+        if group == 'add_blocks':
+            names = [data.get('block_name')] if op == 'add_block' else data.get('block_names')
+            if not isinstance(names, list) or not names or not all(isinstance(name, str) and name.strip() for name in names):
+                return None, 'block_name must be a non-empty string' if op == 'add_block' else 'block_names must be a non-empty array of names'
+            return {'group': (group,), 'items': names, 'keys': set(names)}, None
+
+        if group in ('add_records', 'update_records'):
+            if op == 'update_record':
+                records = [data]
+            else:
+                records = data.get('records') if isinstance(data, dict) else data
+            if not isinstance(records, list) or not records or not all(isinstance(record, dict) for record in records):
+                return None, 'records must be a non-empty array of objects'
+            if group == 'add_records':
+                return {'group': (group,), 'items': records, 'keys': set()}, None
+            record_ids = [str(record.get('record_id') or '').strip() for record in records]
+            if not all(record_ids):
+                return None, 'every record needs a record_id'
+            if len(set(record_ids)) != len(record_ids):
+                return None, 'record_id repeated within the operation'
+            return {'group': (group,), 'items': records, 'keys': set(record_ids)}, None
+
+        if group == 'delete_records':
+            record_ids = [data.get('record_id')] if op == 'delete_record' else data.get('record_ids')
+            if not isinstance(record_ids, list) or not record_ids or not all(str(rid or '').strip() for rid in record_ids):
+                return None, 'record_id is required' if op == 'delete_record' else 'record_ids must be a non-empty array'
+            record_ids = [str(rid).strip() for rid in record_ids]
+            return {'group': (group,), 'items': record_ids, 'keys': set(record_ids)}, None
+
+        if group == 'save_positions':
+            positions = data.get('positions')
+            coordinates = data.get('coordinates') or 'absolute'
+            if not isinstance(positions, dict) or not positions:
+                return None, 'positions must be a non-empty object'
+            if coordinates not in POSITION_COORDINATES:
+                return None, f'coordinates must be one of {list(POSITION_COORDINATES)}'
+            keys = {str(key).strip() for key in positions}
+            return {'group': (group, coordinates), 'items': positions, 'keys': keys}, None
+
+        entries = data.get('changes')
+        if isinstance(entries, dict):
+            entries = [dict(attributes or {}, device_id=device_id) if isinstance(attributes, dict) else None
+                       for device_id, attributes in entries.items()]
+        if not isinstance(entries, list) or not entries:
+            return None, 'changes must be a non-empty array or map'
+        changes = {}
+        for entry in entries:
+            device_id = str(entry.get('device_id') or '').strip() if isinstance(entry, dict) else ''
+            if not device_id:
+                return None, 'every change needs a device_id'
+            if all(entry.get(field) is None for field in ('type', 'vendor', 'block')):
+                return None, f'change for {device_id} needs at least one of type, vendor or block'
+            if device_id in changes:
+                return None, f'device_id {device_id} repeated within the operation'
+            changes[device_id] = dict(entry, device_id=device_id)
+        return {'group': (group,), 'items': list(changes.values()), 'keys': set(changes)}, None
+
+    def _run_batch_single(self, operation):
+        handlers = {
+            'add_record': self.add_network_topology_record,
+            'update_block': self.update_network_topology_block,
+            'delete_block': self.delete_network_topology_block,
+            'update_device_type': self.update_device_type
+        }
+        return [handlers[operation['op']](operation['data'])]
+
+    def _run_batch_group(self, group_key, prepared):
+        # Returns the merged call's response and one response per operation, built from that operation's own keys.
+        group = group_key[0]
+        if group == 'add_blocks':
+            response = self.add_network_topology_blocks_bulk({'block_names': [name for entry in prepared for name in entry['items']]})
+            if not response['success']:
+                return response, None
+            created = set(response['created_blocks'])
+            return response, [
+                {
+                    'success': True,
+                    'created_blocks': [name for name in entry['items'] if name in created],
+                    'skipped_blocks': [name for name in entry['items'] if name not in created]
+                }
+                for entry in prepared
+            ]
+
+        if group in ('add_records', 'update_records'):
+            records = [record for entry in prepared for record in entry['items']]
+            if group == 'add_records':
+                response = self.add_network_topology_records_bulk(records)
+                succeeded = ('Success',)
+            else:
+                response = self.update_network_topology_records_bulk(records)
+                succeeded = ('Success', 'Unchanged')
+            if not response['success']:
+                return response, None
+            responses = []
+            offset = 0
+            for entry in prepared:
+                results = response['results'][offset:offset + len(entry['items'])]
+                offset += len(entry['items'])
+                responses.append({
+                    'success': all(result['status'] in succeeded for result in results),
+                    'results': results
+                })
+            return response, responses
+
+        if group == 'delete_records':
+            response = self.delete_network_topology_bulk_by_ids({'record_ids': [rid for entry in prepared for rid in entry['items']]})
+            if not response['success']:
+                return response, None
+            deleted = set(response['deleted_ids'])
+            return response, [
+                {
+                    'success': all(rid in deleted for rid in entry['items']),
+                    'deleted_ids': [rid for rid in entry['items'] if rid in deleted],
+                    'not_found_ids': [rid for rid in entry['items'] if rid not in deleted]
+                }
+                for entry in prepared
+            ]
+
+        if group == 'save_positions':
+            positions = {}
+            for entry in prepared:
+                positions.update(entry['items'])
+            response = self.save_device_positions(positions, group_key[1], write_through=True)
+            if not response['success']:
+                return response, None
+            details = response.get('details') or {}
+            return response, [
+                {'success': True, 'details': {key: details.get(key, 0) for key in entry['keys']}}
+                for entry in prepared
+            ]
+
+        response = self.update_device_attributes_bulk({'changes': [change for entry in prepared for change in entry['items']]})
+        if not response['success']:
+            return response, None
+        not_found = set(response['not_found'])
+        return response, [
+            {
+                'success': True,
+                'updated': sorted(key for key in entry['keys'] if key not in not_found),
+                'not_found': sorted(key for key in entry['keys'] if key in not_found)
+            }
+            for entry in prepared
+        ]
+
+    def _run_batch(self, operations, prepared, results, stop_on_error):
+        # Consecutive operations of one kind share a call while the keys they touch do not overlap;
+        # an overlap starts a new call so each operation sees the effect of the ones before it.
+        groups = []
+        for index, operation in enumerate(operations):
+            entry = prepared[index]
+            if entry is None:
+                groups.append((None, []))
+                continue
+            group = groups[-1] if groups else None
+            if (entry['group'] is not None and group is not None and group[0] == entry['group']
+                    and not any(entry['keys'] & prepared[i]['keys'] for i in group[1])):
+                group[1].append(index)
+            else:
+                groups.append((entry['group'], [index]))
+
+        for key, indexes in groups:
+            if not indexes:
+                continue
+            if key is None:
+                responses = self._run_batch_single(operations[indexes[0]])
+            else:
+                merged, responses = self._run_batch_group(key, [prepared[index] for index in indexes])
+                if responses is None:
+                    # The merged call itself failed and may have written part of its work.
+                    for index in indexes:
+                        results[index] = self._batch_result(operations, index, merged, len(indexes))
+                    raise BatchAborted(indexes[0], merged.get('message', 'Operation failed'))
+
+            for index, response in zip(indexes, responses):
+                results[index] = self._batch_result(operations, index, response, len(indexes))
+            if stop_on_error:
+                failed = [index for index in indexes if not results[index]['success']]
+                if failed:
+                    raise BatchAborted(failed[0], results[failed[0]]['response'].get('message', 'Operation failed'))
+        return results
+
+    def _batch_result(self, operations, index, response, coalesced):
+        return {
+            'index': index,
+            'op': operations[index]['op'],
+            'success': bool(response.get('success')),
+            'coalesced': coalesced,
+            'response': response
+        }
+
+    def execute_batch(self, data):
+        logger.debug("Starting batch operation")
+        _, error = self._enforce_allowed('execute_batch')
+        if error:
+            return error
+
+        operations = data.get('operations') if isinstance(data, dict) else data
+        stop_on_error = bool(data.get('stop_on_error', False)) if isinstance(data, dict) else False
+        if not isinstance(operations, list) or not operations:
+            return {'success': False, 'message': 'Payload must contain a non-empty "operations" array'}
+        if len(operations) > batch_max_operations:
+            return {'success': False, 'message': f'Payload exceeds the limit of {batch_max_operations} operations'}
+
+        supported = set(BATCH_COALESCED_OPERATIONS) | set(BATCH_SINGLE_OPERATIONS)
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or operation.get('op') not in supported:
+                return {'success': False, 'message': f"Payload operation {index}: op must be one of {sorted(supported)}"}
+            if operation.get('data') is None:
+                return {'success': False, 'message': f"Payload operation {index}: data is required"}
+
+        prepared = []
+        invalid = {}
+        for index, operation in enumerate(operations):
+            entry, error = self._prepare_batch_operation(operation)
+            prepared.append(entry)
+            if error:
+                invalid[index] = error
+        if invalid and stop_on_error:
+            index = min(invalid)
+            return {'success': False, 'message': f"Payload operation {index}: {invalid[index]}"}
+
+        def run(session):
+            # Built afresh on every attempt, since a transient error re-runs the whole transaction.
+            results = [None] * len(operations)
+            for index, message in invalid.items():
+                results[index] = self._batch_result(operations, index, {'success': False, 'message': f'Invalid data: {message}'}, 1)
+            try:
+                return self._run_batch(operations, prepared, results, stop_on_error)
+            except BatchAborted as aborted:
+                aborted.results = results
+                aborted.atomic = session is not None
+                raise
+
+        try:
+            results = self.db_utils.run_in_session(run)
+        except BatchAborted as aborted:
+            self.db_utils.discard_uncommitted_state()
+            results = aborted.results
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = self._batch_result(operations, index, {'success': False, 'message': 'Not run: the batch was aborted'}, 0)
+                elif aborted.atomic and result['success']:
+                    result['success'] = False
+                    result['response'] = {'success': False, 'message': 'Rolled back: the batch was aborted', 'attempted': result['response']}
+            state = 'rolled back' if aborted.atomic else 'stopped; operations before it stay applied (no transaction support)'
+            logger.warning(f"Batch aborted at operation {aborted.index}: {aborted.message}")
+            return {
+                'success': False,
+                'message': f'Operation failed: batch {state} at operation {aborted.index}: {aborted.message}',
+                'rolled_back': aborted.atomic,
+                'operation_count': len(operations),
+                'failed_count': len([result for result in results if not result['success']]),
+                'results': results
+            }
+        except Exception as e:
+            self.db_utils.discard_uncommitted_state()
+            logger.error(f"Batch error: {str(e)}")
+            return {'success': False, 'message': f'Operation failed: batch aborted: {str(e)}'}
+
+        failed_count = len([result for result in results if not result['success']])
+        logger.info(f"Batch completed: {len(operations)} operations, {failed_count} failed")
+        return {
+            'success': True,
+            'message': f'Executed {len(operations)} operations, {failed_count} failed',
+            'operation_count': len(operations),
+            'failed_count': failed_count,
+            'results': results
+        }
+
+    def get_block_rules(self):
+        logger.debug("Starting block rules retrieval operation")
+        try:
+            self._refresh_block_rules(force=True)
+            return {
+                'success': True,
+                'source': block_rule_engine.source,
+                'version': block_rule_engine.version,
+                'data': block_rule_engine.rules,
+                'cache': block_rule_engine.cache_info()
+            }
+        except Exception as e:
+            logger.error(f"Get block rules error: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Failed to retrieve block rules: {str(e)}'
+            }
+
+    def update_block_rules(self, data):
+        logger.debug("Starting block rules update operation")
+        updated_by, error = self._enforce_allowed('update_block_rules')
+        if error:
+            return error
+
+        rules = (data or {}).get('rules')
+        validation_errors = validate_block_rules(rules)
+        if validation_errors:
+            return {
+                'success': False,
+                'message': validation_errors[0]
+            }
+
+        result = self.db_utils.save_block_rules(rules, updated_by)
+        if result['status'] == 'Success':
+            self._refresh_block_rules(force=True)
+            logger.info(f"Block rules updated successfully: {result['rules_count']} rules, version {result['version']}")
+            return {
+                'success': True,
+                'message': 'Block rules updated successfully',
+                'version': result['version'],
+                'rules_count': result['rules_count'],
+                'updated_at': result['updated_at']
+            }
+        else:
+            logger.warning(f"Block rules update failed: {result['error']}")
+            return {
+                'success': False,
+                'message': result['error']
+            }
+
+    def start_block_reclassification(self, data):
+        logger.debug("Starting block reclassification job request")
+        started_by, error = self._enforce_allowed('start_block_reclassification')
+        if error:
+            return error
+
+        data = data or {}
+        dry_run = bool(data.get('dry_run', True))
+        include_legacy = bool(data.get('include_legacy', False))
+
+        job, job_error = start_block_reclassification(self.db_utils, dry_run, include_legacy, started_by)
+        if job_error:
+            logger.warning(f"Block reclassification not started: {job_error}")
+            return {
+                'success': False,
+                'message': job_error
+            }
+
+        logger.info(f"Block reclassification job queued: {job.job_id}, dry_run={dry_run}, include_legacy={include_legacy}")
+        return {
+            'success': True,
+            'message': 'Block reclassification job started',
+            'job_id': job.job_id,
+            'data': job.to_dict()
+        }
+
+    def get_block_reclassification_status(self, job_id=''):
+        logger.debug("Starting block reclassification status retrieval")
+        if not job_id:
+            return {
+                'success': True,
+                'data': [job.to_dict() for job in list_block_reclassification_jobs()]
+            }
+
+        job = get_block_reclassification_job(job_id)
+        if not job:
+            return {
+                'success': False,
+                'message': f'No reclassification job found with ID: {job_id}'
+            }
+        return {
+            'success': True,
+            'data': job.to_dict()
+        }
+
+    def recompute_layout(self, data):
+        logger.debug("Starting layout recompute operation")
+        changed_by, error = self._enforce_allowed('recompute_layout')
+        if error:
+            return error
+
+        data = data or {}
+        layout_mode = data.get('mode', 'force')
+        if layout_mode not in LAYOUT_MODES or layout_mode == 'grid':
+            return {
+                'success': False,
+                'message': f'Invalid mode: {layout_mode}. Expected one of {[m for m in LAYOUT_MODES if m != "grid"]}'
+            }
+        pin_saved = bool(data.get('pin_saved', True))
+        persist = bool(data.get('persist', False))
+        try:
+            iterations = int(data['iterations']) if data.get('iterations') else None
+        except (TypeError, ValueError):
+            return {
+                'success': False,
+                'message': 'iterations must be an integer'
+            }
+
+        try:
+            position_write_buffer.flush()
+            position_rows = list(self.db_utils.get_layout_position_rows())
+            started = datetime.now()
+            layout_result = self._compute_layout(layout_mode, position_rows, pin_saved=pin_saved, iterations=iterations)
+            elapsed_ms = int((datetime.now() - started).total_seconds() * 1000)
+
+            positions = dict(layout_result['device_positions'])
+            positions.update(layout_result['block_positions'])
+
+            response = {
+                'success': True,
+                'message': f'Layout recomputed with mode {layout_mode}',
+                'mode': layout_mode,
+                'pin_saved': pin_saved,
+                'persisted': False,
+                'elapsed_ms': elapsed_ms,
+                'count': {
+                    'nodes': len(layout_result['device_positions']),
+                    'blocks': len(layout_result['block_positions'])
+                },
+                'positions': positions
+            }
+
+            if persist:
+                saved = self.topology_utils.build_layout_graph(position_rows)
+                saved_positions = dict(saved['device_positions'])
+                saved_positions.update(saved['block_positions'])
+                changed = {key: pos for key, pos in positions.items() if saved_positions.get(key) != pos}
+                result = self.db_utils.save_device_positions_bulk(changed, changed_by) if changed else {
+                    'status': 'Success', 'device_rows_updated': 0, 'block_rows_updated': 0
+                }
+                if result['status'] != 'Success':
+                    return {
+                        'success': False,
+                        'message': result['error']
+                    }
+                response['persisted'] = True
+                response['summary'] = {
+                    'keys_written': len(changed),
+                    'device_rows_updated': result['device_rows_updated'],
+                    'block_rows_updated': result['block_rows_updated']
+                }
+
+            logger.info(f"Layout recomputed: mode={layout_mode}, {response['count']['nodes']} nodes, {response['count']['blocks']} blocks in {elapsed_ms} ms, persisted={response['persisted']}")
+            return response
+
+        except Exception as e:
+            logger.error(f"Layout recompute error: {str(e)}")
+            return {
+                'success': False,
+                'message': f'Failed to recompute layout: {str(e)}'
+            }
@@ -0,0 +1,90 @@
+from utils.topology_utilities import TopologyUtilities
+from utils.versioned_index import VersionedIndex
+
+_topology_utils = TopologyUtilities()
+
+
+class AdjacencyIndex(VersionedIndex):
+    # device id -> interface -> {record id: link}, plus the set of interfaces carrying more than one link.
+    STATE = ('_devices', '_row_keys', '_conflicts')
+
+    def _reset(self):
+        self._devices = {}
+        self._row_keys = {}
+        self._conflicts = set()
+
+    @staticmethod
+    def _side(doc, side):
+        ip = _topology_utils.clean_field_value(doc.get(f'device_{side}_ip', ''))
+        hostname = _topology_utils.clean_field_value(doc.get(f'device_{side}_hostname', ''))
+        interface = str(doc.get(f'device_{side}_interface', '') or '').strip()
+        return _topology_utils.compute_device_id(ip, hostname), ip, hostname, interface
+
+    def _add_doc(self, doc):
+        row_id = doc['_id']
+        a = self._side(doc, 'a')
+        b = self._side(doc, 'b')
+        comments = str(doc.get('comments', '') or '')
+        keys = []
+        for local, peer in ((a, b), (b, a)):
+            if not local[0]:
+                continue
+            interfaces = self._devices.setdefault(local[0], {})
+            links = interfaces.setdefault(local[3], {})
+            links[row_id] = {
+                'record_id': str(row_id),
+                'peer_id': peer[0],
+                'peer_ip': peer[1],
+                'peer_hostname': peer[2],
+                'peer_interface': peer[3],
+                'comments': comments
+            }
+            key = (local[0], local[3])
+            keys.append(key)
+            if local[3] and len(links) > 1:
+                self._conflicts.add(key)
+        self._row_keys[row_id] = keys
+
+    def _remove_row(self, row_id):
+        for device_id, interface in self._row_keys.pop(row_id, ()):
+            interfaces = self._devices.get(device_id)
+            if interfaces is None:
+                continue
+            links = interfaces.get(interface)
+            if links is None:
+                continue
+            links.pop(row_id, None)
+            if len(links) <= 1:
+                self._conflicts.discard((device_id, interface))
+            if not links:
+                del interfaces[interface]
+                if not interfaces:
+                    del self._devices[device_id]
+
+    def device(self, device_id):
+        with self._lock:
+            interfaces = self._devices.get(device_id)
+            if interfaces is None:
+                return None
+            return [
+                {
+                    'interface': interface,
+                    'links': list(links.values()),
+                    'shared': bool(interface) and len(links) > 1
+                }
+                for interface, links in sorted(interfaces.items())
+            ]
+
+    def conflicts(self):
+        with self._lock:
+            return [
+                {
+                    'device_id': device_id,
+                    'interface': interface,
+                    'links': list(self._devices[device_id][interface].values())
+                }
+                for device_id, interface in sorted(self._conflicts)
+            ]
+
+
+adjacency_index = AdjacencyIndex()
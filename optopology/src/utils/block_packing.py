@@ -0,0 +1,172 @@
+import math
+
+
+class SpatialHash:
+    def __init__(self, cell_w, cell_h):
+        self.cell_w = float(cell_w)
+        self.cell_h = float(cell_h)
+        self.cells = {}
+
+    def _key(self, x, y):
+        return (math.floor(x / self.cell_w), math.floor(y / self.cell_h))
+
+    def add(self, x, y):
+        self.cells.setdefault(self._key(x, y), []).append((x, y))
+
+    def is_free(self, x, y, min_dx, min_dy):
+        kx, ky = self._key(x, y)
+        for i in (kx - 1, kx, kx + 1):
+            for j in (ky - 1, ky, ky + 1):
+                for px, py in self.cells.get((i, j), ()):
+                    if abs(px - x) < min_dx and abs(py - y) < min_dy:
+                        return False
+        return True
+
+
+class BlockPacker:
+    def __init__(self, topology_utils, aspect_ratio=1.6):
+        self.devices_per_row = topology_utils.DEVICES_PER_ROW
+        self.spacing_x = topology_utils.DEVICE_SPACING_X
+        self.spacing_y = topology_utils.DEVICE_SPACING_Y
+        self.gap = float(topology_utils.DEVICE_SPACING_X)
+        self.aspect_ratio = aspect_ratio
+
+    def footprint(self, device_count):
+        device_count = max(1, device_count)
+        cols = min(device_count, self.devices_per_row)
+        rows = math.ceil(device_count / self.devices_per_row)
+        return (cols * self.spacing_x + self.gap, rows * self.spacing_y + self.gap)
+
+    def block_rect(self, center, device_count):
+        width, height = self.footprint(device_count)
+        return (center['x'] - width / 2.0, center['y'] - height / 2.0,
+                center['x'] + width / 2.0, center['y'] + height / 2.0)
+
+    def _skyline_pack(self, rects, width):
+        # Bottom-left skyline: every segment is [x, y, width] of the current top edge.
+        skyline = [[0.0, 0.0, width]]
+        placed = {}
+        for key, w, h in rects:
+            best = None
+            for i in range(len(skyline)):
+                x = skyline[i][0]
+                if x + w > width + 1e-6:
+                    break
+                y = 0.0
+                remaining = w
+                j = i
+                while remaining > 1e-6 and j < len(skyline):
+                    y = max(y, skyline[j][1])
+                    remaining -= skyline[j][2]
+                    j += 1
+                if best is None or (y + h, x) < (best[1] + h, best[0]):
+                    best = (x, y, i)
+
+            x, y, i = best
+            placed[key] = (x, y)
+            end = x + w
+            rest = []
+            j = i
+            while j < len(skyline):
+                seg_x, seg_y, seg_w = skyline[j]
+                if seg_x + seg_w <= end + 1e-6:
+                    j += 1
+                    continue
+                if seg_x < end:
+                    rest = [[end, seg_y, seg_x + seg_w - end]]
+                    j += 1
+                break
+            skyline[i:j] = [[x, y + h, w]] + rest
+            merged = []
+            for segment in skyline:
+                if merged and abs(merged[-1][1] - segment[1]) < 1e-6:
+                    merged[-1][2] += segment[2]
+                else:
+                    merged.append(segment)
+            skyline = merged
+        return placed
+
+    def pack(self, block_counts, occupied=()):
+        # Returns block centres for block_counts, packed below everything in occupied.
+        if not block_counts:
+            return {}
+
+        rects = []
+        for block in sorted(block_counts):
+            width, height = self.footprint(block_counts[block])
+            rects.append((block, width, height))
+        rects.sort(key=lambda r: (-r[2], -r[1], r[0]))
+
+        occupied = list(occupied)
+        if occupied:
+            origin_x = min(r[0] for r in occupied)
+            origin_y = max(r[3] for r in occupied) + self.gap
+            occupied_width = max(r[2] for r in occupied) - origin_x
+        else:
+            origin_x = 0.0
+            origin_y = 0.0
+            occupied_width = 0.0
+
+        total_area = sum(w * h for _, w, h in rects)
+        widest = max(w for _, w, _ in rects)
+        canvas_width = max(widest, occupied_width, math.sqrt(total_area * self.aspect_ratio))
+
+        placed = self._skyline_pack(rects, canvas_width)
+        centers = {}
+        for block, width, height in rects:
+            x, y = placed[block]
+            centers[block] = {'x': origin_x + x + width / 2.0, 'y': origin_y + y + height / 2.0}
+        return centers
+
+    def fill_block_slots(self, origin, device_ids, total_devices, device_hash):
+        positions = {}
+        rows = max(1, math.ceil(total_devices / self.devices_per_row))
+        start_x = origin['x'] - (self.devices_per_row - 1) * self.spacing_x / 2.0
+        start_y = origin['y'] - (rows - 1) * self.spacing_y / 2.0
+        min_dx = self.spacing_x / 2.0
+        min_dy = self.spacing_y / 2.0
+
+        slot = 0
+        for device_id in device_ids:
+            while True:
+                x = start_x + (slot % self.devices_per_row) * self.spacing_x
+                y = start_y + (slot // self.devices_per_row) * self.spacing_y
+                slot += 1
+                if device_hash.is_free(x, y, min_dx, min_dy):
+                    break
+            positions[device_id] = {'x': x, 'y': y}
+            device_hash.add(x, y)
+        return positions
+
+    def complete_positions(self, positions, block_devices, unplaced_devices):
+        # positions holds every saved device/block position and is filled in place.
+        device_hash = SpatialHash(self.spacing_x, self.spacing_y)
+        occupied = []
+        for key, position in positions.items():
+            if key in block_devices:
+                occupied.append(self.block_rect(position, len(block_devices[key])))
+            else:
+                device_hash.add(position['x'], position['y'])
+                occupied.append((position['x'], position['y'], position['x'], position['y']))
+
+        to_pack = {}
+        for block, members in block_devices.items():
+            if block in positions:
+                continue
+            saved = [positions[d] for d in members if d in positions]
+            if saved:
+                positions[block] = {
+                    'x': sum(p['x'] for p in saved) / len(saved),
+                    'y': sum(p['y'] for p in saved) / len(saved)
+                }
+                occupied.append(self.block_rect(positions[block], len(members)))
+            else:
+                to_pack[block] = len(members)
+
+        positions.update(self.pack(to_pack, occupied))
+
+        for block in sorted(unplaced_devices):
+            positions.update(self.fill_block_slots(
+                positions[block], sorted(unplaced_devices[block]), len(block_devices[block]), device_hash
+            ))
+        return positions
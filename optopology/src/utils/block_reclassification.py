@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+from props import block_reclassify_batch_size, block_reclassify_batch_pause_seconds, block_reclassify_max_diff_samples
+from utils.block_rules import block_rule_engine
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_MAX_KEPT_JOBS = 20
+
+
+class BlockReclassificationJob:
+    def __init__(self, db_utils, dry_run=True, include_legacy=False, started_by='System User'):
+        self.db_utils = db_utils
+        self.dry_run = dry_run
+        self.include_legacy = include_legacy
+        self.started_by = started_by
+        self.job_id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.error = None
+        self.total_rows = 0
+        self.processed_rows = 0
+        self.changed_rows = 0
+        self.changed_sides = 0
+        self.applied_rows = 0
+        self.batches_written = 0
+        self.transitions = {}
+        self.diff = []
+        self.created_date = datetime.now()
+        self.started_date = None
+        self.finished_date = None
+
+    def to_dict(self):
+        progress = 100.0 if self.status == 'completed' else (
+            round(self.processed_rows * 100.0 / self.total_rows, 1) if self.total_rows else 0.0
+        )
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'dry_run': self.dry_run,
+            'include_legacy': self.include_legacy,
+            'started_by': self.started_by,
+            'progress_percent': progress,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'changed_rows': self.changed_rows,
+            'changed_sides': self.changed_sides,
+            'applied_rows': self.applied_rows,
+            'batches_written': self.batches_written,
+            'transitions': self.transitions,
+            'diff': self.diff,
+            'diff_truncated': self.changed_sides > len(self.diff),
+            'rules_version': block_rule_engine.version,
+            'error': self.error,
+            'created_date': self.created_date.isoformat(),
+            'started_date': self.started_date.isoformat() if self.started_date else None,
+            'finished_date': self.finished_date.isoformat() if self.finished_date else None
+        }
+
+    def _row_changes(self, doc):
+        changes = []
+        for side in ('a', 'b'):
+            auto_flag = doc.get(f'device_{side}_block_auto')
+            if not (auto_flag is True or (self.include_legacy and auto_flag is None)):
+                continue
+
+            old_block = doc.get(f'device_{side}_block') or ''
+            new_block = block_rule_engine.classify(
+                doc.get(f'device_{side}_hostname', ''),
+                doc.get(f'device_{side}_ip', ''),
+                doc.get(f'device_{side}_type', '')
+            )
+            if new_block != old_block:
+                changes.append({
+                    '_id': doc['_id'],
+                    'side': side,
+                    'hostname': doc.get(f'device_{side}_hostname', ''),
+                    'ip': doc.get(f'device_{side}_ip', ''),
+                    'old_block': old_block,
+                    'new_block': new_block
+                })
+        return changes
+
+    def _flush(self, pending):
+        if self.dry_run or not pending:
+            return
+        result = self.db_utils.apply_block_reassignments(pending, self.started_by)
+        if result['status'] != 'Success':
+            raise RuntimeError(result['error'])
+        self.applied_rows += result['modified_count']
+        self.batches_written += 1
+
+    def run(self):
+        self.status = 'running'
+        self.started_date = datetime.now()
+        cursor = None
+        try:
+            block_rule_engine.refresh_if_stale(self.db_utils.get_block_rules, force=True)
+            self.total_rows = self.db_utils.count_block_reclassification_rows(self.include_legacy)
+            logger.info(f"Block reclassification job {self.job_id} started: {self.total_rows} candidate rows, dry_run={self.dry_run}")
+
+            cursor = self.db_utils.iter_block_reclassification_rows(self.include_legacy, block_reclassify_batch_size)
+            pending = []
+            for doc in cursor:
+                changes = self._row_changes(doc)
+                self.processed_rows += 1
+                if changes:
+                    self.changed_rows += 1
+                    for change in changes:
+                        self.changed_sides += 1
+                        transition = f"{change['old_block'] or '(none)'} -> {change['new_block'] or '(none)'}"
+                        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+                        if len(self.diff) < block_reclassify_max_diff_samples:
+                            self.diff.append({
+                                'record_id': str(change['_id']),
+                                'side': change['side'],
+                                'hostname': change['hostname'],
+                                'ip': change['ip'],
+                                'old_block': change['old_block'],
+                                'new_block': change['new_block']
+                            })
+                    pending.extend(changes)
+
+                if self.processed_rows % block_reclassify_batch_size == 0:
+                    self._flush(pending)
+                    pending = []
+                    # Yield to request threads between batches.
+                    time.sleep(block_reclassify_batch_pause_seconds)
+
+            self._flush(pending)
+            self.status = 'completed'
+            logger.info(f"Block reclassification job {self.job_id} completed: {self.processed_rows} rows scanned, {self.changed_sides} block changes, {self.applied_rows} rows updated")
+        except Exception as e:
+            traceback.print_exc()
+            self.status = 'failed'
+            self.error = str(e)
+            logger.error(f"Block reclassification job {self.job_id} failed: {str(e)}")
+        finally:
+            if cursor is not None:
+                cursor.close()
+            self.finished_date = datetime.now()
+
+
+def start_block_reclassification(db_utils, dry_run=True, include_legacy=False, started_by='System User'):
+    with _jobs_lock:
+        if not dry_run:
+            for job in _jobs.values():
+                if not job.dry_run and job.status in ('queued', 'running'):
+                    return None, f'A block reclassification job is already running: {job.job_id}'
+
+        job = BlockReclassificationJob(db_utils, dry_run, include_legacy, started_by)
+        _jobs[job.job_id] = job
+        finished = [j for j in _jobs.values() if j.status in ('completed', 'failed')]
+        for old_job in sorted(finished, key=lambda j: j.created_date)[:max(0, len(_jobs) - _MAX_KEPT_JOBS)]:
+            _jobs.pop(old_job.job_id, None)
+
+    threading.Thread(target=job.run, name=f'block-reclassify-{job.job_id}', daemon=True).start()
+    return job, None
+
+
+def get_block_reclassification_job(job_id):
+    return _jobs.get(job_id)
+
+
+def list_block_reclassification_jobs():
+    return sorted(_jobs.values(), key=lambda j: j.created_date, reverse=True)
@@ -0,0 +1,179 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from props import block_rules_cache_size, block_rules_refresh_seconds
+
+logger = logging.getLogger(__name__)
+
+RULE_TYPES = ('ip', 'device_type', 'keyword')
+
+# Mirrors the original if-chain in determine_block: the lowest priority wins,
+# an empty block_name means "never assign a block".
+DEFAULT_BLOCK_RULES = [
+    {'rule_type': 'device_type', 'match': ['isp'], 'block_name': '', 'priority': 0},
+    {'rule_type': 'ip', 'match': ['10.99.18.253', '10.99.18.254'], 'block_name': 'core-block', 'priority': 10},
+    {'rule_type': 'device_type', 'match': ['core_switch'], 'block_name': 'core-block', 'priority': 20},
+    {'rule_type': 'keyword', 'match': ['COR', 'CORE'], 'block_name': 'core-block', 'priority': 30},
+    {'rule_type': 'keyword', 'match': ['INT', 'INTERNET'], 'block_name': 'internet-block', 'priority': 40},
+    {'rule_type': 'keyword', 'match': ['OOB', 'OUT OF BAND'], 'block_name': 'oob-block', 'priority': 50},
+    {'rule_type': 'keyword', 'match': ['WAN', 'WIDE AREA'], 'block_name': 'wan-block', 'priority': 60},
+    {'rule_type': 'keyword', 'match': ['EXTNET', 'EXTRANET', 'PARTNER'], 'block_name': 'extranet-block', 'priority': 70},
+    {'rule_type': 'keyword', 'match': ['OTV', 'REPL', 'REPLICATION'], 'block_name': 'replication-block', 'priority': 80},
+    {'rule_type': 'keyword', 'match': ['DC', 'DATACENTER', 'ACI'], 'block_name': 'datacenter-block', 'priority': 90},
+    {'rule_type': 'keyword', 'match': ['VIS', 'VISIBILITY', 'MONITOR'], 'block_name': 'visibility-block', 'priority': 100},
+    {'rule_type': 'keyword', 'match': ['DMZ', 'PERIMETER', 'BORDER'], 'block_name': 'dmz-block', 'priority': 110},
+    {'rule_type': 'keyword', 'match': ['EXT', 'EXTERNAL', 'EDGE'], 'block_name': 'external-block', 'priority': 120},
+    {'rule_type': 'device_type', 'match': ['firewall', 'ips', 'proxy'], 'block_name': 'dmz-block', 'priority': 200},
+]
+
+_TOKEN_SPLIT = re.compile(r'[^A-Za-z0-9]+')
+
+
+def tokenize_hostname(hostname):
+    return tuple(t for t in _TOKEN_SPLIT.split((hostname or '').upper()) if t)
+
+
+def validate_block_rules(rules):
+    if not isinstance(rules, list) or not rules:
+        return ['rules must be a non-empty array']
+
+    errors = []
+    for idx, rule in enumerate(rules, start=1):
+        if not isinstance(rule, dict):
+            errors.append(f'Rule {idx}: must be an object')
+            continue
+        if rule.get('rule_type') not in RULE_TYPES:
+            errors.append(f"Rule {idx}: rule_type must be one of {list(RULE_TYPES)}")
+        match = rule.get('match')
+        if isinstance(match, str):
+            match = [match]
+        if not isinstance(match, list) or not [m for m in match if str(m or '').strip()]:
+            errors.append(f'Rule {idx}: match must be a non-empty string or array of strings')
+        if not isinstance(rule.get('block_name', ''), str):
+            errors.append(f'Rule {idx}: block_name must be a string')
+        try:
+            int(rule.get('priority'))
+        except (TypeError, ValueError):
+            errors.append(f'Rule {idx}: priority must be an integer')
+    return errors
+
+
+class CompiledBlockRules:
+    def __init__(self, rules, cache_size):
+        self.ip_rules = {}
+        self.type_rules = {}
+        self.phrase_rules = {}
+        self.max_phrase_len = 1
+
+        for rule in rules:
+            if rule.get('enabled', True) is False:
+                continue
+            match = rule['match']
+            if isinstance(match, str):
+                match = [match]
+            outcome = (int(rule['priority']), rule.get('block_name') or '')
+
+            for value in match:
+                value = str(value or '').strip()
+                if not value:
+                    continue
+                if rule['rule_type'] == 'ip':
+                    self._keep_best(self.ip_rules, value, outcome)
+                elif rule['rule_type'] == 'device_type':
+                    self._keep_best(self.type_rules, value.lower(), outcome)
+                else:
+                    phrase = tokenize_hostname(value)
+                    if phrase:
+                        self._keep_best(self.phrase_rules, phrase, outcome)
+                        self.max_phrase_len = max(self.max_phrase_len, len(phrase))
+
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def _keep_best(table, key, outcome):
+        current = table.get(key)
+        if current is None or outcome[0] < current[0]:
+            table[key] = outcome
+
+    def _classify(self, hostname, ip, device_type):
+        best = self.ip_rules.get((ip or '').strip())
+
+        type_outcome = self.type_rules.get((device_type or '').strip().lower())
+        if type_outcome and (best is None or type_outcome[0] < best[0]):
+            best = type_outcome
+
+        if self.phrase_rules:
+            tokens = tokenize_hostname(hostname)
+            for i in range(len(tokens)):
+                for n in range(1, min(self.max_phrase_len, len(tokens) - i) + 1):
+                    outcome = self.phrase_rules.get(tokens[i:i + n])
+                    if outcome and (best is None or outcome[0] < best[0]):
+                        best = outcome
+
+        return best[1] if best else ''
+
+
+class BlockRuleEngine:
+    def __init__(self, refresh_seconds=block_rules_refresh_seconds, cache_size=block_rules_cache_size):
+        self.refresh_seconds = refresh_seconds
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self.version = None
+        self.source = 'default'
+        self.rules = DEFAULT_BLOCK_RULES
+        self._compiled = CompiledBlockRules(DEFAULT_BLOCK_RULES, cache_size)
+
+    def is_stale(self):
+        return time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def refresh_if_stale(self, loader, force=False):
+        if not force and not self.is_stale():
+            return
+        with self._lock:
+            if not force and not self.is_stale():
+                return
+            try:
+                document = loader()
+            except Exception as e:
+                logger.warning(f"Could not load block rules, keeping current set: {str(e)}")
+                self._loaded_at = time.monotonic()
+                return
+            self._install(document)
+            self._loaded_at = time.monotonic()
+
+    def _install(self, document):
+        rules = (document or {}).get('rules') or []
+        version = (document or {}).get('version')
+        if not rules or validate_block_rules(rules):
+            if rules:
+                logger.warning("Stored block rules are invalid, falling back to default rules")
+            if self.source != 'default':
+                self.rules = DEFAULT_BLOCK_RULES
+                self._compiled = CompiledBlockRules(DEFAULT_BLOCK_RULES, self.cache_size)
+                self.source = 'default'
+                self.version = None
+            return
+        if self.source == 'database' and version == self.version:
+            return
+        self._compiled = CompiledBlockRules(rules, self.cache_size)
+        self.rules = rules
+        self.source = 'database'
+        self.version = version
+        logger.info(f"Block rules reloaded: {len(rules)} rules, version {version}")
+
+    def classify(self, hostname, ip, device_type):
+        try:
+            return self._compiled.classify(str(hostname or ''), str(ip or ''), str(device_type or ''))
+        except Exception:
+            return ''
+
+    def cache_info(self):
+        info = self._compiled.classify.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+block_rule_engine = BlockRuleEngine()
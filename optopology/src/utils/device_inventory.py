@@ -0,0 +1,95 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+
+DEVICE_SORT_FIELDS = ('hostname', 'ip', 'type', 'vendor', 'block', 'degree', 'interface_count')
+DEVICE_RECORD_FIELDS = ('id', 'hostname', 'ip', 'type', 'vendor', 'block', 'degree', 'interface_count')
+
+
+def encode_device_cursor(value, device_id):
+    return base64.urlsafe_b64encode(json.dumps([value, device_id]).encode()).decode()
+
+
+def decode_device_cursor(cursor):
+    try:
+        value, device_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return value, device_id
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class DeviceInventory:
+    # A snapshot of every distinct device at one topology version; sorted orders are built lazily and reused.
+    def __init__(self, devices):
+        self.devices = devices
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sort_value(device, sort_by):
+        if sort_by in ('degree', 'interface_count'):
+            return device.get(sort_by) or 0
+        if sort_by == 'ip':
+            return device.get('ip_key') or ''
+        return str(device.get(sort_by) or '').lower()
+
+    def _order(self, sort_by):
+        with self._lock:
+            order = self._orders.get(sort_by)
+            if order is None:
+                keyed = sorted(((self._sort_value(device, sort_by), device['id']), device) for device in self.devices)
+                order = self._orders[sort_by] = ([key for key, _ in keyed], [device for _, device in keyed])
+            return order
+
+    @staticmethod
+    def _matches(device, text, type_filter, vendor_filter, block_filter, ip_range):
+        if text and text not in str(device.get('hostname') or '').lower() and text not in str(device.get('ip') or '').lower():
+            return False
+        if type_filter and str(device.get('type') or '').lower() != type_filter:
+            return False
+        if vendor_filter and str(device.get('vendor') or '').lower() != vendor_filter:
+            return False
+        if block_filter is not None and (device.get('block') or '') != block_filter:
+            return False
+        if ip_range and not (device.get('ip_key') and ip_range[0] <= device['ip_key'] <= ip_range[1]):
+            return False
+        return True
+
+    def page(self, sort_by='hostname', sort_dir='asc', limit=100, cursor=None, text='', type_filter='', vendor_filter='', block_filter=None, ip_range=None):
+        keys, ordered = self._order(sort_by)
+        text = (text or '').strip().lower()
+        type_filter = (type_filter or '').strip().lower()
+        vendor_filter = (vendor_filter or '').strip().lower()
+        filtered = any((text, type_filter, vendor_filter, block_filter is not None, ip_range))
+
+        if sort_dir == 'asc':
+            start = bisect_right(keys, tuple(decode_device_cursor(cursor))) if cursor else 0
+            candidates = (ordered[i] for i in range(start, len(ordered)))
+        else:
+            end = bisect_left(keys, tuple(decode_device_cursor(cursor))) if cursor else len(ordered)
+            candidates = (ordered[i] for i in range(end - 1, -1, -1))
+
+        records = []
+        for device in candidates:
+            if filtered and not self._matches(device, text, type_filter, vendor_filter, block_filter, ip_range):
+                continue
+            records.append(device)
+            if len(records) > limit:
+                break
+
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_device_cursor(self._sort_value(records[-1], sort_by), records[-1]['id'])
+
+        if filtered:
+            total = sum(1 for device in self.devices if self._matches(device, text, type_filter, vendor_filter, block_filter, ip_range))
+        else:
+            total = len(self.devices)
+
+        return {
+            'records': [{field: device.get(field) for field in DEVICE_RECORD_FIELDS} for device in records],
+            'total_count': total,
+            'next_cursor': next_cursor
+        }
@@ -0,0 +1,285 @@
+import logging
+import math
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from props import force_layout_iterations
+
+logger = logging.getLogger(__name__)
+
+_NEIGHBOUR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+_FAR_FIELD_MIN_NODES = 64
+_FAR_FIELD_REFRESH = 5
+
+
+def _grid_repulsion(pos, k, groups):
+    # Fruchterman-Reingold grid variant: only pairs of the same group in
+    # adjacent k-sized cells repel, so every group is laid out independently.
+    n = len(pos)
+    disp = np.zeros_like(pos)
+    if n < 2:
+        return disp
+
+    cell_size = float(k)
+    cells = np.floor(pos / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    span_x = int(cells[:, 0].max()) + 3
+    span_y = int(cells[:, 1].max()) + 3
+    keys = ((groups * span_x) + cells[:, 0] + 1) * span_y + (cells[:, 1] + 1)
+    order = np.argsort(keys, kind='stable')
+    unique_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+    node_cell = np.searchsorted(unique_keys, keys)
+    all_idx = np.arange(n)
+
+    for dx, dy in _NEIGHBOUR_OFFSETS:
+        # Neighbour lookups are resolved per occupied cell, then broadcast to nodes.
+        target = unique_keys + dx * span_y + dy
+        found = np.minimum(np.searchsorted(unique_keys, target), len(unique_keys) - 1)
+        hit = unique_keys[found] == target
+        counts = np.where(hit, cell_count[found], 0)[node_cell]
+        left = cell_start[found][node_cell]
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        src = np.repeat(all_idx, counts)
+        starts = np.repeat(left - np.cumsum(counts) + counts, counts)
+        dst = order[starts + np.arange(total)]
+        mask = src != dst
+        src = src[mask]
+        dst = dst[mask]
+
+        delta = pos[src] - pos[dst]
+        dist = np.sqrt((delta * delta).sum(axis=1))
+        close = dist < cell_size
+        if not close.any():
+            continue
+        src = src[close]
+        delta = delta[close]
+        dist = np.maximum(dist[close], 0.01)
+        force = (k * k) / (dist * dist)
+        disp[:, 0] += np.bincount(src, weights=delta[:, 0] * force, minlength=n)
+        disp[:, 1] += np.bincount(src, weights=delta[:, 1] * force, minlength=n)
+    return disp
+
+
+def _far_field_repulsion(pos, k, groups, chunk_size=4096):
+    # Two-level Barnes-Hut style approximation: each node is pushed by the
+    # centre of mass of every other coarse cell of its group.
+    disp = np.zeros_like(pos)
+    for group in np.unique(groups):
+        members = np.nonzero(groups == group)[0]
+        if len(members) < _FAR_FIELD_MIN_NODES:
+            continue
+        sub = pos[members]
+        low = sub.min(axis=0)
+        extent = np.maximum(sub.max(axis=0) - low, k)
+        per_axis = max(2, int(round(len(members) ** 0.25)))
+        cells = np.minimum((((sub - low) / extent) * per_axis).astype(np.int64), per_axis - 1)
+        cell_ids = cells[:, 0] * per_axis + cells[:, 1]
+        cell_count = per_axis * per_axis
+        mass = np.bincount(cell_ids, minlength=cell_count).astype(np.float64)
+        occupied = np.nonzero(mass)[0]
+        centre = np.stack([
+            np.bincount(cell_ids, weights=sub[:, 0], minlength=cell_count)[occupied],
+            np.bincount(cell_ids, weights=sub[:, 1], minlength=cell_count)[occupied]
+        ], axis=1) / mass[occupied, None]
+        mass = mass[occupied]
+
+        for start in range(0, len(members), chunk_size):
+            block = sub[start:start + chunk_size]
+            delta = block[:, None, :] - centre[None, :, :]
+            dist_sq = np.maximum((delta * delta).sum(axis=2), k * k)
+            own = cell_ids[start:start + chunk_size, None] == occupied[None, :]
+            force = np.where(own, 0.0, mass[None, :] * (k * k) / dist_sq)
+            disp[members[start:start + chunk_size]] += (delta * force[:, :, None]).sum(axis=1)
+    return disp
+
+
+def fruchterman_reingold(pos, edges, pinned, k, iterations, weights=None, groups=None):
+    pos = np.array(pos, dtype=np.float64)
+    n = len(pos)
+    if n == 0:
+        return pos
+    free = ~np.asarray(pinned, dtype=bool)
+    if not free.any():
+        return pos
+
+    groups = np.zeros(n, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    # Each group cools from its own starting temperature.
+    temperature = k * np.sqrt(np.bincount(groups)[groups].astype(np.float64))
+    cooling = temperature / (iterations + 1)
+
+    far_field = None
+    for iteration in range(iterations):
+        # The far field changes slowly, so it is refreshed every few iterations.
+        if iteration % _FAR_FIELD_REFRESH == 0:
+            far_field = _far_field_repulsion(pos, k, groups)
+        disp = _grid_repulsion(pos, k, groups) + far_field
+
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.sqrt((delta * delta).sum(axis=1)), 0.01)
+            force = (dist / k) * weights
+            fx = delta[:, 0] * force
+            fy = delta[:, 1] * force
+            disp[:, 0] -= np.bincount(edges[:, 0], weights=fx, minlength=n)
+            disp[:, 1] -= np.bincount(edges[:, 0], weights=fy, minlength=n)
+            disp[:, 0] += np.bincount(edges[:, 1], weights=fx, minlength=n)
+            disp[:, 1] += np.bincount(edges[:, 1], weights=fy, minlength=n)
+
+        length = np.maximum(np.sqrt((disp * disp).sum(axis=1)), 0.01)
+        step = np.minimum(length, temperature) / length
+        pos[free] += disp[free] * step[free, None]
+        temperature = np.maximum(temperature - cooling, k * 0.01)
+
+    return pos
+
+
+class ForceDirectedLayout:
+    def __init__(self, topology_utils, iterations=force_layout_iterations):
+        if np is None:
+            raise RuntimeError('Force-directed layout requires numpy to be installed')
+        self.iterations = max(1, int(iterations))
+        self.spacing = float(max(topology_utils.DEVICE_SPACING_X, topology_utils.DEVICE_SPACING_Y))
+        self.block_padding = float(topology_utils.DEVICE_SPACING_X)
+
+    def _initial_positions(self, ids, pinned_positions, seed_key, k):
+        rng = np.random.default_rng(zlib.crc32(seed_key.encode('utf-8')))
+        radius = k * math.sqrt(len(ids))
+        pos = np.empty((len(ids), 2))
+        pinned = np.zeros(len(ids), dtype=bool)
+        if pinned_positions:
+            center = np.mean([[p['x'], p['y']] for p in pinned_positions.values()], axis=0)
+        else:
+            center = np.zeros(2)
+        for i, node_id in enumerate(ids):
+            saved = pinned_positions.get(node_id)
+            if saved is not None:
+                pos[i] = (saved['x'], saved['y'])
+                pinned[i] = True
+            else:
+                angle = rng.uniform(0, 2 * math.pi)
+                r = radius * math.sqrt(rng.uniform(0, 1))
+                pos[i] = (center[0] + r * math.cos(angle), center[1] + r * math.sin(angle))
+        return pos, pinned
+
+    def _layout_clusters(self, clusters, cluster_edges, device_positions):
+        # All blocks run through one vectorised pass; grouping keeps them independent.
+        ids = []
+        groups = []
+        pos_parts = []
+        pinned_parts = []
+        for group, block in enumerate(sorted(clusters)):
+            members = sorted(clusters[block])
+            pos, pinned = self._initial_positions(
+                members, {d: device_positions[d] for d in members if d in device_positions}, block, self.spacing
+            )
+            ids.extend(members)
+            groups.extend([group] * len(members))
+            pos_parts.append(pos)
+            pinned_parts.append(pinned)
+
+        results = {}
+        if not ids:
+            return results
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        edge_idx = [(index[a], index[b]) for block in clusters for a, b in cluster_edges[block] if a != b]
+        pos = fruchterman_reingold(
+            np.vstack(pos_parts), edge_idx, np.concatenate(pinned_parts), self.spacing, self.iterations,
+            groups=np.asarray(groups)
+        )
+
+        start = 0
+        for block, pinned in zip(sorted(clusters), pinned_parts):
+            end = start + len(pinned)
+            results[block] = (ids[start:end], pos[start:end], bool(pinned.any()))
+            start = end
+        return results
+
+    def compute(self, device_blocks, edges, device_positions=None, block_positions=None, pin_saved=True):
+        device_positions = (device_positions if pin_saved else {}) or {}
+        block_positions = (block_positions if pin_saved else {}) or {}
+
+        # Blockless devices are laid out together as one extra cluster keyed ''.
+        clusters = {}
+        for device_id, block in device_blocks.items():
+            clusters.setdefault(block or '', []).append(device_id)
+        cluster_edges = {block: [] for block in clusters}
+        super_edges = {}
+        for a, b in edges:
+            block_a = device_blocks.get(a) or ''
+            block_b = device_blocks.get(b) or ''
+            if block_a == block_b:
+                cluster_edges[block_a].append((a, b))
+            else:
+                key = tuple(sorted((block_a, block_b)))
+                super_edges[key] = super_edges.get(key, 0) + 1
+
+        results = self._layout_clusters(clusters, cluster_edges, device_positions)
+
+        # Second level: clusters become super-nodes sized by their extent.
+        super_ids = sorted(results)
+        super_pinned = {}
+        radii = []
+        for block in super_ids:
+            ids, pos, has_pinned = results[block]
+            center = pos.mean(axis=0)
+            radii.append(float(np.sqrt(((pos - center) ** 2).sum(axis=1)).max()) + self.block_padding)
+            if has_pinned:
+                super_pinned[block] = {'x': float(center[0]), 'y': float(center[1])}
+            elif block in block_positions:
+                super_pinned[block] = block_positions[block]
+
+        index = {block: i for i, block in enumerate(super_ids)}
+        super_k = float(np.median(radii)) * 2.0 if radii else self.spacing
+        pos, pinned = self._initial_positions(super_ids, super_pinned, '__blocks__', super_k)
+        edge_list = [(index[a], index[b]) for a, b in super_edges]
+        edge_weights = [math.log1p(count) for count in super_edges.values()]
+        pos = fruchterman_reingold(pos, edge_list, pinned, super_k, self.iterations, edge_weights)
+        pos = self._remove_overlaps(pos, pinned, radii)
+
+        out_devices = {}
+        out_blocks = {}
+        for block, (ids, cluster_pos, has_pinned) in results.items():
+            target = pos[index[block]]
+            offset = np.zeros(2) if has_pinned else target - cluster_pos.mean(axis=0)
+            for i, device_id in enumerate(ids):
+                out_devices[device_id] = {'x': float(cluster_pos[i, 0] + offset[0]), 'y': float(cluster_pos[i, 1] + offset[1])}
+            if block:
+                out_blocks[block] = block_positions.get(block) or {'x': float(target[0]), 'y': float(target[1])}
+
+        return {
+            'device_positions': out_devices,
+            'block_positions': out_blocks
+        }
+
+    def _remove_overlaps(self, pos, pinned, radii, passes=50):
+        radii = np.asarray(radii)
+        free = ~np.asarray(pinned, dtype=bool)
+        for _ in range(passes):
+            moved = False
+            for a in range(len(pos)):
+                for b in range(a + 1, len(pos)):
+                    delta = pos[a] - pos[b]
+                    dist = max(float(np.hypot(delta[0], delta[1])), 0.01)
+                    overlap = radii[a] + radii[b] - dist
+                    if overlap <= 0 or not (free[a] or free[b]):
+                        continue
+                    push = delta / dist * overlap
+                    if free[a] and free[b]:
+                        pos[a] += push / 2
+                        pos[b] -= push / 2
+                    elif free[a]:
+                        pos[a] += push
+                    else:
+                        pos[b] -= push
+                    moved = True
+            if not moved:
+                break
+        return pos
@@ -0,0 +1,156 @@
+import math
+
+from utils.block_packing import BlockPacker, SpatialHash
+
+
+class IncrementalLayoutService:
+    def __init__(self, topology_utils):
+        self.topology_utils = topology_utils
+        self.devices_per_row = topology_utils.DEVICES_PER_ROW
+        self.spacing_x = topology_utils.DEVICE_SPACING_X
+        self.spacing_y = topology_utils.DEVICE_SPACING_Y
+        self.block_spacing = topology_utils.BLOCK_SPACING
+        self.packer = BlockPacker(topology_utils)
+
+        self.device_positions = {}
+        self.device_blocks = {}
+        self.block_positions = {}
+        self.block_device_counts = {}
+        self.device_hash = SpatialHash(self.spacing_x, self.spacing_y)
+        self._next_ring_slot = 0
+
+    def _occupied_rects(self):
+        rects = [(p['x'], p['y'], p['x'], p['y']) for p in self.device_positions.values()]
+        rects.extend(
+            self.packer.block_rect(position, self.block_device_counts.get(block, 0))
+            for block, position in self.block_positions.items()
+        )
+        return rects
+
+    def load_occupancy(self, position_rows):
+        block_sums = {}
+        for row in position_rows:
+            for side in ('a', 'b'):
+                device_id = self.topology_utils.compute_device_id(
+                    row.get(f'device_{side}_ip', ''),
+                    row.get(f'device_{side}_hostname', '')
+                )
+                block = (row.get(f'device_{side}_block') or '').strip()
+                pos_x = row.get(f'device_{side}_position_x')
+                pos_y = row.get(f'device_{side}_position_y')
+                block_x = row.get(f'device_{side}_block_position_x')
+                block_y = row.get(f'device_{side}_block_position_y')
+
+                if device_id and device_id not in self.device_blocks:
+                    self.device_blocks[device_id] = block
+                    if block:
+                        self.block_device_counts[block] = self.block_device_counts.get(block, 0) + 1
+                if device_id and device_id not in self.device_positions and pos_x is not None and pos_y is not None:
+                    position = {'x': float(pos_x), 'y': float(pos_y)}
+                    self.device_positions[device_id] = position
+                    self.device_hash.add(position['x'], position['y'])
+                    if block:
+                        sums = block_sums.setdefault(block, [0.0, 0.0, 0])
+                        sums[0] += position['x']
+                        sums[1] += position['y']
+                        sums[2] += 1
+                if block and block not in self.block_positions and block_x is not None and block_y is not None:
+                    self.block_positions[block] = {'x': float(block_x), 'y': float(block_y)}
+
+        # Blocks that were never moved still occupy the area their devices sit in.
+        for block, (sum_x, sum_y, count) in block_sums.items():
+            if block not in self.block_positions:
+                self.block_positions[block] = {'x': sum_x / count, 'y': sum_y / count}
+
+    def load_blocks(self, blocks):
+        # Footprints of blocks whose devices were not loaded, so new blocks are packed clear of them.
+        for block, entry in blocks.items():
+            if block not in self.block_positions:
+                self.block_positions[block] = {'x': float(entry['x']), 'y': float(entry['y'])}
+            if block not in self.block_device_counts:
+                self.block_device_counts[block] = entry.get('device_count', 0)
+
+    def _place_blockless(self, new_devices):
+        positions = {}
+        if self.block_positions:
+            center_x = sum(bp['x'] for bp in self.block_positions.values()) / len(self.block_positions)
+            center_y = sum(bp['y'] for bp in self.block_positions.values()) / len(self.block_positions)
+        else:
+            center_x = 0
+            center_y = 0
+        radius = max(self.block_spacing, 800)
+        min_dx = self.spacing_x / 2.0
+        min_dy = self.spacing_y / 2.0
+
+        for device_id in new_devices:
+            while True:
+                idx = self._next_ring_slot
+                self._next_ring_slot += 1
+                angle = (idx * 45) % 360
+                current_radius = radius + (idx // 8) * 200
+                x = center_x + current_radius * math.cos(math.radians(angle))
+                y = center_y + current_radius * math.sin(math.radians(angle))
+                if self.device_hash.is_free(x, y, min_dx, min_dy):
+                    break
+            positions[device_id] = {'x': x, 'y': y}
+            self.device_hash.add(x, y)
+        return positions
+
+    def place(self, records):
+        block_devices = {}
+        blockless_devices = []
+        seen = set()
+
+        for record in records:
+            for side in ('a', 'b'):
+                device_id = self.topology_utils.compute_device_id(
+                    record.get(f'device_{side}_ip', ''),
+                    record.get(f'device_{side}_hostname', '')
+                )
+                if not device_id or device_id in seen:
+                    continue
+                seen.add(device_id)
+                block = (record.get(f'device_{side}_block') or '').strip()
+                if block:
+                    block_devices.setdefault(block, []).append(device_id)
+                else:
+                    blockless_devices.append(device_id)
+
+        device_positions = {}
+        block_positions = {}
+
+        new_device_counts = {
+            block: len([d for d in devices if d not in self.device_positions])
+            for block, devices in block_devices.items()
+        }
+        # New blocks are packed together, sized by their device count, below the existing layout.
+        self.block_positions.update(self.packer.pack(
+            {
+                block: self.block_device_counts.get(block, 0) + new_device_counts[block]
+                for block in block_devices if block not in self.block_positions
+            },
+            self._occupied_rects()
+        ))
+
+        for block in sorted(block_devices):
+            devices = sorted(block_devices[block])
+            new_devices = [d for d in devices if d not in self.device_positions]
+            device_positions.update({d: self.device_positions[d] for d in devices if d in self.device_positions})
+
+            origin = self.block_positions[block]
+            block_positions[block] = origin
+
+            if new_devices:
+                total_devices = self.block_device_counts.get(block, 0) + len(new_devices)
+                device_positions.update(self.packer.fill_block_slots(origin, new_devices, total_devices, self.device_hash))
+                self.block_device_counts[block] = total_devices
+
+        blockless = sorted(blockless_devices)
+        device_positions.update({d: self.device_positions[d] for d in blockless if d in self.device_positions})
+        device_positions.update(self._place_blockless([d for d in blockless if d not in self.device_positions]))
+
+        self.device_positions.update(device_positions)
+        return {
+            'device_positions': device_positions,
+            'block_positions': block_positions
+        }
@@ -0,0 +1,165 @@
+import math
+
+# Top-to-bottom flow: ISP -> internet/edge -> firewall/DMZ -> core -> distribution/access.
+TYPE_RANKS = {
+    'isp': 0,
+    'internet': 1,
+    'router': 2,
+    'ext_switch': 2,
+    'external_switch': 2,
+    'firewall': 3,
+    'ips': 3,
+    'proxy': 3,
+    'core_switch': 4,
+    'server': 6,
+}
+
+BLOCK_RANKS = {
+    'internet-block': 1,
+    'external-block': 2,
+    'extranet-block': 2,
+    'wan-block': 2,
+    'dmz-block': 3,
+    'core-block': 4,
+    'datacenter-block': 5,
+    'replication-block': 5,
+    'visibility-block': 5,
+    'oob-block': 6,
+}
+
+DEFAULT_RANK = 5
+
+
+class LayeredLayout:
+    def __init__(self, topology_utils, sweeps=4, layer_spacing=None, max_layer_width=None):
+        self.spacing_x = topology_utils.DEVICE_SPACING_X
+        self.spacing_y = topology_utils.DEVICE_SPACING_Y
+        self.sweeps = sweeps
+        self.layer_spacing = layer_spacing or self.spacing_y * 3
+        self.max_layer_width = max_layer_width
+
+    def rank_of(self, device_type, block):
+        rank = TYPE_RANKS.get((device_type or '').strip().lower())
+        if rank is not None:
+            return rank
+        return BLOCK_RANKS.get((block or '').strip().lower(), DEFAULT_RANK)
+
+    def _order_layers(self, layers, ranks, neighbours, device_blocks):
+        position = {}
+        for layer in layers:
+            for i, node in enumerate(layer):
+                position[node] = i / max(len(layer) - 1, 1)
+
+        for sweep in range(self.sweeps * 2):
+            downward = sweep % 2 == 0
+            sequence = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+            for r in sequence:
+                layer = layers[r]
+                bary = {}
+                for node in layer:
+                    refs = [position[n] for n in neighbours.get(node, ())
+                            if (ranks[n] < r if downward else ranks[n] > r)]
+                    bary[node] = sum(refs) / len(refs) if refs else position[node]
+
+                # Keep each block contiguous inside a layer.
+                block_sum = {}
+                for node in layer:
+                    block = device_blocks.get(node, '')
+                    total, count = block_sum.get(block, (0.0, 0))
+                    block_sum[block] = (total + bary[node], count + 1)
+                block_key = {block: total / count for block, (total, count) in block_sum.items()}
+
+                layer.sort(key=lambda n: (block_key[device_blocks.get(n, '')], device_blocks.get(n, ''), bary[n], n))
+                for i, node in enumerate(layer):
+                    position[node] = i / max(len(layer) - 1, 1)
+        return layers
+
+    def _assign_coordinates(self, layers, neighbours, ranks):
+        positions = {}
+        y = 0.0
+        for r, layer in enumerate(layers):
+            width = self.max_layer_width or max(8, int(math.ceil(math.sqrt(len(layer)))) * 2)
+            rows = [layer[i:i + width] for i in range(0, len(layer), width)] or [[]]
+            for row in rows:
+                xs = [(i - (len(row) - 1) / 2.0) * self.spacing_x for i in range(len(row))]
+                if len(rows) == 1 and r > 0:
+                    xs = self._straighten(row, xs, neighbours, ranks, positions)
+                for node, x in zip(row, xs):
+                    positions[node] = {'x': x, 'y': y}
+                y += self.spacing_y
+            y += self.layer_spacing - self.spacing_y
+        return positions
+
+    def _straighten(self, row, xs, neighbours, ranks, placed):
+        # Pull nodes towards the median of their already placed neighbours while
+        # keeping the order and a minimum gap of one device spacing.
+        desired = []
+        for node, x in zip(row, xs):
+            refs = sorted(placed[n]['x'] for n in neighbours.get(node, ()) if n in placed)
+            desired.append(refs[len(refs) // 2] if refs else x)
+
+        result = list(desired)
+        for i in range(1, len(result)):
+            result[i] = max(result[i], result[i - 1] + self.spacing_x)
+        for i in range(len(result) - 2, -1, -1):
+            result[i] = min(result[i], result[i + 1] - self.spacing_x)
+        shift = (sum(desired) - sum(result)) / len(result) if result else 0.0
+        return [x + shift for x in result]
+
+    def _avoid_saved(self, positions, saved):
+        # New devices are drawn as one group in a band below everything already placed.
+        free = [node for node in positions if node not in saved]
+        if not free or not saved:
+            return positions
+        saved_bottom = max(pos['y'] for pos in saved.values())
+        saved_left = min(pos['x'] for pos in saved.values())
+        free_top = min(positions[node]['y'] for node in free)
+        free_left = min(positions[node]['x'] for node in free)
+        dx = saved_left - free_left
+        dy = saved_bottom + self.layer_spacing - free_top
+        for node in free:
+            positions[node] = {'x': positions[node]['x'] + dx, 'y': positions[node]['y'] + dy}
+        return positions
+
+    def compute(self, device_blocks, device_types, edges, device_positions=None, block_positions=None, pin_saved=True):
+        ranks = {node: self.rank_of(device_types.get(node), block) for node, block in device_blocks.items()}
+        used = sorted(set(ranks.values()))
+        compact = {rank: i for i, rank in enumerate(used)}
+        ranks = {node: compact[rank] for node, rank in ranks.items()}
+
+        neighbours = {}
+        for a, b in edges:
+            if a == b or a not in ranks or b not in ranks:
+                continue
+            neighbours.setdefault(a, set()).add(b)
+            neighbours.setdefault(b, set()).add(a)
+
+        layers = [[] for _ in used]
+        for node in sorted(ranks, key=lambda n: (device_blocks.get(n, ''), n)):
+            layers[ranks[node]].append(node)
+
+        layers = self._order_layers(layers, ranks, neighbours, device_blocks)
+        positions = self._assign_coordinates(layers, neighbours, ranks)
+
+        # Saved devices and block origins stay fixed; only the rest is placed.
+        saved = {node: pos for node, pos in (device_positions or {}).items() if node in positions} if pin_saved else {}
+        block_positions = (block_positions if pin_saved else {}) or {}
+        positions = self._avoid_saved(positions, saved)
+        positions.update(saved)
+
+        block_sums = {}
+        for node, block in device_blocks.items():
+            if block and node in positions and block not in block_positions:
+                total = block_sums.setdefault(block, [0.0, 0.0, 0])
+                total[0] += positions[node]['x']
+                total[1] += positions[node]['y']
+                total[2] += 1
+        out_blocks = {block: {'x': sx / n, 'y': sy / n} for block, (sx, sy, n) in block_sums.items()}
+        out_blocks.update({
+            block: block_positions[block] for block in set(device_blocks.values()) if block and block in block_positions
+        })
+
+        return {
+            'device_positions': positions,
+            'block_positions': out_blocks
+        }
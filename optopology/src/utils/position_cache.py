@@ -0,0 +1,58 @@
+import threading
+import time
+
+from props import position_epsilon, position_cache_ttl_seconds
+
+
+class PositionCache:
+    def __init__(self, epsilon=position_epsilon, ttl_seconds=position_cache_ttl_seconds):
+        self.epsilon = epsilon
+        self.ttl_seconds = ttl_seconds
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def _normalize(self, key, pos):
+        key = str(key).strip() if key is not None else ''
+        try:
+            return key, (float(pos['x']), float(pos['y']))
+        except Exception:
+            return key, None
+
+    def update(self, positions, stamp=None):
+        # stamp is the database position stamp the values were read at; values known any other way carry None.
+        now = time.monotonic()
+        with self._lock:
+            for key, pos in positions.items():
+                key, value = self._normalize(key, pos)
+                if key and value is not None:
+                    self._positions[key] = (value, now, stamp)
+
+    def invalidate(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._positions = {}
+                return
+            for key in keys:
+                self._positions.pop(str(key).strip(), None)
+
+    def split_changed(self, positions, stamp):
+        # Keys are skipped only when read from the database at the current stamp and within epsilon;
+        # anything else is written.
+        now = time.monotonic()
+        changed = {}
+        skipped = []
+        with self._lock:
+            for raw_key, pos in positions.items():
+                key, value = self._normalize(raw_key, pos)
+                cached = self._positions.get(key)
+                if (value is not None and cached is not None and stamp is not None and cached[2] == stamp
+                        and now - cached[1] <= self.ttl_seconds
+                        and abs(cached[0][0] - value[0]) <= self.epsilon
+                        and abs(cached[0][1] - value[1]) <= self.epsilon):
+                    skipped.append(key)
+                else:
+                    changed[raw_key] = pos
+        return changed, skipped
+
+
+position_cache = PositionCache()
@@ -0,0 +1,170 @@
+import atexit
+import logging
+import threading
+import traceback
+from datetime import datetime
+
+from props import position_flush_interval_seconds, position_flush_max_keys
+from props import position_flush_max_retries, position_flush_max_backoff_seconds
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+logger = logging.getLogger(__name__)
+
+
+class PositionWriteBuffer:
+    def __init__(self, flush_interval=position_flush_interval_seconds, max_keys=position_flush_max_keys,
+                 max_retries=position_flush_max_retries, max_backoff=position_flush_max_backoff_seconds):
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.consecutive_failures = 0
+        self.dropped_keys = 0
+        self.last_error = None
+        self.last_failure_at = None
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._db_factory = None
+        self._db_utils = None
+        self._thread = None
+
+    def start(self, db_factory):
+        # Returns False when the buffer cannot be used: with several workers each would hold its own
+        # pending writes, so reads in one worker would miss saves buffered in another.
+        if uwsgi is not None and uwsgi.numproc > 1:
+            return False
+        with self._lock:
+            if self._thread is not None:
+                return True
+            self._db_factory = db_factory
+            self._thread = threading.Thread(target=self._run, name='position-write-buffer', daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+        if uwsgi is not None:
+            # uWSGI workers are not guaranteed to run atexit handlers on reload or shutdown.
+            previous = getattr(uwsgi, 'atexit', None)
+
+            def on_exit():
+                self.flush()
+                if previous:
+                    previous()
+            uwsgi.atexit = on_exit
+        return True
+
+    def add(self, positions, changed_by, coordinates='absolute'):
+        with self._lock:
+            for key, pos in positions.items():
+                key = str(key).strip() if key is not None else ''
+                if not key:
+                    continue
+                # Last write wins per key, and a new value starts with no failed attempts.
+                self._pending[key] = (pos, changed_by, coordinates, 0)
+            size = len(self._pending)
+        if size >= self.max_keys:
+            self._wake.set()
+        return size
+
+    def has_pending(self, coordinates):
+        with self._lock:
+            entries = list(self._inflight.values()) + list(self._pending.values())
+        return any(entry[2] == coordinates for entry in entries)
+
+    def pending_positions(self, coordinates='absolute'):
+        with self._lock:
+            items = list(self._inflight.items()) + list(self._pending.items())
+        positions = {}
+        for key, (pos, _, entry_coordinates, _) in items:
+            if entry_coordinates != coordinates:
+                continue
+            try:
+                positions[key] = {'x': float(pos['x']), 'y': float(pos['y'])}
+            except Exception:
+                continue
+        return positions
+
+    def rename_key(self, old_key, new_key):
+        # A pending move of a renamed block is kept under its new name; keys already being written are left alone.
+        with self._lock:
+            entry = self._pending.pop(old_key, None)
+            if entry is not None and new_key not in self._pending:
+                self._pending[new_key] = entry
+
+    def status(self):
+        with self._lock:
+            pending_keys = len(self._pending) + len(self._inflight)
+        return {
+            'healthy': self.consecutive_failures == 0,
+            'pending_keys': pending_keys,
+            'consecutive_failures': self.consecutive_failures,
+            'dropped_keys': self.dropped_keys,
+            'last_error': self.last_error,
+            'last_failure_at': self.last_failure_at.isoformat() if self.last_failure_at else None
+        }
+
+    def _run(self):
+        while True:
+            delay = self.flush_interval
+            if self.consecutive_failures:
+                delay = min(self.flush_interval * 2 ** self.consecutive_failures, self.max_backoff)
+            self._wake.wait(delay)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                # Keys being written stay visible to readers until the write lands.
+                self._inflight = batch
+            if not batch:
+                return {'status': 'Success', 'flushed_keys': 0}
+
+            by_user = {}
+            for key, (pos, changed_by, coordinates, _) in batch.items():
+                by_user.setdefault((changed_by, coordinates), {})[key] = pos
+
+            try:
+                if self._db_utils is None:
+                    self._db_utils = self._db_factory()
+                for (changed_by, coordinates), positions in by_user.items():
+                    result = self._db_utils.save_device_positions_bulk(positions, changed_by, coordinates)
+                    if result['status'] != 'Success':
+                        raise RuntimeError(result['error'])
+                with self._lock:
+                    self._inflight = {}
+                self.consecutive_failures = 0
+                logger.info(f"Position write buffer flushed {len(batch)} keys")
+                return {'status': 'Success', 'flushed_keys': len(batch)}
+            except Exception as e:
+                traceback.print_exc()
+                self.consecutive_failures += 1
+                self.last_error = str(e)
+                self.last_failure_at = datetime.now()
+                # Re-queue what failed unless a newer value arrived meanwhile; keys out of retries are dropped.
+                dropped = []
+                with self._lock:
+                    self._inflight = {}
+                    for key, (pos, changed_by, coordinates, attempts) in batch.items():
+                        if key in self._pending:
+                            continue
+                        if attempts + 1 > self.max_retries:
+                            dropped.append(key)
+                        else:
+                            self._pending[key] = (pos, changed_by, coordinates, attempts + 1)
+                self.dropped_keys += len(dropped)
+                if dropped:
+                    logger.error(f"Position write buffer dropped {len(dropped)} keys after {self.max_retries} retries: {str(e)}")
+                else:
+                    logger.error(f"Position write buffer flush failed (attempt {self.consecutive_failures}): {str(e)}")
+                return {'status': 'Failed', 'error': str(e), 'dropped_keys': dropped}
+
+
+position_write_buffer = PositionWriteBuffer()
@@ -0,0 +1,108 @@
+from utils.versioned_index import VersionedIndex
+
+SEARCH_FIELDS = ('hostname', 'ip', 'interface')
+SUGGEST_FIELDS = ('hostname', 'ip')
+_WORD_BREAKS = '-._/: '
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def row_terms(doc):
+    # Maps (field, lower-cased value) to the value as first written, which suggestions display.
+    terms = {}
+    for side in ('a', 'b'):
+        for field in SEARCH_FIELDS:
+            value = str(doc.get(f'device_{side}_{field}', '') or '').strip()
+            if value:
+                terms.setdefault((field, value.lower()), value)
+    comments = str(doc.get('comments', '') or '').strip()
+    if comments:
+        terms[('comments', comments.lower())] = comments
+    return terms
+
+
+class TrigramIndex(VersionedIndex):
+    # Postings are kept per distinct term rather than per row, so repeated
+    # hostnames and interface names cost one entry however many links use them.
+    STATE = ('_row_terms', '_term_rows', '_gram_terms', '_display')
+
+    def _reset(self):
+        self._row_terms = {}
+        self._term_rows = {}
+        self._gram_terms = {}
+        self._display = {}
+
+    def _add_doc(self, doc):
+        terms = row_terms(doc)
+        self._row_terms[doc['_id']] = tuple(terms)
+        for term, display in terms.items():
+            rows = self._term_rows.get(term)
+            if rows is None:
+                rows = self._term_rows[term] = set()
+                self._display[term] = display
+                for gram in trigrams(term[1]):
+                    self._gram_terms.setdefault(gram, set()).add(term)
+            rows.add(doc['_id'])
+
+    def _remove_row(self, row_id):
+        for term in self._row_terms.pop(row_id, ()):
+            rows = self._term_rows.get(term)
+            if rows is None:
+                continue
+            rows.discard(row_id)
+            if not rows:
+                del self._term_rows[term]
+                self._display.pop(term, None)
+                for gram in trigrams(term[1]):
+                    terms = self._gram_terms.get(gram)
+                    if terms is not None:
+                        terms.discard(term)
+                        if not terms:
+                            del self._gram_terms[gram]
+
+    def _matching_terms(self, text, fields=None):
+        if len(text) < 3:
+            candidates = self._term_rows.keys()
+        else:
+            postings = sorted((self._gram_terms.get(gram, set()) for gram in trigrams(text)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        return [term for term in candidates if (fields is None or term[0] in fields) and text in term[1]]
+
+    def search(self, text, fields=None):
+        text = (text or '').strip().lower()
+        if not text:
+            return []
+        with self._lock:
+            rows = set()
+            for term in self._matching_terms(text, fields):
+                rows.update(self._term_rows[term])
+            return list(rows)
+
+    def suggest(self, text, limit, fields=SUGGEST_FIELDS):
+        text = (text or '').strip().lower()
+        if not text:
+            return []
+        with self._lock:
+            scored = []
+            for field, value in self._matching_terms(text, fields):
+                position = value.find(text)
+                if value == text:
+                    rank = 0
+                elif position == 0:
+                    rank = 1
+                elif value[position - 1] in _WORD_BREAKS:
+                    rank = 2
+                else:
+                    rank = 3
+                connections = len(self._term_rows[(field, value)])
+                scored.append(((rank, -connections, len(value), value), field, self._display[(field, value)], connections))
+        scored.sort(key=lambda entry: entry[0])
+        return [
+            {'value': value, 'field': field, 'connections': connections}
+            for _, field, value, connections in scored[:limit]
+        ]
+
+
+connection_search_index = TrigramIndex()
@@ -1,8 +1,32 @@
+import ipaddress
 import logging
 import re
 import math
 from datetime import datetime
+from functools import lru_cache
 import sys
+from utils.block_rules import block_rule_engine
+from utils.block_packing import BlockPacker
+
+IPV4_MAPPED_OFFSET = 0xFFFF << 32
+
+
+@lru_cache(maxsize=65536)
+def ip_sort_key(value):
+    # 128-bit address as fixed-width hex, IPv4 mapped into ::ffff:0:0/96, so string order is numeric order.
+    try:
+        address = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None
+    number = int(address) | IPV4_MAPPED_OFFSET if address.version == 4 else int(address)
+    return f"{number:032x}"
+
+
+def cidr_key_range(cidr):
+    network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+    offset = IPV4_MAPPED_OFFSET if network.version == 4 else 0
+    return (f"{int(network.network_address) | offset:032x}", f"{int(network.broadcast_address) | offset:032x}")
+
 
 class TopologyUtilities:
     def __init__(self):
@@ -34,6 +58,12 @@ class TopologyUtilities:
 
         self.DEVICE_TYPE_UPDATE_REQUIRED_FIELDS = ['device_ip', 'device_hostname', 'new_device_type']
 
+        self.DEVICES_PER_ROW = 4
+        self.DEVICE_SPACING_X = 200
+        self.DEVICE_SPACING_Y = 150
+        self.BLOCK_SPACING = 1500
+        self.BLOCKS_PER_ROW = 3
+
         self.HEADER_TO_FIELD = {
             'device_a_ip': 'device_a_ip',
             'devicea_ip': 'device_a_ip',
@@ -111,6 +141,27 @@ class TopologyUtilities:
         clean_hostname = self.clean_field_value(hostname)
         return clean_ip or clean_hostname
 
+    def connection_key(self, record):
+        # The fields the duplicate check compares, with the two sides in a fixed order so A->B and B->A match.
+        sides = sorted(
+            (
+                str(record.get(f'device_{side}_hostname', '') or '').strip(),
+                str(record.get(f'device_{side}_interface', '') or '').strip(),
+                str(record.get(f'device_{side}_ip', '') or '').strip(),
+                str(record.get(f'device_{side}_type', '') or 'unknown').strip().lower(),
+                str(record.get(f'device_{side}_vendor', '') or 'unknown').strip().lower()
+            )
+            for side in ('a', 'b')
+        )
+        return (sides[0], sides[1], str(record.get('comments', '') or '').strip())
+
+    def ip_key(self, value):
+        value = self.clean_field_value(value)
+        return ip_sort_key(value) if value else None
+
+    def cidr_range(self, cidr):
+        return cidr_key_range(cidr)
+
     def is_ipv4(self, value):
         try:
             parts = value.split('.')
@@ -264,48 +315,7 @@ class TopologyUtilities:
         return []
 
     def determine_block(self, hostname, ip, device_type):
-        try:
-            raw_name = (hostname or '')
-            name = re.sub(r'[^A-Za-z0-9]+', ' ', raw_name).strip().upper()
-            ip_str = (ip or '').strip()
-            dtype = (device_type or '').strip().lower()
-
-            if dtype == 'isp':
-                return ''
-
-            if ip_str in ('10.99.18.253', '10.99.18.254'):
-                return 'core-block'
-            if dtype == 'core_switch':
-                return 'core-block'
-            if ' COR ' in f' {name} ' or ' CORE ' in f' {name} ':
-                return 'core-block'
-            if ' INT ' in f' {name} ' or ' INTERNET ' in f' {name} ':
-                return 'internet-block'
-            if ' OOB ' in f' {name} ' or ' OUT OF BAND ' in f' {name} ':
-                return 'oob-block'
-            if ' WAN ' in f' {name} ' or ' WIDE AREA ' in f' {name} ':
-                return 'wan-block'
-            if ' EXTNET ' in f' {name} ' or ' EXTRANET ' in f' {name} ' or ' PARTNER ' in f' {name} ':
-                return 'extranet-block'
-            if ' OTV ' in f' {name} ' or ' REPL ' in f' {name} ' or ' REPLICATION ' in f' {name} ':
-                return 'replication-block'
-            if ' DC ' in f' {name} ' or ' DATACENTER ' in f' {name} ' or ' ACI ' in f' {name} ':
-                return 'datacenter-block'
-            if ' VIS ' in f' {name} ' or ' VISIBILITY ' in f' {name} ' or ' MONITOR ' in f' {name} ':
-                return 'visibility-block'
-            if ' DMZ ' in f' {name} ' or ' PERIMETER ' in f' {name} ' or ' BORDER ' in f' {name} ':
-                return 'dmz-block'
-            if ' EXT ' in f' {name} ' or ' EXTERNAL ' in f' {name} ' or ' EDGE ' in f' {name} ':
-                return 'external-block'
-            if dtype == 'firewall':
-                return 'dmz-block'
-            if dtype == 'ips':
-                return 'dmz-block'
-            if dtype == 'proxy':
-                return 'dmz-block'
-            return ''
-        except Exception:
-            return ''
+        return block_rule_engine.classify(hostname, ip, device_type)
 
     def process_topology_data(self, connection_rows, block_rows):
         blocks = []
@@ -434,72 +444,42 @@ class TopologyUtilities:
             'timestamp': int(datetime.now().timestamp() * 1000)
         }
 
-    def find_device_position(self, device_id, device_ip, device_hostname, connection_rows):
-        best_position = None
-        logging.debug(f"find_device_position: {device_id} for device_ip: {device_ip} device_hostname: {device_hostname} _ {datetime.now()}")
-
+    def build_position_index(self, connection_rows):
+        # First saved position per device id, IP and hostname, in row order.
+        by_id = {}
+        by_ip = {}
+        by_hostname = {}
         for row in connection_rows:
-            (device_a_ip, device_a_hostname, device_a_interface, device_a_type, device_a_vendor, device_a_block,
-             device_a_pos_x, device_a_pos_y, device_a_block_pos_x, device_a_block_pos_y,
-             device_b_ip, device_b_hostname, device_b_interface, device_b_type, device_b_vendor, device_b_block,
-             device_b_pos_x, device_b_pos_y, device_b_block_pos_x, device_b_block_pos_y,
-             comments, created_date, updated_date) = row
-
-            row_device_a_id = self.compute_device_id(device_a_ip, device_a_hostname)
-            row_device_b_id = self.compute_device_id(device_b_ip, device_b_hostname)
-
-            if (row_device_a_id == device_id and
-                device_a_pos_x is not None and device_a_pos_y is not None):
-                best_position = {'x': float(device_a_pos_x), 'y': float(device_a_pos_y)}
-                break
-
-            if (row_device_b_id == device_id and
-                device_b_pos_x is not None and device_b_pos_y is not None):
-                best_position = {'x': float(device_b_pos_x), 'y': float(device_b_pos_y)}
-                break
+            for offset in (0, 10):
+                pos_x = row[offset + 6]
+                pos_y = row[offset + 7]
+                if pos_x is None or pos_y is None:
+                    continue
+                position = {'x': float(pos_x), 'y': float(pos_y)}
+                ip = self.clean_field_value(row[offset])
+                hostname = self.clean_field_value(row[offset + 1])
+                by_id.setdefault(ip or hostname, position)
+                if ip:
+                    by_ip.setdefault(ip, position)
+                if hostname:
+                    by_hostname.setdefault(hostname, position)
+        return {'id': by_id, 'ip': by_ip, 'hostname': by_hostname}
+
+    def find_device_position(self, device_id, device_ip, device_hostname, position_index):
+        best_position = position_index['id'].get(device_id)
 
         clean_device_ip = self.clean_field_value(device_ip)
         if best_position is None and clean_device_ip:
-            for row in connection_rows:
-                (device_a_ip, device_a_hostname, device_a_interface, device_a_type, device_a_vendor, device_a_block,
-                 device_a_pos_x, device_a_pos_y, device_a_block_pos_x, device_a_block_pos_y,
-                 device_b_ip, device_b_hostname, device_b_interface, device_b_type, device_b_vendor, device_b_block,
-                 device_b_pos_x, device_b_pos_y, device_b_block_pos_x, device_b_block_pos_y,
-                 comments, created_date, updated_date) = row
-
-                if (self.clean_field_value(device_a_ip) == clean_device_ip and
-                    device_a_pos_x is not None and device_a_pos_y is not None):
-                    best_position = {'x': float(device_a_pos_x), 'y': float(device_a_pos_y)}
-                    break
-
-                if (self.clean_field_value(device_b_ip) == clean_device_ip and
-                    device_b_pos_x is not None and device_b_pos_y is not None):
-                    best_position = {'x': float(device_b_pos_x), 'y': float(device_b_pos_y)}
-                    break
+            best_position = position_index['ip'].get(clean_device_ip)
 
         clean_device_hostname = self.clean_field_value(device_hostname)
         if best_position is None and clean_device_hostname:
-            for row in connection_rows:
-                (device_a_ip, device_a_hostname, device_a_interface, device_a_type, device_a_vendor, device_a_block,
-                 device_a_pos_x, device_a_pos_y, device_a_block_pos_x, device_a_block_pos_y,
-                 device_b_ip, device_b_hostname, device_b_interface, device_b_type, device_b_vendor, device_b_block,
-                 device_b_pos_x, device_b_pos_y, device_b_block_pos_x, device_b_block_pos_y,
-                 comments, created_date, updated_date) = row
-
-                if (self.clean_field_value(device_a_hostname) == clean_device_hostname and
-                    device_a_pos_x is not None and device_a_pos_y is not None):
-                    best_position = {'x': float(device_a_pos_x), 'y': float(device_a_pos_y)}
-                    break
-
-                if (self.clean_field_value(device_b_hostname) == clean_device_hostname and
-                    device_b_pos_x is not None and device_b_pos_y is not None):
-                    best_position = {'x': float(device_b_pos_x), 'y': float(device_b_pos_y)}
-                    break
+            best_position = position_index['hostname'].get(clean_device_hostname)
 
         return best_position
 
 
-    def process_dashboard_topology_data(self, connection_rows):
+    def process_dashboard_topology_data(self, connection_rows, block_positions=None, relative_positions=None):
         logging.info(f"process_dashboard_topology_data at {datetime.now()}")
         blocks = []
         nodes = []
@@ -508,6 +488,8 @@ class TopologyUtilities:
         device_status = {}
         device_types = {}
         connection_map = {}
+        block_devices = {}
+        block_positions = block_positions or {}
 
         unique_blocks = set()
         for row in connection_rows:
@@ -525,11 +507,12 @@ class TopologyUtilities:
                     'label': block_name.replace('-', ' ').title(),
                     'type': 'compound'
                 })
-
-                positions[block_name] = {'x': 0, 'y': 0}
+                block_devices[block_name] = []
 
         processed_devices = set()
         blockless_device_count = 0
+        unplaced_block_devices = {}
+        position_index = self.build_position_index(connection_rows)
 
         for row in connection_rows:
             (device_a_ip, device_a_hostname, device_a_interface, device_a_type, device_a_vendor, device_a_block,
@@ -553,7 +536,7 @@ class TopologyUtilities:
                 })
                 processed_devices.add(device_a_id)
 
-                saved_position = self.find_device_position(device_a_id, device_a_ip, device_a_hostname, connection_rows)
+                saved_position = self.find_device_position(device_a_id, device_a_ip, device_a_hostname, position_index)
 
                 logging.debug(f"saved_position: {saved_position} for device_a_id: {device_a_id} device_a_ip: {device_a_ip} device_a_hostname: {device_a_hostname} _ {datetime.now()}")
 
@@ -567,7 +550,9 @@ class TopologyUtilities:
                     positions[device_a_id] = {'x': x, 'y': y}
                     blockless_device_count += 1
                 else:
-                    positions[device_a_id] = {'x': 0, 'y': 0}
+                    unplaced_block_devices.setdefault(device_a_block, []).append(device_a_id)
+                if has_block:
+                    block_devices.setdefault(device_a_block, []).append(device_a_id)
 
                 device_status[device_a_id] = 'off'
                 device_types[device_a_id] = device_a_type
@@ -584,7 +569,7 @@ class TopologyUtilities:
                 })
                 processed_devices.add(device_b_id)
 
-                saved_position = self.find_device_position(device_b_id, device_b_ip, device_b_hostname, connection_rows)
+                saved_position = self.find_device_position(device_b_id, device_b_ip, device_b_hostname, position_index)
                 logging.info(f"saved_position: {saved_position} for device_b_id: {device_b_id} device_b_ip: {device_b_ip} device_b_hostname: {device_b_hostname} _ {datetime.now()}")
                 if saved_position:
                     positions[device_b_id] = saved_position
@@ -596,17 +581,22 @@ class TopologyUtilities:
                     positions[device_b_id] = {'x': x, 'y': y}
                     blockless_device_count += 1
                 else:
-                    positions[device_b_id] = {'x': 0, 'y': 0}
+                    unplaced_block_devices.setdefault(device_b_block, []).append(device_b_id)
+                if has_block:
+                    block_devices.setdefault(device_b_block, []).append(device_b_id)
 
                 device_status[device_b_id] = 'off'
                 device_types[device_b_id] = device_b_type
 
-            if device_a_block and device_a_block_pos_x is not None and device_a_block_pos_y is not None:
+            # Rows are only consulted for blocks whose document has no position yet.
+            if (device_a_block and device_a_block not in block_positions
+                    and device_a_block_pos_x is not None and device_a_block_pos_y is not None):
                 positions[device_a_block] = {
                     'x': float(device_a_block_pos_x),
                     'y': float(device_a_block_pos_y)
                 }
-            if device_b_block and device_b_block_pos_x is not None and device_b_block_pos_y is not None:
+            if (device_b_block and device_b_block not in block_positions
+                    and device_b_block_pos_x is not None and device_b_block_pos_y is not None):
                 positions[device_b_block] = {
                     'x': float(device_b_block_pos_x),
                     'y': float(device_b_block_pos_y)
@@ -654,6 +644,23 @@ class TopologyUtilities:
                     'speedStatus': self.get_speed_status(0),
                     'speed': '0G / 0G'
                 }
+        positions.update({block: position for block, position in block_positions.items() if block in block_devices})
+
+        # Devices stored relative to their block follow the block origin.
+        for block, members in block_devices.items():
+            origin = positions.get(block)
+            if not origin or not relative_positions:
+                continue
+            for device_id in members:
+                relative = relative_positions.get(device_id)
+                if relative:
+                    positions[device_id] = {'x': origin['x'] + relative['x'], 'y': origin['y'] + relative['y']}
+            if block in unplaced_block_devices:
+                unplaced_block_devices[block] = [d for d in unplaced_block_devices[block] if d not in relative_positions]
+
+        # Blocks without a saved position are packed by size; their unsaved devices fill grid slots.
+        BlockPacker(self).complete_positions(positions, block_devices, unplaced_block_devices)
+
         logging.info(f"blocks: {blocks} _ {datetime.now()}")
         logging.info(f"nodes: {nodes} _ {datetime.now()}")
         logging.info(f"edges: {edges} _ {datetime.now()}")
@@ -745,11 +752,11 @@ class TopologyUtilities:
             return 'good'
 
     def calculate_auto_layout_positions(self, records):
-        DEVICES_PER_ROW = 4
-        DEVICE_SPACING_X = 200
-        DEVICE_SPACING_Y = 150
-        BLOCK_SPACING = 1500
-        BLOCKS_PER_ROW = 3
+        DEVICES_PER_ROW = self.DEVICES_PER_ROW
+        DEVICE_SPACING_X = self.DEVICE_SPACING_X
+        DEVICE_SPACING_Y = self.DEVICE_SPACING_Y
+        BLOCK_SPACING = self.BLOCK_SPACING
+        BLOCKS_PER_ROW = self.BLOCKS_PER_ROW
 
         block_devices = {}
         device_info = {}
@@ -861,3 +868,51 @@ class TopologyUtilities:
             'device_positions': positions,
             'block_positions': block_positions
         }
+
+    def build_layout_graph(self, position_rows, records=None):
+        device_blocks = {}
+        device_types = {}
+        device_positions = {}
+        block_positions = {}
+        edges = []
+
+        def add_rows(rows, with_positions):
+            for row in rows:
+                ids = []
+                for side in ('a', 'b'):
+                    device_id = self.compute_device_id(
+                        row.get(f'device_{side}_ip', ''),
+                        row.get(f'device_{side}_hostname', '')
+                    )
+                    ids.append(device_id)
+                    if not device_id:
+                        continue
+                    block = (row.get(f'device_{side}_block') or '').strip()
+                    if device_id not in device_blocks:
+                        device_blocks[device_id] = block
+                        device_types[device_id] = (row.get(f'device_{side}_type') or '').strip().lower()
+                    if not with_positions:
+                        continue
+
+                    pos_x = row.get(f'device_{side}_position_x')
+                    pos_y = row.get(f'device_{side}_position_y')
+                    if device_id not in device_positions and pos_x is not None and pos_y is not None:
+                        device_positions[device_id] = {'x': float(pos_x), 'y': float(pos_y)}
+                    block_x = row.get(f'device_{side}_block_position_x')
+                    block_y = row.get(f'device_{side}_block_position_y')
+                    if block and block not in block_positions and block_x is not None and block_y is not None:
+                        block_positions[block] = {'x': float(block_x), 'y': float(block_y)}
+
+                if ids[0] and ids[1]:
+                    edges.append((ids[0], ids[1]))
+
+        add_rows(position_rows, True)
+        add_rows(records or [], False)
+
+        return {
+            'device_blocks': device_blocks,
+            'device_types': device_types,
+            'edges': edges,
+            'device_positions': device_positions,
+            'block_positions': block_positions
+        }
@@ -0,0 +1,31 @@
+import threading
+from collections import OrderedDict
+
+from props import query_cache_max_entries
+
+
+class VersionedCache:
+    # Entries are only served while the topology version they were computed at is current.
+    def __init__(self, max_entries=query_cache_max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+topology_query_cache = VersionedCache()
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from props import search_index_refresh_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedIndex(ABC):
+    # An in-process index over connection rows that follows the shared topology version.
+    # Subclasses keep their data in the attributes named by STATE and fill it through _add_doc/_remove_row.
+    STATE = ()
+
+    def __init__(self, refresh_seconds=search_index_refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.version = None
+        self._reset()
+
+    @abstractmethod
+    def _reset(self):
+        pass
+
+    @abstractmethod
+    def _add_doc(self, doc):
+        pass
+
+    @abstractmethod
+    def _remove_row(self, row_id):
+        pass
+
+    def rebuild(self, version_loader, rows_loader):
+        with self._build_lock:
+            started = time.monotonic()
+            version = version_loader()
+            fresh = type(self)(self.refresh_seconds)
+            rows = 0
+            for doc in rows_loader():
+                fresh._add_doc(doc)
+                rows += 1
+            with self._lock:
+                for name in self.STATE:
+                    setattr(self, name, getattr(fresh, name))
+                self.version = version
+                self._checked_at = time.monotonic()
+            logger.info(f"{type(self).__name__} rebuilt at version {version}: {rows} rows in {time.monotonic() - started:.2f}s")
+
+    def ensure_current(self, version_loader, rows_loader):
+        if self.version is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        version = version_loader()
+        with self._lock:
+            current = self.version == version
+            if current:
+                self._checked_at = time.monotonic()
+        if not current:
+            self.rebuild(version_loader, rows_loader)
+
+    def mark_stale(self):
+        with self._lock:
+            if self.version is not None:
+                self.version = -1
+
+    def apply(self, version, upserts=(), deletes=(), clear=False):
+        # Local writes are applied in place only when no other process has written in between;
+        # otherwise the index is left stale and the next lookup rebuilds it.
+        with self._lock:
+            if self.version is None:
+                return
+            if self.version != version - 1:
+                self.version = -1
+                return
+            if clear:
+                self._reset()
+            for row_id in deletes:
+                self._remove_row(row_id)
+            for doc in upserts:
+                self._remove_row(doc['_id'])
+                self._add_doc(doc)
+            self.version = version